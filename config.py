@@ -22,4 +22,6 @@ STYLESHEET_PATH = "src/ui/styles.qss"
 # Sensitive data (loaded from .env)
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 DEBUG_MODE = os.getenv("DEBUG_MODE", "True").lower() == "true"
+# Database engine profile, see ENGINE_PROFILES in src/db/__init__.py
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "development" if DEBUG_MODE else "production")
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -12,6 +12,7 @@ Usage:
     python db_manage.py reset     - Reset the database (drop all tables and recreate)
     python db_manage.py status    - Show the current migration status
     python db_manage.py create_migration "message" - Create a new migration
+    python db_manage.py benchmark - Compare the throughput of the engine profiles
 """
 
 import os
@@ -163,6 +164,21 @@ def create_migration(message):
     return run_alembic_command("revision", "--autogenerate", "-m", message)
 
 
+def run_benchmark(operations, threads):
+    """Benchmark the database engine profiles and print their throughput."""
+    from src.db.benchmark import benchmark_profiles
+    
+    logger.info(f"Benchmarking engine profiles with {threads} threads x {operations} transactions")
+    results = benchmark_profiles(operations=operations, threads=threads)
+    baseline = results.get("development")
+    for profile, result in results.items():
+        line = f"{profile:<12} {result['transactions_per_second']:>10.1f} transactions/s"
+        if baseline and profile != "development":
+            line += f"  ({result['transactions_per_second'] / baseline['transactions_per_second']:.1f}x development)"
+        print(line)
+    return results
+
+
 def main():
     """Main entry point for the script."""
     parser = argparse.ArgumentParser(description="Mathtermind Database Management")
@@ -187,6 +203,11 @@ def main():
     create_parser = subparsers.add_parser("create_migration", help="Create a new migration")
     create_parser.add_argument("message", help="Migration message")
     
+    # Benchmark command
+    benchmark_parser = subparsers.add_parser("benchmark", help="Compare the throughput of the engine profiles")
+    benchmark_parser.add_argument("--operations", type=int, default=500, help="Transactions per thread")
+    benchmark_parser.add_argument("--threads", type=int, default=4, help="Concurrent threads")
+    
     # Debug mode flag
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     
@@ -211,6 +232,8 @@ def main():
             show_status()
         elif args.command == "create_migration":
             create_migration(args.message)
+        elif args.command == "benchmark":
+            run_benchmark(args.operations, args.threads)
         else:
             parser.print_help()
     except Exception as e:
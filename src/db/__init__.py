@@ -1,17 +1,225 @@
 # db/__init__.py
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Iterator, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 # Add the project root to the Python path
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from config import DATABASE_URL
+from config import DATABASE_URL, DATABASE_PROFILE
+from src.core.error_handling import DatabaseError
 
-engine = create_engine(DATABASE_URL, echo=True, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine)
+# Engine settings per profile. Pragmas are applied to every new SQLite connection.
+ENGINE_PROFILES = {
+    # Logs every statement and checks connections before use
+    "development": {
+        "echo": True,
+        "pool_pre_ping": True,
+        "pragmas": {}
+    },
+    # WAL lets readers run alongside the writer; with synchronous=NORMAL a
+    # commit only waits for the WAL write, not a checkpoint
+    "production": {
+        "echo": False,
+        "pool_pre_ping": False,
+        "poolclass": QueuePool,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -64000,  # 64 MB; negative values are in KiB
+            "mmap_size": 256 * 1024 * 1024,
+            "temp_store": "MEMORY"
+        }
+    }
+}
+
+
+def create_database_engine(profile: Optional[str] = None, url: str = DATABASE_URL) -> Engine:
+    """
+    Create a database engine configured for a profile.
+
+    Args:
+        profile: Name of an entry in ENGINE_PROFILES, defaults to DATABASE_PROFILE
+        url: Database URL
+
+    Returns:
+        The configured engine
+
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    profile = profile or DATABASE_PROFILE
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+
+    options = dict(ENGINE_PROFILES[profile])
+    pragmas = options.pop("pragmas")
+    database_url = make_url(url)
+    is_sqlite = database_url.get_backend_name() == "sqlite"
+
+    if is_sqlite:
+        # Pooled connections move between threads
+        options["connect_args"] = {"check_same_thread": False}
+        if database_url.database in (None, "", ":memory:") and "poolclass" in options:
+            # Every connection to :memory: is a separate database, so share one
+            options["poolclass"] = StaticPool
+            options.pop("pool_size", None)
+            options.pop("max_overflow", None)
+
+    engine = create_engine(url, **options)
+
+    if is_sqlite:
+        enable_sqlite_savepoints(engine)
+    if is_sqlite and pragmas:
+        @event.listens_for(engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+    return engine
+
+
+def enable_sqlite_savepoints(engine: Engine) -> None:
+    """
+    Let SQLAlchemy rather than pysqlite begin transactions on a SQLite engine.
+
+    pysqlite only begins a transaction before a write, so a savepoint taken
+    before the first write of a transaction starts one itself, and releasing
+    it commits. With the driver in autocommit mode and BEGIN emitted by
+    SQLAlchemy, savepoints nest inside the transaction as they should.
+    """
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_transaction(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+class UnitOfWorkSession(Session):
+    """
+    Session that defers commits to the unit of work it belongs to.
+
+    Repositories commit after every write. Inside a unit of work those commits
+    only flush, so all writes of one logical operation are committed together
+    when the unit ends. Outside a unit, commit behaves as usual.
+
+    Service methods run as operations of the unit, each in a savepoint. A
+    rollback inside an operation undoes only the operation's own writes, so
+    code that handles a failure by rolling back leaves the rest of the unit
+    intact. A rollback outside any operation discards every write of the
+    unit, so it marks the unit as failed and the unit raises instead of
+    committing the writes made after it.
+    """
+
+    def commit(self) -> None:
+        if self.info.get("unit_of_work"):
+            self.flush()
+        else:
+            super().commit()
+
+    def rollback(self) -> None:
+        operations = self.info.get("operations")
+        if self.info.get("unit_of_work") and operations:
+            # Undo the current operation and let it carry on in a fresh savepoint
+            operations[-1].rollback()
+            operations[-1] = self.begin_nested()
+            return
+        if self.info.get("unit_of_work"):
+            self.info["unit_of_work_failed"] = True
+        super().rollback()
+
+    @contextmanager
+    def operation(self) -> Iterator[None]:
+        """
+        Run one operation of the unit in a savepoint.
+
+        The savepoint is released when the block ends and rolled back if it
+        raises. Outside a unit of work the block runs as is.
+        """
+        if not self.info.get("unit_of_work"):
+            yield
+            return
+
+        operations = self.info.setdefault("operations", [])
+        depth = len(operations)
+        operations.append(self.begin_nested())
+        try:
+            yield
+        except BaseException:
+            savepoint = operations.pop(depth)
+            if savepoint.is_active:
+                savepoint.rollback()
+            raise
+        savepoint = operations.pop(depth)
+        if savepoint.is_active:
+            savepoint.commit()
+
+
+engine = create_database_engine()
+# Entities returned by an operation stay readable after its session is closed
+SessionLocal = sessionmaker(bind=engine, class_=UnitOfWorkSession, expire_on_commit=False)
+
+# Session of the unit of work open in the current thread or task
+_current_session: ContextVar[Optional[Session]] = ContextVar("current_session", default=None)
+
+
+def get_current_session() -> Optional[Session]:
+    """Return the session of the open unit of work, or None outside of one."""
+    return _current_session.get()
+
+
+@contextmanager
+def unit_of_work() -> Iterator[Session]:
+    """
+    Run a logical operation in one session and one transaction.
+
+    The outermost unit opens a session, commits once when the block ends and
+    rolls back if it raises, then returns the connection to the pool. Units
+    opened inside it join the outer one and neither commit nor close.
+
+    Yields:
+        The session of the unit
+
+    Raises:
+        DatabaseError: If the session was rolled back inside the unit, as the
+            unit's earlier writes are lost and the rest must not be committed
+    """
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    session = SessionLocal()
+    session.info["unit_of_work"] = True
+    token = _current_session.set(session)
+    try:
+        yield session
+        if session.info.get("unit_of_work_failed"):
+            raise DatabaseError("The unit of work was rolled back by one of its operations; "
+                                "none of its writes were committed")
+        session.info["unit_of_work"] = False
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        _current_session.reset(token)
+        session.close()
 
 
 def get_db():
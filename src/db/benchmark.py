@@ -0,0 +1,110 @@
+"""
+Throughput benchmark of the database engine profiles.
+
+Each profile gets a fresh SQLite file and the same mixed workload: several
+threads each commit small write transactions and read rows back by primary
+key, the access pattern of the application's services. Run it with
+
+    python db_manage.py benchmark [--operations N] [--threads N]
+"""
+
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select
+
+from src.db import ENGINE_PROFILES, create_database_engine
+
+_metadata = MetaData()
+_records = Table(
+    "benchmark_records", _metadata,
+    Column("id", Integer, primary_key=True),
+    Column("owner", Integer, nullable=False, index=True),
+    Column("payload", String(200), nullable=False)
+)
+
+# Reads performed after each committed write
+READS_PER_WRITE = 4
+
+
+@contextlib.contextmanager
+def _discard_statement_log():
+    """Send SQLAlchemy's echo output to devnull, keeping the cost of formatting it."""
+    handlers = [handler for handler in logging.getLogger("sqlalchemy.engine.Engine").handlers
+                if isinstance(handler, logging.StreamHandler)]
+    with open(os.devnull, "w") as devnull:
+        streams = [handler.setStream(devnull) for handler in handlers]
+        try:
+            yield
+        finally:
+            for handler, stream in zip(handlers, streams):
+                handler.setStream(stream)
+
+
+def _run_worker(engine, worker: int, operations: int) -> None:
+    """Commit one insert per operation and read back recent rows by key."""
+    payload = "x" * 100
+    for _ in range(operations):
+        with engine.begin() as connection:
+            row_id = connection.execute(
+                insert(_records).values(owner=worker, payload=payload)
+            ).inserted_primary_key[0]
+        with engine.connect() as connection:
+            for offset in range(READS_PER_WRITE):
+                connection.execute(select(_records).where(_records.c.id == max(1, row_id - offset))).first()
+
+
+def benchmark_profile(profile: str, operations: int = 500, threads: int = 4,
+                      directory: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Measure the throughput of one engine profile.
+
+    Args:
+        profile: Name of an entry in ENGINE_PROFILES
+        operations: Write transactions per thread
+        threads: Concurrent threads
+        directory: Where to create the database file, a temporary directory by default
+
+    Returns:
+        Dictionary with profile, transactions, seconds and transactions_per_second
+    """
+    workspace = directory or tempfile.mkdtemp(prefix="db_benchmark_")
+    path = os.path.join(workspace, f"{profile}.db")
+    try:
+        engine = create_database_engine(profile, f"sqlite:///{path}")
+        # Echoed statements are formatted but not printed
+        with _discard_statement_log():
+            _metadata.create_all(engine)
+
+            workers = [threading.Thread(target=_run_worker, args=(engine, worker, operations))
+                       for worker in range(threads)]
+            start_time = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            seconds = time.perf_counter() - start_time
+            engine.dispose()
+    finally:
+        if directory is None:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    transactions = operations * threads
+    return {
+        "profile": profile,
+        "transactions": transactions,
+        "seconds": seconds,
+        "transactions_per_second": transactions / seconds
+    }
+
+
+def benchmark_profiles(profiles: Optional[Iterable[str]] = None, operations: int = 500,
+                       threads: int = 4) -> Dict[str, Dict[str, Any]]:
+    """Benchmark several profiles, all of them by default."""
+    return {profile: benchmark_profile(profile, operations, threads) for profile in (profiles or ENGINE_PROFILES)}
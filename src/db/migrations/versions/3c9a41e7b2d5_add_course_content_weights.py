@@ -0,0 +1,40 @@
+"""add_course_content_weights
+
+Revision ID: 3c9a41e7b2d5
+Revises: 94fd62f3388c
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a41e7b2d5'
+down_revision: Union[str, None] = '94fd62f3388c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('course_content_weights',
+    sa.Column('course_id', sa.UUID(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('computed_version', sa.Integer(), nullable=True),
+    sa.Column('algorithm', sa.Integer(), nullable=False),
+    sa.Column('content_ids', sa.LargeBinary(), nullable=False),
+    sa.Column('weights', sa.LargeBinary(), nullable=False),
+    sa.Column('lesson_weights', sa.JSON(), nullable=False),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('course_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('course_content_weights')
@@ -22,7 +22,8 @@ from .enums import (
 from src.db.models.user import User, UserSetting, UserNotification, UserAnswer, Setting
 from src.db.models.content import (
     Course, Lesson, Content, TheoryContent, ExerciseContent, 
-    AssessmentContent, InteractiveContent, ResourceContent, Tag, CourseTag
+    AssessmentContent, InteractiveContent, ResourceContent, Tag, CourseTag,
+    CourseContentWeights
 )
 from src.db.models.progress import (
     Progress, UserContentProgress, CompletedLesson, 
@@ -43,6 +44,7 @@ __all__ = [
     'Achievement', 'UserAchievement',
     'Course', 'CourseTag', 'Lesson', 'Content', 'TheoryContent', 'ExerciseContent', 
     'AssessmentContent', 'InteractiveContent', 'ResourceContent', 'Tag',
+    'CourseContentWeights',
     'LearningGoal', 'PersonalBest',
     'Progress', 'UserContentProgress', 'CompletedLesson',
     'LearningTool', 'MathTool', 'InformaticsTool', 'UserToolUsage',
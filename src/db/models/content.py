@@ -1,4 +1,5 @@
 import uuid
+from itertools import chain
 from typing import Optional, List
 
 from sqlalchemy import (
@@ -10,9 +11,14 @@ from sqlalchemy import (
     ForeignKey,
     Float,
     JSON,
+    LargeBinary,
+    event,
+    inspect,
+    select,
+    update,
 )
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 
 from src.db.models.progress import Progress, UserContentProgress
 from src.db.models.base import Base
@@ -268,3 +274,99 @@ class Tag(UUIDPrimaryKeyMixin, TimestampMixin, Base):
         Index("idx_tag_name", "name"),
         Index("idx_tag_category", "category"),
     )
+
+
+class CourseContentWeights(UUIDPrimaryKeyMixin, TimestampMixin, Base):
+    """Precomputed progress weights of the content of a course.
+
+    The weights depend only on the structure of the course, so they are
+    computed once and stored as packed arrays in content order. Lesson and
+    content edits bump version; the arrays are current while computed_version
+    equals version.
+    """
+
+    __tablename__ = "course_content_weights"
+
+    course_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("courses.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
+    version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    computed_version: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    algorithm: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_ids: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # 16 bytes per UUID
+    weights: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # little-endian float64
+    lesson_weights: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+
+# Attributes the content weights are computed from
+_LESSON_WEIGHT_ATTRIBUTES = ("course_id", "lesson_order", "points_reward")
+_CONTENT_WEIGHT_ATTRIBUTES = ("lesson_id", "content_type")
+
+
+def _changed_values(instance, attributes):
+    """Return the old and new values of the attributes that changed, or None if none did."""
+    state = inspect(instance)
+    values = []
+    for name in attributes:
+        history = state.attrs[name].history
+        if history.has_changes():
+            values.extend(history.added)
+            values.extend(history.deleted)
+    return values or None
+
+
+def invalidate_course_content_weights(session: Session, course_ids=None) -> None:
+    """Mark the stored content weights of some courses, or of all courses, as stale."""
+    statement = update(CourseContentWeights).values(version=CourseContentWeights.version + 1)
+    if course_ids is not None:
+        course_ids = {course_id for course_id in course_ids if course_id is not None}
+        if not course_ids:
+            return
+        statement = statement.where(CourseContentWeights.course_id.in_(course_ids))
+    session.execute(statement)
+
+
+@event.listens_for(Session, "before_flush")
+def _invalidate_weights_on_structure_change(session, flush_context, instances):
+    """Invalidate the weights of the courses whose lessons or content are about to change."""
+    course_ids = set()
+    lesson_ids = set()
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Lesson):
+            if instance in session.new or instance in session.deleted:
+                course_ids.add(instance.course_id)
+            else:
+                course_ids.update(_changed_values(instance, ("course_id",)) or ())
+                if _changed_values(instance, _LESSON_WEIGHT_ATTRIBUTES):
+                    course_ids.add(instance.course_id)
+        elif isinstance(instance, Content):
+            if instance in session.new or instance in session.deleted:
+                lesson_ids.add(instance.lesson_id)
+            else:
+                lesson_ids.update(_changed_values(instance, ("lesson_id",)) or ())
+                if _changed_values(instance, _CONTENT_WEIGHT_ATTRIBUTES):
+                    lesson_ids.add(instance.lesson_id)
+
+    lesson_ids.discard(None)
+    if lesson_ids:
+        with session.no_autoflush:
+            course_ids.update(session.execute(
+                select(Lesson.course_id).where(Lesson.id.in_(lesson_ids))
+            ).scalars())
+    course_ids.discard(None)
+    if course_ids:
+        invalidate_course_content_weights(session, course_ids)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_weights_on_bulk_change(orm_execute_state):
+    """Invalidate all stored weights when a bulk statement writes lessons or content."""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    # Bulk statements do not say which courses they touch
+    if table is not None and table.name in (Lesson.__tablename__, Content.__tablename__):
+        invalidate_course_content_weights(orm_execute_state.session)
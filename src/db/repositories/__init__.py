@@ -16,6 +16,7 @@ from src.db.repositories.completed_course_repo import CompletedCourseRepository
 from src.db.repositories.completed_lesson_repo import CompletedLessonRepository
 from src.db.repositories.settings_repo import SettingsRepository
 from src.db.repositories.user_answers_repo import UserAnswersRepository
+from src.db.repositories.course_content_weights_repo import CourseContentWeightsRepository
 
 # Initialize repositories
 user_repo = UserRepository()
@@ -30,6 +31,7 @@ completed_course_repo = CompletedCourseRepository()
 completed_lesson_repo = CompletedLessonRepository()
 settings_repo = SettingsRepository()
 user_answers_repo = UserAnswersRepository()
+course_content_weights_repo = CourseContentWeightsRepository()
 
 __all__ = [
     'user_repo',
@@ -43,5 +45,6 @@ __all__ = [
     'completed_course_repo',
     'completed_lesson_repo',
     'settings_repo',
-    'user_answers_repo'
+    'user_answers_repo',
+    'course_content_weights_repo'
 ] 
\ No newline at end of file
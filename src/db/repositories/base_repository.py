@@ -5,7 +5,10 @@ This module provides a base repository interface that defines the standard
 operations to be supported by all repository implementations.
 """
 
-from typing import Generic, TypeVar, List, Optional, Any, Dict, Type
+from contextlib import contextmanager
+from typing import Generic, TypeVar, List, Optional, Any, Dict, Type, Iterable, Iterator, Sequence, Tuple, Union
+from sqlalchemy import insert, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from src.db.models import Base
@@ -25,6 +28,45 @@ logger = get_logger(__name__)
 # Define a type variable for the model
 T = TypeVar('T', bound=Base)
 
+# Rows sent per executemany call by the bulk operations
+DEFAULT_CHUNK_SIZE = 500
+
+# Entities per page of get_page
+DEFAULT_PAGE_SIZE = 100
+
+# Rows fetched at a time by iter_all and iter_filter
+DEFAULT_YIELD_PER = 1000
+
+
+def _chunks(rows: Sequence[Any], chunk_size: int) -> Iterator[Sequence[Any]]:
+    """Split rows into consecutive chunks of at most chunk_size items."""
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start:start + chunk_size]
+
+
+@contextmanager
+def write_scope(db: Session) -> Iterator[None]:
+    """Scope one repository write.
+    
+    Inside a unit of work the write runs in a savepoint, so a failed
+    write is undone without discarding the unit's earlier writes.
+    Outside a unit a failed write rolls back the session.
+    
+    Args:
+        db: The database session.
+    """
+    if db.info.get("unit_of_work") is True:
+        with db.begin_nested():
+            yield
+    else:
+        try:
+            yield
+        except Exception:
+            db.rollback()
+            raise
+
 
 class BaseRepository(Generic[T]):
     """Base repository interface for database operations.
@@ -42,6 +84,10 @@ class BaseRepository(Generic[T]):
         self.model = model
         self.model_name = model.__name__
     
+    def _write_scope(self, db: Session):
+        """Scope one write of the repository; see write_scope."""
+        return write_scope(db)
+    
     @handle_db_errors(operation="get_by_id")
     def get_by_id(self, db: Session, id: Any) -> Optional[T]:
         """Get an entity by its ID.
@@ -109,16 +155,16 @@ class BaseRepository(Generic[T]):
         """
         logger.debug(f"Creating new {self.model_name} with attributes: {kwargs}")
         try:
-            entity = self.model(**kwargs)
-            db.add(entity)
-            db.commit()
-            db.refresh(entity)
+            with self._write_scope(db):
+                entity = self.model(**kwargs)
+                db.add(entity)
+                db.commit()
+                db.refresh(entity)
             
             logger.info(f"Created {self.model_name} with ID: {entity.id}")
             return entity
             
         except Exception as e:
-            db.rollback()
             logger.error(f"Failed to create {self.model_name}: {str(e)}")
             
             # Handle validation errors separately if we can identify them
@@ -148,23 +194,23 @@ class BaseRepository(Generic[T]):
         logger.debug(f"Updating {self.model_name} with ID {id}, attributes: {kwargs}")
         
         try:
-            entity = self.get_by_id(db, id)
-            
-            if not entity:
-                logger.warning(f"{self.model_name} with ID {id} not found for update")
-                return None
+            with self._write_scope(db):
+                entity = self.get_by_id(db, id)
                 
-            for key, value in kwargs.items():
-                setattr(entity, key, value)
-                
-            db.commit()
-            db.refresh(entity)
+                if not entity:
+                    logger.warning(f"{self.model_name} with ID {id} not found for update")
+                    return None
+                    
+                for key, value in kwargs.items():
+                    setattr(entity, key, value)
+                    
+                db.commit()
+                db.refresh(entity)
             
             logger.info(f"Updated {self.model_name} with ID: {id}")
             return entity
             
         except Exception as e:
-            db.rollback()
             logger.error(f"Failed to update {self.model_name} with ID {id}: {str(e)}")
             
             raise DatabaseError(
@@ -186,20 +232,20 @@ class BaseRepository(Generic[T]):
         logger.debug(f"Deleting {self.model_name} with ID: {id}")
         
         try:
-            entity = self.get_by_id(db, id)
-            
-            if not entity:
-                logger.warning(f"{self.model_name} with ID {id} not found for deletion")
-                return False
+            with self._write_scope(db):
+                entity = self.get_by_id(db, id)
                 
-            db.delete(entity)
-            db.commit()
+                if not entity:
+                    logger.warning(f"{self.model_name} with ID {id} not found for deletion")
+                    return False
+                    
+                db.delete(entity)
+                db.commit()
             
             logger.info(f"Deleted {self.model_name} with ID: {id}")
             return True
             
         except Exception as e:
-            db.rollback()
             logger.error(f"Failed to delete {self.model_name} with ID {id}: {str(e)}")
             
             raise DatabaseError(
@@ -234,6 +280,96 @@ class BaseRepository(Generic[T]):
                 details={"model": self.model_name, "filter": kwargs}
             ) from e
     
+    def _key_columns(self) -> List[Any]:
+        """Columns of the stable order used to page and stream: (created_at, id), or id alone."""
+        created_at = getattr(self.model, "created_at", None)
+        return [created_at, self.model.id] if created_at is not None else [self.model.id]
+    
+    @handle_db_errors(operation="get_page")
+    def get_page(self, db: Session, limit: int = DEFAULT_PAGE_SIZE,
+                 after: Optional[Tuple[Any, ...]] = None,
+                 **kwargs) -> Tuple[List[T], Optional[Tuple[Any, ...]]]:
+        """Get one page of entities in (created_at, id) order.
+        
+        Pages are found by keyset: a page starts right after the cursor of the
+        previous one instead of skipping rows with OFFSET, so a deep page costs
+        the same as the first and rows inserted meanwhile do not shift pages.
+        
+        Args:
+            db: The database session.
+            limit: The maximum number of entities on the page.
+            after: The cursor returned with the previous page, None for the first page.
+            **kwargs: The attributes to filter by.
+            
+        Returns:
+            The entities of the page and the cursor of the next page, which is
+            None after the last page.
+        """
+        if limit < 1:
+            raise ValueError(f"limit must be positive, got {limit}")
+        logger.debug(f"Getting a page of {limit} {self.model_name} entities after {after}, filter: {kwargs}")
+        columns = self._key_columns()
+        
+        try:
+            query = db.query(self.model).filter_by(**kwargs)
+            if after is not None:
+                query = query.filter(tuple_(*columns) > tuple(after))
+            # One extra row tells whether another page follows
+            entities = query.order_by(*columns).limit(limit + 1).all()
+            
+        except SQLAlchemyError as e:
+            logger.error(f"Database error getting a page of {self.model_name} entities: {str(e)}")
+            raise QueryError(
+                message=f"Failed to get a page of {self.model_name} entities",
+                query=f"db.query({self.model_name}).filter_by({kwargs}).limit({limit + 1}).all()",
+                details={"model": self.model_name, "filter": kwargs, "after": str(after)}
+            ) from e
+        
+        if len(entities) <= limit:
+            return entities, None
+        entities = entities[:limit]
+        return entities, tuple(getattr(entities[-1], column.key) for column in columns)
+    
+    def iter_all(self, db: Session, batch_size: int = DEFAULT_YIELD_PER) -> Iterator[T]:
+        """Stream all entities in (created_at, id) order.
+        
+        Args:
+            db: The database session.
+            batch_size: Rows fetched from the cursor at a time.
+            
+        Yields:
+            The entities, one at a time.
+        """
+        return self.iter_filter(db, batch_size)
+    
+    def iter_filter(self, db: Session, batch_size: int = DEFAULT_YIELD_PER, **kwargs) -> Iterator[T]:
+        """Stream the entities matching a filter in (created_at, id) order.
+        
+        Rows are fetched batch_size at a time with yield_per. The session only
+        holds weak references to unmodified entities, so memory stays constant
+        however many rows are read, as long as the caller does not keep them.
+        
+        Args:
+            db: The database session.
+            batch_size: Rows fetched from the cursor at a time.
+            **kwargs: The attributes to filter by.
+            
+        Yields:
+            The matching entities, one at a time.
+        """
+        logger.debug(f"Streaming {self.model_name} entities by: {kwargs}")
+        query = db.query(self.model).filter_by(**kwargs).order_by(*self._key_columns())
+        try:
+            yield from query.yield_per(batch_size)
+            
+        except SQLAlchemyError as e:
+            logger.error(f"Database error streaming {self.model_name} entities: {str(e)}")
+            raise QueryError(
+                message=f"Failed to stream {self.model_name} entities",
+                query=f"db.query({self.model_name}).filter_by({kwargs}).yield_per({batch_size})",
+                details={"model": self.model_name, "filter": kwargs}
+            ) from e
+    
     @handle_db_errors(operation="count")
     def count(self, db: Session) -> int:
         """Count the number of entities.
@@ -258,4 +394,178 @@ class BaseRepository(Generic[T]):
                 message=f"Failed to count {self.model_name} entities",
                 query=f"db.query({self.model_name}).count()",
                 details={"model": self.model_name}
-            ) from e 
\ No newline at end of file
+            ) from e 
+    
+    @handle_db_errors(operation="get_by_ids")
+    def get_by_ids(self, db: Session, ids: Iterable[Any],
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[T]:
+        """Get the entities with the given IDs, one query per chunk of IDs.
+        
+        Args:
+            db: The database session.
+            ids: The IDs of the entities.
+            chunk_size: IDs per query.
+            
+        Returns:
+            The entities found, in no particular order.
+        """
+        ids = list(ids)
+        logger.debug(f"Getting {len(ids)} {self.model_name} entities by ID")
+        try:
+            entities = []
+            for chunk in _chunks(ids, chunk_size):
+                entities.extend(db.query(self.model).filter(self.model.id.in_(chunk)).all())
+            return entities
+            
+        except SQLAlchemyError as e:
+            logger.error(f"Database error getting {self.model_name} entities by ID: {str(e)}")
+            raise QueryError(
+                message=f"Failed to get {self.model_name} entities by ID",
+                query=f"db.query({self.model_name}).filter({self.model_name}.id.in_(...)).all()",
+                details={"model": self.model_name, "count": len(ids)}
+            ) from e
+    
+    @handle_db_errors(operation="bulk_create")
+    def bulk_create(self, db: Session, rows: Iterable[Dict[str, Any]],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    return_ids: bool = False) -> Union[int, List[Any]]:
+        """Insert many entities with one executemany per chunk and a single commit.
+        
+        Column defaults are applied as with create, but the inserted rows are
+        not loaded into the session.
+        
+        Args:
+            db: The database session.
+            rows: Dictionaries of attributes, one per entity.
+            chunk_size: Rows per executemany call.
+            return_ids: Return the generated IDs instead of the row count.
+            
+        Returns:
+            The number of rows inserted, or their IDs in the order of rows.
+        """
+        rows = list(rows)
+        logger.debug(f"Bulk creating {len(rows)} {self.model_name} entities")
+        statement = insert(self.model)
+        if return_ids:
+            statement = statement.returning(self.model.id, sort_by_parameter_order=True)
+        
+        try:
+            ids = []
+            with self._write_scope(db):
+                for chunk in _chunks(rows, chunk_size):
+                    result = db.execute(statement, chunk)
+                    if return_ids:
+                        ids.extend(result.scalars().all())
+                db.commit()
+            
+            logger.info(f"Bulk created {len(rows)} {self.model_name} entities")
+            return ids if return_ids else len(rows)
+            
+        except Exception as e:
+            logger.error(f"Failed to bulk create {self.model_name}: {str(e)}")
+            raise DatabaseError(
+                message=f"Failed to bulk create {self.model_name}",
+                details={"error": str(e), "count": len(rows)}
+            ) from e
+    
+    @handle_db_errors(operation="bulk_upsert")
+    def bulk_upsert(self, db: Session, rows: Iterable[Dict[str, Any]],
+                    conflict_columns: Sequence[str],
+                    update_columns: Optional[Sequence[str]] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    return_ids: bool = False) -> Union[int, List[Any]]:
+        """Insert many entities, updating the ones that already exist.
+        
+        Uses SQLite's INSERT ... ON CONFLICT DO UPDATE with one executemany per
+        chunk. All rows must have the same keys. Entities already loaded in the
+        session are not refreshed.
+        
+        Args:
+            db: The database session.
+            rows: Dictionaries of attributes, one per entity.
+            conflict_columns: Columns of the unique constraint that detects existing rows.
+            update_columns: Columns overwritten on conflict. Defaults to every
+                key of the rows except the conflict columns and id.
+            chunk_size: Rows per executemany call.
+            return_ids: Return the IDs of the inserted or updated rows instead of the row count.
+            
+        Returns:
+            The number of rows written, or their IDs in the order of rows.
+        """
+        rows = list(rows)
+        if not rows:
+            return [] if return_ids else 0
+        logger.debug(f"Bulk upserting {len(rows)} {self.model_name} entities on {list(conflict_columns)}")
+        
+        if update_columns is None:
+            update_columns = [key for key in rows[0] if key not in conflict_columns and key != "id"]
+        statement = sqlite_insert(self.model)
+        assignments = {column: statement.excluded[column] for column in update_columns}
+        # Columns with an onupdate, such as updated_at, take the value generated for the insert
+        for column in self.model.__table__.columns:
+            if column.onupdate is not None and column.name not in assignments:
+                assignments[column.name] = statement.excluded[column.name]
+        # A no-op update still returns the existing row, unlike DO NOTHING
+        statement = statement.on_conflict_do_update(
+            index_elements=list(conflict_columns),
+            set_=assignments or {column: statement.excluded[column] for column in conflict_columns}
+        )
+        if return_ids:
+            statement = statement.returning(self.model.id, sort_by_parameter_order=True)
+        
+        try:
+            ids = []
+            with self._write_scope(db):
+                for chunk in _chunks(rows, chunk_size):
+                    result = db.execute(statement, chunk)
+                    if return_ids:
+                        ids.extend(result.scalars().all())
+                db.commit()
+            
+            logger.info(f"Bulk upserted {len(rows)} {self.model_name} entities")
+            return ids if return_ids else len(rows)
+            
+        except Exception as e:
+            logger.error(f"Failed to bulk upsert {self.model_name}: {str(e)}")
+            raise DatabaseError(
+                message=f"Failed to bulk upsert {self.model_name}",
+                details={"error": str(e), "count": len(rows)}
+            ) from e
+    
+    @handle_db_errors(operation="bulk_update")
+    def bulk_update(self, db: Session, rows: Iterable[Dict[str, Any]],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+        """Update many entities by primary key with one executemany per chunk.
+        
+        Each row holds the id of an entity and the attributes to set on it.
+        Rows with the same keys are sent together. Entities already loaded in
+        the session are not refreshed.
+        
+        Args:
+            db: The database session.
+            rows: Dictionaries with id and the attributes to update.
+            chunk_size: Rows per executemany call.
+            
+        Returns:
+            The number of rows submitted.
+        """
+        rows = list(rows)
+        logger.debug(f"Bulk updating {len(rows)} {self.model_name} entities")
+        if any("id" not in row for row in rows):
+            raise ValueError(f"Every row of a {self.model_name} bulk update needs an id")
+        
+        try:
+            with self._write_scope(db):
+                for chunk in _chunks(rows, chunk_size):
+                    db.execute(update(self.model), chunk)
+                db.commit()
+            
+            logger.info(f"Bulk updated {len(rows)} {self.model_name} entities")
+            return len(rows)
+            
+        except Exception as e:
+            logger.error(f"Failed to bulk update {self.model_name}: {str(e)}")
+            raise DatabaseError(
+                message=f"Failed to bulk update {self.model_name}",
+                details={"error": str(e), "count": len(rows)}
+            ) from e
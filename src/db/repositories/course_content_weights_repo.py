@@ -0,0 +1,127 @@
+"""
+Repository module for CourseContentWeights model in the Mathtermind application.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import uuid
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.db.models import CourseContentWeights
+from .base_repository import BaseRepository
+
+
+class CourseContentWeightsRepository(BaseRepository[CourseContentWeights]):
+    """Repository for CourseContentWeights model."""
+
+    def __init__(self):
+        """Initialize the repository with the CourseContentWeights model."""
+        super().__init__(CourseContentWeights)
+
+    def get_by_course(self, db: Session, course_id: uuid.UUID) -> Optional[CourseContentWeights]:
+        """
+        Get the stored weights record of a course.
+
+        Args:
+            db: Database session
+            course_id: Course ID
+
+        Returns:
+            The weights record if one exists, None otherwise
+        """
+        return db.query(CourseContentWeights).filter(
+            CourseContentWeights.course_id == course_id
+        ).first()
+
+    def get_weights(self, db: Session, course_id: uuid.UUID,
+                    algorithm: int) -> Optional[Tuple[List[str], np.ndarray, Dict[str, float]]]:
+        """
+        Get the current content weights of a course.
+
+        Args:
+            db: Database session
+            course_id: Course ID
+            algorithm: Version of the weighting algorithm the caller expects
+
+        Returns:
+            A tuple of the content IDs, their weights and the lesson weights, or
+            None if no weights are stored or the stored ones are stale
+        """
+        record = self.get_by_course(db, course_id)
+        if (record is None or record.computed_version != record.version
+                or record.algorithm != algorithm):
+            return None
+
+        content_ids = [str(uuid.UUID(bytes=record.content_ids[i:i + 16]))
+                       for i in range(0, len(record.content_ids), 16)]
+        weights = np.frombuffer(record.weights, dtype="<f8").astype(float)
+        return content_ids, weights, record.lesson_weights
+
+    def get_current_version(self, db: Session, course_id: uuid.UUID) -> int:
+        """
+        Get the current structure version of a course, as stored in the database.
+
+        Courses without a weights record get an empty, stale one, so that
+        edits made from now on bump a version save_weights can compare with.
+
+        Args:
+            db: Database session
+            course_id: Course ID
+
+        Returns:
+            The version to pass to save_weights once the weights are computed
+        """
+        statement = select(CourseContentWeights.version).where(CourseContentWeights.course_id == course_id)
+        version = db.execute(statement).scalar_one_or_none()
+        if version is not None:
+            return version
+
+        # A record another session created first is kept, and the caller's session is never rolled back
+        db.execute(
+            sqlite_insert(CourseContentWeights)
+            .values(course_id=course_id, version=1, computed_version=None, algorithm=0,
+                    content_ids=b"", weights=b"", lesson_weights={})
+            .on_conflict_do_nothing(index_elements=["course_id"])
+        )
+        db.commit()
+        return db.execute(statement).scalar_one()
+
+    def save_weights(self, db: Session, course_id: uuid.UUID, algorithm: int, version: int,
+                     content_ids: List[str], weights: np.ndarray,
+                     lesson_weights: Dict[str, float]) -> bool:
+        """
+        Store the content weights of a course as its current weights.
+
+        The weights are only stored if the course is still at the version
+        read with get_current_version before its structure was loaded. If a
+        lesson or content edit happened in between, the record stays stale
+        and the weights are computed again on next use.
+
+        Args:
+            db: Database session
+            course_id: Course ID
+            algorithm: Version of the weighting algorithm that computed them
+            version: Structure version the weights were computed from
+            content_ids: Content IDs in weight order
+            weights: Weight of each content item
+            lesson_weights: Weight of each lesson by lesson ID
+
+        Returns:
+            True if the weights were stored, False if the course changed meanwhile
+        """
+        result = db.execute(
+            update(CourseContentWeights)
+            .where(CourseContentWeights.course_id == course_id, CourseContentWeights.version == version)
+            .values(
+                computed_version=version,
+                algorithm=algorithm,
+                content_ids=b"".join(uuid.UUID(str(content_id)).bytes for content_id in content_ids),
+                weights=np.asarray(weights, dtype="<f8").tobytes(),
+                lesson_weights=lesson_weights,
+            )
+        )
+        db.commit()
+        return result.rowcount == 1
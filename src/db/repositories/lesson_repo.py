@@ -202,6 +202,31 @@ class LessonRepository(BaseRepository[Lesson]):
             Lesson.course_id == course_id
         ).order_by(Lesson.lesson_order).all()
     
+    def get_course_content_outline(self, db: Session, course_id: uuid.UUID) -> List[Any]:
+        """
+        Get every lesson of a course with its content items in one query.
+        
+        Args:
+            db: Database session
+            course_id: Course ID
+            
+        Returns:
+            Rows with lesson_id, lesson_order, points_reward, content_id and
+            content_type, ordered by lesson and content order. A lesson without
+            content appears once with content_id and content_type set to None.
+        """
+        return db.query(
+            Lesson.id.label("lesson_id"),
+            Lesson.lesson_order,
+            Lesson.points_reward,
+            Content.id.label("content_id"),
+            Content.content_type
+        ).outerjoin(
+            Content, Content.lesson_id == Lesson.id
+        ).filter(
+            Lesson.course_id == course_id
+        ).order_by(Lesson.lesson_order, Content.order).all()
+    
     def get_required_lessons(self, db: Session, course_id: uuid.UUID) -> List[Lesson]:
         """
         Get all required lessons for a course.
@@ -14,6 +14,7 @@ from sqlalchemy.orm import Session
 
 from src.db.models.content import Tag, Course, CourseTag
 from src.db.models.enums import Category
+from src.db.repositories.base_repository import write_scope
 
 
 class TagRepository:
@@ -32,12 +33,12 @@ class TagRepository:
             The created Tag instance, or None if an error occurred
         """
         try:
-            tag = Tag(id=uuid.uuid4(), name=name, category=category)
-            session.add(tag)
-            session.commit()
+            with write_scope(session):
+                tag = Tag(id=uuid.uuid4(), name=name, category=category)
+                session.add(tag)
+                session.commit()
             return tag
         except SQLAlchemyError as e:
-            session.rollback()
             logging.error(f"Error creating tag: {str(e)}")
             return None
 
@@ -132,15 +133,14 @@ class TagRepository:
             if not tag:
                 return None
 
-            if name is not None:
-                tag.name = name
-            if category is not None:
-                tag.category = category
-
-            session.commit()
+            with write_scope(session):
+                if name is not None:
+                    tag.name = name
+                if category is not None:
+                    tag.category = category
+                session.commit()
             return tag
         except SQLAlchemyError as e:
-            session.rollback()
             logging.error(f"Error updating tag: {str(e)}")
             return None
 
@@ -160,11 +160,11 @@ class TagRepository:
             if not tag:
                 return False
 
-            session.delete(tag)
-            session.commit()
+            with write_scope(session):
+                session.delete(tag)
+                session.commit()
             return True
         except SQLAlchemyError as e:
-            session.rollback()
             logging.error(f"Error deleting tag: {str(e)}")
             return False
 
@@ -206,12 +206,12 @@ class TagRepository:
                 return True
 
             # Create new association
-            course_tag = CourseTag(tag_id=tag_id, course_id=course_id)
-            session.add(course_tag)
-            session.commit()
+            with write_scope(session):
+                course_tag = CourseTag(tag_id=tag_id, course_id=course_id)
+                session.add(course_tag)
+                session.commit()
             return True
         except SQLAlchemyError as e:
-            session.rollback()
             logging.error(f"Error adding tag to course: {str(e)}")
             return False
 
@@ -241,11 +241,11 @@ class TagRepository:
                 return False
 
             # Delete the association
-            session.delete(association)
-            session.commit()
+            with write_scope(session):
+                session.delete(association)
+                session.commit()
             return True
         except SQLAlchemyError as e:
-            session.rollback()
             logging.error(f"Error removing tag from course: {str(e)}")
             return False
 
@@ -8,7 +8,7 @@ from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 
-from src.db.models import UserContentProgress, Content
+from src.db.models import UserContentProgress, Content, Lesson
 from .base_repository import BaseRepository
 
 
@@ -102,6 +102,33 @@ class UserContentProgressRepository(BaseRepository[UserContentProgress]):
             UserContentProgress.lesson_id == lesson_id
         ).all()
     
+    def get_course_content_progress(self, db: Session,
+                                    user_id: uuid.UUID,
+                                    course_id: uuid.UUID) -> List[Any]:
+        """
+        Get a user's progress on all content of a course in one query.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            course_id: Course ID
+            
+        Returns:
+            Rows with content_id, is_completed and score
+        """
+        return db.query(
+            UserContentProgress.content_id,
+            UserContentProgress.is_completed,
+            UserContentProgress.score
+        ).join(
+            Content, Content.id == UserContentProgress.content_id
+        ).join(
+            Lesson, Lesson.id == Content.lesson_id
+        ).filter(
+            UserContentProgress.user_id == user_id,
+            Lesson.course_id == course_id
+        ).all()
+    
     def update_progress(self, db: Session, 
                       progress_id: uuid.UUID,
                       status: Optional[str] = None,
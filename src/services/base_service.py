@@ -7,13 +7,14 @@ It includes enhanced error handling, transaction management utilities,
 and caching for frequently accessed data.
 """
 
+import inspect
 import logging
 import functools
 import time
 from datetime import timedelta
 from contextlib import contextmanager
 from typing import Generic, TypeVar, List, Optional, Any, Dict, Type, Callable, Union, Tuple, Set
-from src.db import get_db
+from src.db import get_current_session, unit_of_work as open_unit_of_work
 from src.db.models import Base
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
 from sqlalchemy.orm import Session
@@ -43,6 +44,22 @@ class ConcurrencyError(ServiceError):
     pass
 
 
+def unit_of_work_method(func: Callable) -> Callable:
+    """Run a service method in a unit of work, joining one that is already open."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.unit_of_work():
+            return func(self, *args, **kwargs)
+    wrapper.__unit_of_work__ = True
+    return wrapper
+
+
+def outside_unit_of_work(func: Callable) -> Callable:
+    """Keep a public service method that does not use the database out of a unit of work."""
+    func.__unit_of_work__ = False
+    return func
+
+
 class BaseService(Generic[T]):
     """Base service class for business logic operations.
     
@@ -52,8 +69,30 @@ class BaseService(Generic[T]):
     - Enhanced error handling with specific exception types
     - Transaction management utilities
     - Caching for frequently accessed data
+    
+    Every public method of a subclass runs as one unit of work: it gets a
+    session from the pool, commits once when it returns and releases the
+    session afterwards. Services called from inside the method join its unit.
+    Services that never use the database set uses_database to False, and
+    single methods opt out with outside_unit_of_work.
     """
     
+    # Whether the public methods of the service run in a unit of work
+    uses_database = True
+    
+    def __init_subclass__(cls, **kwargs):
+        """Wrap the public methods of the subclass in a unit of work."""
+        super().__init_subclass__(**kwargs)
+        if not cls.uses_database:
+            return
+        for name, member in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(member):
+                continue
+            # Generators would outlive the unit, and marked methods either have one or opted out
+            if inspect.isgeneratorfunction(member) or hasattr(member, "__unit_of_work__"):
+                continue
+            setattr(cls, name, unit_of_work_method(member))
+    
     def __init__(self, repository=None, test_mode=False):
         """Initialize the service with a repository.
         
@@ -63,7 +102,7 @@ class BaseService(Generic[T]):
         """
         self.repository = repository
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.db = next(get_db())
+        self._session = None
         self.test_mode = test_mode
         
         # Cache configuration
@@ -72,12 +111,52 @@ class BaseService(Generic[T]):
         self._default_ttl = timedelta(minutes=5)
         self._max_cache_size = 100
     
+    @property
+    def db(self) -> Session:
+        """The session of the current unit of work.
+        
+        A session assigned to the service, for example in tests, takes
+        precedence and is used for every operation.
+        
+        Raises:
+            RuntimeError: If no session is assigned and no unit of work is open.
+        """
+        if self._session is not None:
+            return self._session
+        session = get_current_session()
+        if session is None:
+            raise RuntimeError(f"{self.__class__.__name__} used the database outside a unit of work")
+        return session
+    
+    @db.setter
+    def db(self, session: Optional[Session]) -> None:
+        self._session = session
+    
+    @contextmanager
+    def unit_of_work(self):
+        """Context manager for a unit of work.
+        
+        Opens a unit of work or joins the one already open, and runs the
+        block as one operation of it: a rollback inside the block only undoes
+        the block's own writes. An assigned session is used as is; its owner
+        commits and closes it.
+        
+        Yields:
+            The database session.
+        """
+        if self._session is not None:
+            yield self._session
+        else:
+            with open_unit_of_work() as session, session.operation():
+                yield session
+    
     @contextmanager
     def transaction(self):
         """Context manager for transaction management.
         
         Manages a database transaction, committing on success and
-        rolling back on exception.
+        rolling back on exception. Inside a unit of work the commit is
+        deferred to the end of the unit.
         
         Yields:
             The database session.
@@ -85,22 +164,23 @@ class BaseService(Generic[T]):
         Raises:
             DatabaseError: If a database operation fails.
         """
-        try:
-            yield self.db
-            self.db.commit()
-        except SQLAlchemyError as e:
-            self.db.rollback()
-            self.logger.error(f"Transaction failed: {str(e)}")
-            if isinstance(e, IntegrityError):
-                raise DatabaseError(f"Integrity constraint violated: {str(e)}") from e
-            elif isinstance(e, DataError):
-                raise DatabaseError(f"Invalid data format: {str(e)}") from e
-            else:
-                raise DatabaseError(f"Database error: {str(e)}") from e
-        except Exception as e:
-            self.db.rollback()
-            self.logger.error(f"Transaction failed due to non-database error: {str(e)}")
-            raise
+        with self.unit_of_work() as db:
+            try:
+                yield db
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                self.logger.error(f"Transaction failed: {str(e)}")
+                if isinstance(e, IntegrityError):
+                    raise DatabaseError(f"Integrity constraint violated: {str(e)}") from e
+                elif isinstance(e, DataError):
+                    raise DatabaseError(f"Invalid data format: {str(e)}") from e
+                else:
+                    raise DatabaseError(f"Database error: {str(e)}") from e
+            except Exception as e:
+                db.rollback()
+                self.logger.error(f"Transaction failed due to non-database error: {str(e)}")
+                raise
     
     def execute_in_transaction(self, func: Callable, *args, **kwargs) -> Any:
         """Execute a function within a transaction.
@@ -122,6 +202,10 @@ class BaseService(Generic[T]):
     def batch_operation(self, items: List[Any], operation: Callable[[Any], None], batch_size: int = 100) -> None:
         """Execute an operation on items in batches.
         
+        Each batch runs in one transaction. Plain inserts and updates are
+        faster with the repository bulk operations, which send a whole chunk
+        in one executemany.
+        
         Args:
             items: The items to process.
             operation: The operation to execute on each item.
@@ -234,6 +318,7 @@ class BaseService(Generic[T]):
         if errors:
             raise ValidationError(f"Validation errors: {errors}")
     
+    @unit_of_work_method
     def get_by_id(self, id: Any) -> Optional[T]:
         """Get an entity by its ID.
         
@@ -260,6 +345,7 @@ class BaseService(Generic[T]):
                 raise
             return None
     
+    @unit_of_work_method
     def get_all(self) -> List[T]:
         """Get all entities.
         
@@ -274,6 +360,7 @@ class BaseService(Generic[T]):
                 raise
             return []
     
+    @unit_of_work_method
     def create(self, **kwargs) -> Optional[T]:
         """Create a new entity.
         
@@ -298,6 +385,7 @@ class BaseService(Generic[T]):
                 raise
             return None
     
+    @unit_of_work_method
     def update(self, id: Any, **kwargs) -> Optional[T]:
         """Update an entity.
         
@@ -327,6 +415,7 @@ class BaseService(Generic[T]):
                 raise
             return None
     
+    @unit_of_work_method
     def delete(self, id: Any) -> bool:
         """Delete an entity.
         
@@ -354,6 +443,7 @@ class BaseService(Generic[T]):
                 raise
             return False
     
+    @unit_of_work_method
     def filter_by(self, **kwargs) -> List[T]:
         """Filter entities by attributes.
         
@@ -371,6 +461,7 @@ class BaseService(Generic[T]):
                 raise
             return []
     
+    @unit_of_work_method
     def count(self) -> int:
         """Count the number of entities.
         
@@ -385,6 +476,7 @@ class BaseService(Generic[T]):
                 raise
             return 0
     
+    @unit_of_work_method
     def exists(self, id: Any) -> bool:
         """Check if an entity exists.
         
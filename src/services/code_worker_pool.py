@@ -0,0 +1,373 @@
+"""
+Pre-warmed worker pool for running code submissions.
+
+Starting a fresh interpreter for every submission and test case dominates
+the cost of grading short exercises. CodeWorkerPool keeps a fixed number of
+resource-limited worker processes running, sends each job with its whole
+batch of test cases over the worker's pipe and reads back a structured
+result. Python jobs go to sandbox_worker.py and JavaScript jobs to
+sandbox_worker.js; both speak the same protocol. A worker runs every job in
+a fresh child of its own and enforces the job's timeout on it, so workers
+survive failed jobs. They are recycled after a number of jobs, and killed
+and replaced when they stop replying.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.services.sandbox_process import MAX_OPEN_FILES, MAX_PROCESSES, sandbox_limits
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+NODE_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.js")
+
+# Number of workers kept warm by default
+DEFAULT_POOL_SIZE = min(4, os.cpu_count() or 1)
+
+# Jobs a worker serves before it is replaced. Jobs run in their own child
+# processes, so this only bounds how long one warmed-up worker lives
+DEFAULT_MAX_JOBS_PER_WORKER = 50
+
+# Wall clock seconds a single job may run
+DEFAULT_JOB_TIMEOUT = 5.0
+
+# Address space limit of a worker in bytes
+DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+
+# Address space limit per language; V8 reserves far more address space than it uses
+DEFAULT_MEMORY_LIMITS = {
+    "python": DEFAULT_MEMORY_LIMIT,
+    "javascript": 2 * 1024 * 1024 * 1024
+}
+
+# V8 heap limit of a Node.js worker and of each job's worker thread in megabytes
+JAVASCRIPT_HEAP_LIMIT_MB = 256
+
+# Seconds to wait for a new worker to finish warming up
+WORKER_STARTUP_TIMEOUT = 10.0
+
+# Seconds beyond a job's timeout the worker gets to report it; a worker
+# silent for longer is killed
+WORKER_REPLY_GRACE = 2.0
+
+
+def worker_command(language: str, memory_limit: int,
+                   cpu_limit: int) -> Tuple[List[str], Optional[Callable[[], None]]]:
+    """
+    Build the command starting a sandbox worker for a language.
+
+    Args:
+        language: "python" or "javascript"
+        memory_limit: Address space limit in bytes (0 for none)
+        cpu_limit: CPU time limit in seconds (0 for none)
+
+    Returns:
+        Tuple of (command, preexec function applying the limits or None)
+    """
+    if language == "python":
+        # The Python worker applies its limits itself, after setting up its pipes
+        return [sys.executable, "-I", "-u", WORKER_SCRIPT, str(memory_limit), str(cpu_limit),
+                str(MAX_OPEN_FILES), str(MAX_PROCESSES)], None
+    if language == "javascript":
+        return (["node", f"--max-old-space-size={JAVASCRIPT_HEAP_LIMIT_MB}", NODE_WORKER_SCRIPT,
+                 str(JAVASCRIPT_HEAP_LIMIT_MB)],
+                sandbox_limits(memory_limit, cpu_limit or None))
+    raise ValueError(f"Unsupported language: {language}")
+
+
+class _Worker:
+    """A single sandbox worker process and its private working directory."""
+
+    def __init__(self, command: List[str], preexec_fn: Optional[Callable[[], None]] = None):
+        self.workspace = tempfile.mkdtemp(prefix="cs_tools_worker_")
+        self.jobs = 0
+        self.timed_out = False
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            cwd=self.workspace,
+            preexec_fn=preexec_fn,
+            # Job processes share the worker's process group, so killing the
+            # group also stops a job the worker could not
+            start_new_session=os.name == "posix"
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Wait for the worker's ready message."""
+        reply = self._read_reply(timeout)
+        return bool(reply and reply.get("ready"))
+
+    def execute(self, job: Dict[str, Any], timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Send a job and wait for its reply.
+
+        Returns:
+            The reply, or None if the worker timed out or died
+        """
+        self.jobs += 1
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except OSError:
+            return None
+        return self._read_reply(timeout)
+
+    def _read_reply(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Read one reply line, killing the worker if none arrives in time."""
+        self.timed_out = False
+        timer = threading.Timer(timeout, self._expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            line = self.process.stdout.readline()
+        except (OSError, ValueError):
+            line = ""
+        finally:
+            timer.cancel()
+
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def _expire(self) -> None:
+        self.timed_out = True
+        self._kill()
+
+    def _kill(self) -> None:
+        """Kill the worker together with any job process it started."""
+        if os.name == "posix":
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                return
+            except OSError:
+                pass
+        self.process.kill()
+
+    def close(self) -> None:
+        """Stop the worker and remove its working directory."""
+        try:
+            if self.alive and not self.process.stdin.closed:
+                self.process.stdin.close()
+                try:
+                    self.process.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    self._kill()
+                    self.process.wait()
+            self.process.stdout.close()
+        except Exception as e:
+            logger.warning(f"Failed to stop sandbox worker: {str(e)}")
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+
+class CodeWorkerPool:
+    """
+    Fixed-size pool of pre-warmed sandbox workers for one language.
+
+    Each job is handed to an idle worker; callers block while all workers are
+    busy. A worker is replaced after max_jobs_per_worker jobs and whenever it
+    stops replying or exits unexpectedly.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE,
+                 max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+                 timeout: float = DEFAULT_JOB_TIMEOUT,
+                 memory_limit: Optional[int] = None,
+                 language: str = "python"):
+        """
+        Start the pool's workers.
+
+        Args:
+            size: Number of worker processes
+            max_jobs_per_worker: Jobs served by a worker before it is recycled
+            timeout: Default wall clock timeout of a job in seconds
+            memory_limit: Address space limit of each worker in bytes (0 for
+                none), defaults to the language's entry in DEFAULT_MEMORY_LIMITS
+            language: Language of the submissions, "python" or "javascript"
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        if language not in DEFAULT_MEMORY_LIMITS:
+            raise ValueError(f"Unsupported language: {language}")
+
+        self.size = size
+        self.language = language
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.timeout = timeout
+        self.memory_limit = DEFAULT_MEMORY_LIMITS[language] if memory_limit is None else memory_limit
+        # CPU backstop for the whole life of a worker; individual jobs are
+        # bounded by the wall clock timeout
+        self.cpu_limit = int(timeout * max_jobs_per_worker) + 1
+
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"jobs": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+
+        workers = [self._spawn() for _ in range(size)]
+        for worker in workers:
+            self._release_fresh(worker)
+
+    def run(self, code: str, test_cases: Optional[List[Dict[str, Any]]] = None,
+            function: Optional[str] = None, stdin: Optional[str] = None,
+            timeout: Optional[float] = None, test_timeout: Optional[float] = None,
+            complexity: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Run a submission in a pooled worker.
+
+        Args:
+            code: The code to run
+            test_cases: Optional test cases, each with input and expected_output
+            function: Name of the function the test cases call
+            stdin: Optional text provided as standard input (Python only)
+            timeout: Wall clock timeout in seconds, defaults to the pool's
+            test_timeout: Optional time budget of each test case in seconds
+            complexity: Optional scaling measurement of the function, see
+                sandbox_worker.py (Python only)
+
+        Returns:
+            Dictionary with output, error, results, execution_time,
+            resource_usage, success and, when requested, complexity
+        """
+        if self._closed:
+            raise RuntimeError("Worker pool has been shut down")
+
+        timeout = timeout or self.timeout
+        job = {
+            "code": code,
+            "stdin": stdin,
+            "function": function,
+            "test_cases": test_cases or [],
+            "test_timeout": test_timeout,
+            "complexity": complexity,
+            "timeout": timeout
+        }
+
+        worker = self._acquire()
+        start_time = time.time()
+        reply = worker.execute(job, timeout + WORKER_REPLY_GRACE)
+        execution_time = time.time() - start_time
+
+        # The worker reports jobs it had to kill or that died; only a worker
+        # that does not reply at all is replaced
+        failure = reply.pop("job_failure", None) if reply is not None else None
+        with self._lock:
+            self._stats["jobs"] += 1
+            if reply is None:
+                failure = "timeout" if worker.timed_out else "crash"
+            if failure:
+                self._stats["timeouts" if failure == "timeout" else "crashes"] += 1
+
+        self._release(worker, discard=reply is None or bool(reply.pop("retire", False)))
+        if reply is None:
+            error = (f"Execution timed out after {timeout} seconds" if worker.timed_out
+                     else "Worker process exited unexpectedly")
+            reply = {"success": False, "output": "", "error": error, "results": [], "resource_usage": None}
+
+        reply["execution_time"] = execution_time
+        return reply
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool counters."""
+        with self._lock:
+            return dict(self._stats, size=self.size, idle=self._idle.qsize())
+
+    def shutdown(self) -> None:
+        """Stop all idle workers; busy workers are stopped when released."""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.close()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(*worker_command(self.language, self.memory_limit, self.cpu_limit))
+
+    def _start_worker(self, worker: _Worker) -> _Worker:
+        """Wait for a new worker to warm up."""
+        if not worker.wait_ready(WORKER_STARTUP_TIMEOUT):
+            worker.close()
+            raise RuntimeError("Sandbox worker failed to start")
+        return worker
+
+    def _release_fresh(self, worker: _Worker) -> None:
+        self._idle.put(self._start_worker(worker))
+
+    def _acquire(self) -> _Worker:
+        """
+        Take an idle worker, blocking while all are busy.
+
+        A None slot marks a worker that could not be replaced earlier; it is
+        started again here.
+        """
+        worker = self._idle.get()
+        if worker is not None:
+            return worker
+        try:
+            return self._start_worker(self._spawn())
+        except Exception:
+            self._idle.put(None)
+            raise
+
+    def _release(self, worker: _Worker, discard: bool = False) -> None:
+        """
+        Return a worker to the pool, replacing it if it is spent or dead.
+
+        Args:
+            worker: The worker that finished a job
+            discard: Replace the worker regardless, e.g. after it failed to reply
+        """
+        if self._closed:
+            worker.close()
+            return
+        if not discard and worker.alive and worker.jobs < self.max_jobs_per_worker:
+            self._idle.put(worker)
+            return
+
+        if not discard:
+            with self._lock:
+                self._stats["recycled"] += 1
+        worker.close()
+        try:
+            self._release_fresh(self._spawn())
+        except Exception as e:
+            logger.error(f"Failed to replace sandbox worker: {str(e)}")
+            self._idle.put(None)
+
+
+_worker_pools: Dict[str, CodeWorkerPool] = {}
+_worker_pool_lock = threading.Lock()
+
+
+def get_code_worker_pool(language: str = "python") -> CodeWorkerPool:
+    """Get the shared worker pool of a language, starting it on first use."""
+    with _worker_pool_lock:
+        pool = _worker_pools.get(language)
+        if pool is None:
+            pool = _worker_pools[language] = CodeWorkerPool(language=language)
+            atexit.register(pool.shutdown)
+        return pool
@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, List, Optional, Any, Union, Tuple
+from typing import Dict, List, Optional, Any, Union, Tuple, Iterator
 import re
 import subprocess
 import tempfile
@@ -8,9 +8,22 @@ import shutil
 import json
 import time
 import math
+import ast
+import itertools
+import hashlib
+import sqlite3
+import sys
+import threading
+from functools import lru_cache, partial
+
+from config import DATA_DIR
 
 from src.services.base_service import BaseService, handle_service_errors
 from src.services.tracking_service import TrackingService
+from src.services.code_worker_pool import get_code_worker_pool
+from src.services.sandbox_process import run_sandboxed
+from src.services.syntax_checker import check_syntax
+from src.services.submission_similarity import DEFAULT_MIN_SIMILARITY, get_submission_similarity_index
 
 logger = logging.getLogger(__name__)
 
@@ -19,23 +32,557 @@ SUPPORTED_LANGUAGES = {
     "python": {
         "extension": ".py",
         "command": "python",
-        "comment_symbol": "#"
+        "comment_symbol": "#",
+        "address_space_limit": 512 * 1024 * 1024
     },
     "javascript": {
         "extension": ".js",
         "command": "node",
-        "comment_symbol": "//"
+        "comment_symbol": "//",
+        # V8 reserves about 1 GB of address space at startup
+        "address_space_limit": 2048 * 1024 * 1024
+    }
+}
+
+# SQLite file holding cached grading results
+RESULT_CACHE_PATH = DATA_DIR / "cs_grading_results.db"
+
+# Bounds of the grading result cache; least recently used results are evicted first
+RESULT_CACHE_MAX_ENTRIES = 20000
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Errors that depend on machine load rather than the submission, never cached
+TRANSIENT_ERROR_MARKERS = ("timed out", "Timeout:", "Worker process exited unexpectedly")
+
+# Algorithms prepare_algorithm_visualization can visualize
+SUPPORTED_ALGORITHMS = (
+    "bubble_sort", "insertion_sort", "selection_sort", "merge_sort",
+    "quick_sort", "linear_search", "binary_search"
+)
+
+# Minimum number of steps between full array snapshots in delta-encoded
+# visualizations; the interval grows with the array so snapshots stay O(1) per step
+KEYFRAME_INTERVAL = 64
+
+# Default number of steps in one page of an algorithm visualization
+VISUALIZATION_PAGE_SIZE = 500
+
+# Steps prepare_algorithm_visualization returns at most; longer runs are paged
+VISUALIZATION_MAX_STEPS = 200000
+
+# Static properties reported with each algorithm visualization
+ALGORITHM_PROPERTIES = {
+    "bubble_sort": {
+        "time_complexity": {"best": "O(n)", "average": "O(n²)", "worst": "O(n²)"},
+        "space_complexity": "O(1)",
+        "stable": True
+    },
+    "insertion_sort": {
+        "time_complexity": {"best": "O(n)", "average": "O(n²)", "worst": "O(n²)"},
+        "space_complexity": "O(1)",
+        "stable": True
+    },
+    "selection_sort": {
+        "time_complexity": {"best": "O(n²)", "average": "O(n²)", "worst": "O(n²)"},
+        "space_complexity": "O(1)",
+        "stable": False
+    },
+    "merge_sort": {
+        "time_complexity": {"best": "O(n log n)", "average": "O(n log n)", "worst": "O(n log n)"},
+        "space_complexity": "O(n)",
+        "stable": True
+    },
+    "quick_sort": {
+        "time_complexity": {"best": "O(n log n)", "average": "O(n log n)", "worst": "O(n²)"},
+        "space_complexity": "O(log n)",
+        "stable": False
+    },
+    "linear_search": {
+        "time_complexity": {"best": "O(1)", "average": "O(n)", "worst": "O(n)"},
+        "space_complexity": "O(1)"
+    },
+    "binary_search": {
+        "time_complexity": {"best": "O(1)", "average": "O(log n)", "worst": "O(log n)"},
+        "space_complexity": "O(1)"
     }
 }
 
+# Time budget of a single test case in seconds
+TEST_CASE_TIME_BUDGET = 2.0
+
+# Complexity classes the complexity grading mode can fit, simplest first,
+# with the polynomial degree of each
+COMPLEXITY_CLASSES = {
+    "O(1)": (0, lambda n: 1.0),
+    "O(log n)": (0, lambda n: math.log2(n)),
+    "O(n)": (1, lambda n: float(n)),
+    "O(n log n)": (1, lambda n: n * math.log2(n)),
+    "O(n^2)": (2, lambda n: float(n * n))
+}
+
+# Default ladder of input sizes for complexity grading
+COMPLEXITY_SIZES = tuple(2 ** k for k in range(4, 14))
+
+# Timed samples taken at every input size
+COMPLEXITY_REPEATS = 5
+
+# Measured sizes needed before a complexity verdict is given
+COMPLEXITY_MIN_POINTS = 4
+
+# A simpler class is preferred while its fit error is within this factor of the best fit
+COMPLEXITY_FIT_TOLERANCE = 1.25
+
+# Timings may grow this much faster than the bound's polynomial degree, e.g.
+# from cache effects, before the bound counts as exceeded
+COMPLEXITY_EXPONENT_SLACK = 0.5
+
+# Wall clock seconds a complexity measurement may run
+COMPLEXITY_JOB_TIMEOUT = 60.0
+
+# Top-level JavaScript function declarations, including arrow functions and function expressions
+JS_FUNCTION_PATTERN = re.compile(
+    r"^(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)\s*\("
+    r"|^(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)",
+    re.MULTILINE
+)
+
+
+def find_test_function(code: str, language: str) -> Optional[str]:
+    """
+    Find the function under test when the exercise does not name it.
+    
+    Args:
+        code: The submitted code
+        language: The programming language
+        
+    Returns:
+        The name of the only top-level function, or None if there is not exactly one
+    """
+    if language == "python":
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+        names = [node.name for node in tree.body
+                 if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    else:
+        names = [a or b for a, b in JS_FUNCTION_PATTERN.findall(code)]
+    
+    names = list(dict.fromkeys(names))
+    return names[0] if len(names) == 1 else None
+
+
+def collect_test_results(test_cases: List[Dict[str, Any]], worker_results: List[Dict[str, Any]],
+                         error: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Combine test cases with the results reported by a sandbox worker.
+    
+    Args:
+        test_cases: List of test cases
+        worker_results: Results reported by the worker, in test case order
+        error: Error reported for the whole run, used for tests without a result
+        
+    Returns:
+        List of test results
+    """
+    results = []
+    for i, test_case in enumerate(test_cases):
+        if i < len(worker_results):
+            result = worker_results[i]
+        else:
+            result = {"actual_output": None, "passed": False, "error": error, "execution_time": None}
+        
+        results.append({
+            "test_case_index": i,
+            "input": test_case["input"],
+            "expected_output": test_case["expected_output"],
+            "actual_output": result["actual_output"],
+            "passed": result["passed"],
+            "error": result["error"],
+            "execution_time": result.get("execution_time")
+        })
+    
+    return results
+
+
+def parse_complexity_bound(bound: str) -> str:
+    """
+    Normalize a complexity bound such as "O(n log n)" or "O(n²)".
+    
+    Returns:
+        The matching key of COMPLEXITY_CLASSES
+        
+    Raises:
+        ValueError: If the bound is not one of the supported classes
+    """
+    def compact(label: str) -> str:
+        return label.lower().replace(" ", "").replace("*", "").replace("²", "^2")
+    
+    for label in COMPLEXITY_CLASSES:
+        if compact(label) == compact(bound):
+            return label
+    raise ValueError(f"Unsupported complexity bound: {bound}")
+
+
+def fit_complexity(sizes: List[int], values: List[float]) -> Tuple[str, Dict[str, float]]:
+    """
+    Fit measurements against every complexity class.
+    
+    Each class f is fitted as a + b * f(n) with b >= 0 by least squares on
+    values scaled to a maximum of 1. The simplest class whose error is within
+    COMPLEXITY_FIT_TOLERANCE of the best fit wins.
+    
+    Args:
+        sizes: Input sizes
+        values: Measurement at each size, e.g. operation counts
+        
+    Returns:
+        Tuple of (fitted class, mean squared error of every class)
+    """
+    top = max(values) or 1.0
+    ys = [value / top for value in values]
+    mean_y = sum(ys) / len(ys)
+    errors = {}
+    for label, (_, model) in COMPLEXITY_CLASSES.items():
+        xs = [model(n) for n in sizes]
+        mean_x = sum(xs) / len(xs)
+        variance = sum((x - mean_x) ** 2 for x in xs)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance if variance else 0.0
+        slope = max(slope, 0.0)
+        intercept = mean_y - slope * mean_x
+        errors[label] = sum((y - intercept - slope * x) ** 2 for x, y in zip(xs, ys)) / len(ys)
+    
+    best = min(errors.values())
+    fitted = next(label for label, error in errors.items() if error <= best * COMPLEXITY_FIT_TOLERANCE + 1e-12)
+    return fitted, errors
+
+
+def estimate_growth_exponent(sizes: List[int], times: List[float]) -> float:
+    """
+    Estimate k in time ~ n^k from the upper half of the size ladder.
+    
+    Small sizes are dominated by call overhead, so only the larger half of
+    the measurements (at least three) is used for the log-log slope.
+    """
+    count = max(3, len(sizes) // 2)
+    xs = [math.log(n) for n in sizes[-count:]]
+    ys = [math.log(max(t, 1e-12)) for t in times[-count:]]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance if variance else 0.0
+
+
+def evaluate_complexity(measurements: List[Dict[str, Any]], bound: str) -> Dict[str, Any]:
+    """
+    Decide whether measured scaling stays within a complexity bound.
+    
+    Operation counts do not depend on machine load and give the fitted
+    class. Work hidden inside builtins (e.g. sorted or "in" on a list) does
+    not show up in them, so the growth exponent of the timings is checked
+    too: the bound is exceeded when timings grow more than
+    COMPLEXITY_EXPONENT_SLACK faster than the bound's polynomial degree.
+    
+    Args:
+        measurements: Measurements with size, time and operations, smallest size first
+        bound: Declared complexity bound
+        
+    Returns:
+        Dictionary with bound, estimated class, operations_fit, fit_errors,
+        time_exponent, passed and error
+    """
+    bound = parse_complexity_bound(bound)
+    if len(measurements) < COMPLEXITY_MIN_POINTS:
+        return {
+            "bound": bound,
+            "estimated": None,
+            "passed": False,
+            "error": f"Too slow to measure enough input sizes (measured {len(measurements)})"
+        }
+    
+    sizes = [m["size"] for m in measurements]
+    operations_fit, errors = fit_complexity(sizes, [m["operations"] for m in measurements])
+    exponent = estimate_growth_exponent(sizes, [m["time"] for m in measurements])
+    
+    labels = list(COMPLEXITY_CLASSES)
+    # The simplest class matching the timings' degree raises the estimate
+    # when the operation counts miss work done in builtins
+    degree = max(0, min(2, round(exponent)))
+    time_class = next(label for label, (d, _) in COMPLEXITY_CLASSES.items() if d == degree)
+    estimated = max(operations_fit, time_class, key=labels.index)
+    
+    passed = (labels.index(operations_fit) <= labels.index(bound)
+              and exponent <= COMPLEXITY_CLASSES[bound][0] + COMPLEXITY_EXPONENT_SLACK)
+    return {
+        "bound": bound,
+        "estimated": estimated,
+        "operations_fit": operations_fit,
+        "fit_errors": errors,
+        "time_exponent": exponent,
+        "passed": passed,
+        "error": None
+    }
+
+
+class TracedArray:
+    """
+    Array that records every operation an algorithm performs on it.
+    
+    Operations are generators: an algorithm written as a generator calls them
+    with "yield from", which passes a compact event (the same format as
+    visualization steps) to the consumer and returns the operation's result,
+    e.g. ``if (yield from arr.compare(i, j)) > 0: yield from arr.swap(i, j)``.
+    Operation counts are kept as the algorithm runs, so visualizers need no
+    bookkeeping of their own.
+    """
+    
+    def __init__(self, values: List[Any]):
+        self._values = list(values)
+        self.counts = {"reads": 0, "writes": 0, "comparisons": 0, "swaps": 0}
+    
+    def __len__(self) -> int:
+        return len(self._values)
+    
+    def read(self, i: int):
+        """Read the value at index i."""
+        self.counts["reads"] += 1
+        yield {"type": "read", "index": i}
+        return self._values[i]
+    
+    def write(self, i: int, value: Any):
+        """Store a value at index i."""
+        self.counts["writes"] += 1
+        self._values[i] = value
+        yield {"type": "set", "index": i, "value": value}
+    
+    def swap(self, i: int, j: int):
+        """Swap the values at indices i and j."""
+        self.counts["swaps"] += 1
+        self._values[i], self._values[j] = self._values[j], self._values[i]
+        yield {"type": "swap", "indices": [i, j]}
+    
+    def compare(self, i: int, j: int):
+        """Compare the values at indices i and j; returns -1, 0 or 1."""
+        return (yield from self.compare_values(self._values[i], self._values[j], [i, j]))
+    
+    def compare_to(self, i: int, value: Any):
+        """Compare the value at index i with a value held outside the array."""
+        self.counts["comparisons"] += 1
+        yield {"type": "comparison", "indices": [i], "value": value}
+        return (self._values[i] > value) - (self._values[i] < value)
+    
+    def compare_values(self, a: Any, b: Any, indices: List[int]):
+        """Compare two values that originate from the given indices."""
+        self.counts["comparisons"] += 1
+        yield {"type": "comparison", "indices": indices}
+        return (a > b) - (a < b)
+
+
+def apply_visualization_step(state: List[Any], step: Dict[str, Any]) -> List[Any]:
+    """
+    Apply one delta-encoded visualization step to an array state in place.
+    
+    Steps carrying a full snapshot ("data") replace the state; "swap" and
+    "set" steps change it; all other steps leave it unchanged.
+    
+    Args:
+        state: The array before the step
+        step: The visualization step
+        
+    Returns:
+        The array after the step
+    """
+    if "data" in step:
+        state[:] = step["data"]
+    elif step["type"] == "swap":
+        i, j = step["indices"]
+        state[i], state[j] = state[j], state[i]
+    elif step["type"] == "set":
+        state[step["index"]] = step["value"]
+    return state
+
+
+def normalize_code(code: str) -> str:
+    """
+    Normalize line endings, the only change that never alters what code does.
+    
+    Whitespace is kept as submitted, since it is significant inside
+    multiline strings and JavaScript template literals.
+    """
+    return code.replace("\r\n", "\n").replace("\r", "\n")
+
+
+@lru_cache(maxsize=None)
+def get_runtime_version(language: str) -> str:
+    """
+    Get the version of the runtime executing a language.
+    
+    Cached results are keyed by it, so upgrading Python or Node.js
+    invalidates them.
+    """
+    if language == "python":
+        return sys.version
+    try:
+        result = subprocess.run([SUPPORTED_LANGUAGES[language]["command"], "--version"],
+                                capture_output=True, text=True, timeout=5)
+        return result.stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+class GradingResultCache:
+    """
+    Persistent LRU cache of grading results.
+
+    Results are stored in a small SQLite database keyed by a hash of the
+    language, normalized code, test cases and runtime version, so resubmitted
+    code and shared exercise test suites are graded once across restarts. The
+    least recently used entries are evicted when the cache exceeds its entry
+    count or total size.
+    
+    Lookups only read the database. The times of hits are kept in memory and
+    written together with the next stored result.
+    """
+
+    def __init__(self, path: Union[str, Any] = RESULT_CACHE_PATH,
+                 max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Last use of entries hit since the previous write, by key
+        self._used: Dict[str, float] = {}
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS grading_results ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_grading_results_last_used ON grading_results (last_used)"
+        )
+        self._connection.commit()
+        self._entries, self._bytes = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM grading_results"
+        ).fetchone()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result, or None if unknown."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result FROM grading_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used[key] = time.time()
+            return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result, evicting least recently used entries if the cache is full."""
+        try:
+            data = json.dumps(result)
+        except (TypeError, ValueError):
+            # Results holding values JSON cannot represent are not cached
+            return
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._connection.execute(
+                "SELECT size FROM grading_results WHERE key = ?", (key,)
+            ).fetchone()
+            if previous is not None:
+                self._entries -= 1
+                self._bytes -= previous[0]
+            self._connection.execute(
+                "INSERT OR REPLACE INTO grading_results (key, result, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time())
+            )
+            self._entries += 1
+            self._bytes += size
+            # Record the hits since the last write, so eviction sees them
+            self._used.pop(key, None)
+            self._connection.executemany(
+                "UPDATE grading_results SET last_used = ? WHERE key = ?",
+                [(used, used_key) for used_key, used in self._used.items()]
+            )
+            self._used.clear()
+            self._evict()
+            self._connection.commit()
+
+    def clear(self) -> None:
+        """Remove all cached results and reset the statistics."""
+        with self._lock:
+            self._connection.execute("DELETE FROM grading_results")
+            self._connection.commit()
+            self._used.clear()
+            self._entries = 0
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._entries,
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache is within its bounds."""
+        while self._entries > self.max_entries or self._bytes > self.max_bytes:
+            excess = max(self._entries - self.max_entries, 1)
+            rows = self._connection.execute(
+                "SELECT key, size FROM grading_results ORDER BY last_used LIMIT ?", (excess,)
+            ).fetchall()
+            if not rows:
+                break
+            self._connection.executemany("DELETE FROM grading_results WHERE key = ?",
+                                         [(key,) for key, _ in rows])
+            self._entries -= len(rows)
+            self._bytes -= sum(size for _, size in rows)
+            self.evictions += len(rows)
+
+
+# Opened on first use so importing the module doesn't touch the data directory
+_result_cache: Optional[GradingResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_grading_result_cache() -> GradingResultCache:
+    """Get the shared persistent grading result cache."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = GradingResultCache()
+        return _result_cache
+
 
 class CSToolsService(BaseService):
     """Service for computer science tools to support educational content."""
 
+    # Tools compute in memory; usage tracking opens its own unit of work
+    uses_database = False
+
     def __init__(self):
         """Initialize the CS tools service."""
         super().__init__()
         self.tracking_service = None
+        self.worker_pools = {}
+        self.result_cache = None
+        self.similarity_index = None
         self.sandbox_dir = tempfile.mkdtemp(prefix="cs_tools_sandbox_")
         
     def __del__(self):
@@ -51,6 +598,68 @@ class CSToolsService(BaseService):
         if self.tracking_service is None:
             self.tracking_service = TrackingService()
 
+    def _get_worker_pool(self, language: str = "python"):
+        """Get the worker pool of a language, starting the shared one on first use."""
+        if language not in self.worker_pools:
+            self.worker_pools[language] = get_code_worker_pool(language)
+        return self.worker_pools[language]
+
+    def _result_cache_key(self, kind: str, language: str, code: str, **details: Any) -> str:
+        """
+        Build the result cache key of a grading request.
+        
+        Args:
+            kind: The kind of check, e.g. "output" or "testcases"
+            language: The programming language
+            code: The submitted code
+            **details: Everything else the verdict depends on, e.g. test cases
+            
+        Returns:
+            Hex SHA-256 digest identifying the request
+        """
+        payload = json.dumps({
+            "kind": kind,
+            "language": language,
+            "runtime": get_runtime_version(language) if language in SUPPORTED_LANGUAGES else None,
+            "code": normalize_code(code),
+            "details": details
+        }, sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _get_cached_result(self, key: str, compute) -> Dict[str, Any]:
+        """
+        Return the cached result for a key, computing and storing it on a miss.
+        
+        Results of failed calls and of runs that hit a timeout or lost their
+        worker are not stored, since another attempt may succeed.
+        """
+        if self.result_cache is None:
+            self.result_cache = get_grading_result_cache()
+        
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = compute()
+        if result.get("success") and not self._has_transient_error(result):
+            self.result_cache.put(key, result)
+        return result
+
+    def _has_transient_error(self, result: Dict[str, Any]) -> bool:
+        errors = [result.get("error")] + [test.get("error") for test in result.get("results", [])]
+        return any(error and any(marker in error for marker in TRANSIENT_ERROR_MARKERS) for error in errors)
+
+    def get_result_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of the grading result cache.
+        
+        Returns:
+            Dictionary with size, bytes, hits, misses, evictions and hit_rate
+        """
+        if self.result_cache is None:
+            self.result_cache = get_grading_result_cache()
+        return self.result_cache.stats()
+
     @handle_service_errors(service_name="cs_tools")
     def validate_code_syntax(self, code: str, language: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -85,20 +694,8 @@ class CSToolsService(BaseService):
                     "success": True
                 }
             
-            # Create a temporary file with the code
-            file_path = self._create_sandbox_file(code, language)
-            
-            # Check syntax based on language
-            if language == "python":
-                result = self._check_python_syntax(file_path)
-            elif language == "javascript":
-                result = self._check_javascript_syntax(file_path)
-            else:
-                # This shouldn't happen due to earlier check, but just in case
-                result = {
-                    "is_valid": False,
-                    "error": f"Syntax checking not implemented for {language}"
-                }
+            # Checked in memory; repeated checks of unchanged code hit the syntax cache
+            result = check_syntax(code, language)
             
             return {
                 "language": language,
@@ -116,90 +713,6 @@ class CSToolsService(BaseService):
                 "success": False
             }
     
-    def _check_python_syntax(self, file_path: str) -> Dict[str, Any]:
-        """
-        Check Python code syntax without execution.
-        
-        Args:
-            file_path: Path to the Python file
-            
-        Returns:
-            Dictionary containing validation result
-        """
-        try:
-            # Use Python's compile function to check syntax
-            with open(file_path, 'r') as f:
-                code = f.read()
-            
-            # Try to compile the code to check syntax
-            compile(code, file_path, 'exec')
-            
-            return {
-                "is_valid": True,
-                "error": None
-            }
-        except SyntaxError as e:
-            # Format the syntax error in a readable way
-            error_msg = f"SyntaxError: {str(e)}"
-            if hasattr(e, 'lineno') and hasattr(e, 'offset'):
-                error_msg += f" at line {e.lineno}, position {e.offset}"
-            
-            return {
-                "is_valid": False,
-                "error": error_msg
-            }
-        except Exception as e:
-            return {
-                "is_valid": False,
-                "error": f"Error checking syntax: {str(e)}"
-            }
-    
-    def _check_javascript_syntax(self, file_path: str) -> Dict[str, Any]:
-        """
-        Check JavaScript code syntax without execution.
-        
-        Args:
-            file_path: Path to the JavaScript file
-            
-        Returns:
-            Dictionary containing validation result
-        """
-        try:
-            # Use Node.js to check syntax with --check flag
-            command = ["node", "--check", file_path]
-            
-            # Run the command and capture output
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                timeout=5  # 5 second timeout
-            )
-            
-            # If return code is 0, syntax is valid
-            if result.returncode == 0:
-                return {
-                    "is_valid": True,
-                    "error": None
-                }
-            else:
-                # Extract the error message from stderr
-                error_msg = result.stderr.strip()
-                return {
-                    "is_valid": False,
-                    "error": error_msg
-                }
-        except subprocess.TimeoutExpired:
-            return {
-                "is_valid": False,
-                "error": "Timeout while checking syntax"
-            }
-        except Exception as e:
-            return {
-                "is_valid": False,
-                "error": f"Error checking syntax: {str(e)}"
-            }
-
     @handle_service_errors(service_name="cs_tools")
     def check_code_output(self, code: str, expected_output: str, language: str, 
                        inputs: Optional[List[str]] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
@@ -227,6 +740,14 @@ class CSToolsService(BaseService):
                 data={"code": code, "language": language, "has_inputs": inputs is not None}
             )
         
+        key = self._result_cache_key("output", language, code, expected_output=expected_output, inputs=inputs)
+        return self._get_cached_result(
+            key, lambda: self._check_code_output(code, expected_output, language, inputs)
+        )
+
+    def _check_code_output(self, code: str, expected_output: str, language: str,
+                           inputs: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Check code output without consulting the result cache."""
         try:
             if language not in SUPPORTED_LANGUAGES:
                 return {
@@ -238,14 +759,7 @@ class CSToolsService(BaseService):
                 }
             
             # First, validate syntax
-            file_path = self._create_sandbox_file(code, language)
-            
-            if language == "python":
-                syntax_result = self._check_python_syntax(file_path)
-            elif language == "javascript":
-                syntax_result = self._check_javascript_syntax(file_path)
-            else:
-                syntax_result = {"is_valid": False, "error": f"Syntax checking not implemented for {language}"}
+            syntax_result = check_syntax(code, language)
             
             # If syntax is invalid, return error
             if not syntax_result["is_valid"]:
@@ -257,8 +771,15 @@ class CSToolsService(BaseService):
                     "success": True
                 }
             
-            # Execute the code in sandbox
-            execution_result = self._execute_code_in_sandbox(file_path, language, inputs)
+            # Execute the code in sandbox; Python runs in a pre-warmed worker
+            if language == "python":
+                execution_result = self._execute_python_in_pool(code, inputs)
+            else:
+                file_path = self._create_sandbox_file(code, language)
+                try:
+                    execution_result = self._execute_code_in_sandbox(file_path, language, inputs)
+                finally:
+                    os.unlink(file_path)
             
             if not execution_result["success"]:
                 return {
@@ -266,6 +787,7 @@ class CSToolsService(BaseService):
                     "is_correct": False,
                     "actual_output": "",
                     "error": f"Execution error: {execution_result['error']}",
+                    "resource_usage": execution_result.get("resource_usage"),
                     "success": True
                 }
             
@@ -281,6 +803,7 @@ class CSToolsService(BaseService):
                 "actual_output": actual_output,
                 "expected_output": expected_output,
                 "error": None,
+                "resource_usage": execution_result.get("resource_usage"),
                 "success": True
             }
             
@@ -296,18 +819,35 @@ class CSToolsService(BaseService):
 
     @handle_service_errors(service_name="cs_tools")
     def validate_code_against_testcases(self, code: str, test_cases: List[Dict[str, Any]], 
-                                     language: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+                                     language: str, user_id: Optional[str] = None,
+                                     function_name: Optional[str] = None,
+                                     complexity: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Validate code against multiple test cases.
         
+        With complexity set, the function is also run over a ladder of
+        generated input sizes and must scale within the declared bound for
+        all_passed to hold. Complexity grading is supported for Python, and
+        its results are never taken from or stored in the result cache.
+        
         Args:
             code: The code to execute
             test_cases: List of test cases, each with input and expected_output
             language: The programming language
             user_id: Optional user ID for tracking usage
+            function_name: Name of the function the exercise declares; inferred
+                when the code defines exactly one top-level function
+            complexity: Optional complexity requirement with
+                bound: Declared bound, e.g. "O(n log n)"
+                input_type: Generated input, "list", "sorted_list", "string" or "int"
+                argument: Parameter receiving the input (first positional if omitted)
+                arguments: Other keyword arguments passed unchanged
+                sizes: Input size ladder, defaults to COMPLEXITY_SIZES
+                repeats: Timed samples per size, defaults to COMPLEXITY_REPEATS
             
         Returns:
-            Dictionary containing the validation results
+            Dictionary containing the validation results, with a complexity
+            entry when complexity grading was requested
         """
         self._init_dependencies()
         
@@ -320,6 +860,23 @@ class CSToolsService(BaseService):
                 data={"code": code, "language": language, "test_cases_count": len(test_cases)}
             )
         
+        if complexity is not None:
+            # Complexity verdicts rest on timings of this machine at this moment,
+            # so they are measured afresh rather than stored
+            return self._validate_code_against_testcases(code, test_cases, language, function_name,
+                                                         complexity)
+        
+        key = self._result_cache_key("testcases", language, code, test_cases=test_cases,
+                                     function_name=function_name)
+        return self._get_cached_result(
+            key, lambda: self._validate_code_against_testcases(code, test_cases, language, function_name,
+                                                               complexity)
+        )
+
+    def _validate_code_against_testcases(self, code: str, test_cases: List[Dict[str, Any]], language: str,
+                                         function_name: Optional[str] = None,
+                                         complexity: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Validate code against test cases without consulting the result cache."""
         try:
             if language not in SUPPORTED_LANGUAGES:
                 return {
@@ -334,14 +891,7 @@ class CSToolsService(BaseService):
                 }
             
             # First, validate syntax
-            file_path = self._create_sandbox_file(code, language)
-            
-            if language == "python":
-                syntax_result = self._check_python_syntax(file_path)
-            elif language == "javascript":
-                syntax_result = self._check_javascript_syntax(file_path)
-            else:
-                syntax_result = {"is_valid": False, "error": f"Syntax checking not implemented for {language}"}
+            syntax_result = check_syntax(code, language)
             
             # If syntax is invalid, return error without running test cases
             if not syntax_result["is_valid"]:
@@ -356,18 +906,32 @@ class CSToolsService(BaseService):
                     "success": True
                 }
             
+            function_name = function_name or find_test_function(code, language)
+            if not function_name or not function_name.isidentifier():
+                return {
+                    "language": language,
+                    "all_passed": False,
+                    "passed_count": 0,
+                    "failed_count": len(test_cases),
+                    "total_count": len(test_cases),
+                    "results": [],
+                    "error": "Could not determine which function to test; specify function_name",
+                    "success": True
+                }
+            
             # Process test cases for the specific language
             test_results = []
+            resource_usage = None
             if language == "python":
-                test_results = self._run_python_test_cases(code, test_cases)
+                test_results, resource_usage = self._run_python_test_cases(code, test_cases, function_name)
             elif language == "javascript":
-                test_results = self._run_javascript_test_cases(code, test_cases)
+                test_results, resource_usage = self._run_javascript_test_cases(code, test_cases, function_name)
             
             # Compute summary statistics
             passed_count = sum(1 for result in test_results if result["passed"])
             failed_count = len(test_cases) - passed_count
             
-            return {
+            result = {
                 "language": language,
                 "all_passed": passed_count == len(test_cases),
                 "passed_count": passed_count,
@@ -375,9 +939,16 @@ class CSToolsService(BaseService):
                 "total_count": len(test_cases),
                 "results": test_results,
                 "error": None,
+                "resource_usage": resource_usage,
                 "success": True
             }
             
+            if complexity is not None:
+                result["complexity"] = self._grade_complexity(code, function_name, language, complexity)
+                result["all_passed"] = result["all_passed"] and result["complexity"]["passed"]
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Error validating {language} code against test cases: {str(e)}")
             return {
@@ -391,161 +962,189 @@ class CSToolsService(BaseService):
                 "success": False
             }
     
-    def _run_python_test_cases(self, code: str, test_cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _run_python_test_cases(self, code: str, test_cases: List[Dict[str, Any]],
+                               function_name: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
         """
         Run Python code against test cases.
         
+        The code and the whole batch of test cases are sent to one pooled
+        worker, which runs every test with its own time budget and returns
+        JSON results.
+        
         Args:
             code: The Python code to test
             test_cases: List of test cases
+            function_name: Name of the function the test cases call
             
         Returns:
-            List of test results
+            Tuple of (test results, resource usage of the run)
+        """
+        exec_result = self._get_worker_pool().run(
+            code,
+            test_cases=test_cases,
+            function=function_name,
+            timeout=TEST_CASE_TIME_BUDGET * len(test_cases) + self._get_worker_pool().timeout,
+            test_timeout=TEST_CASE_TIME_BUDGET
+        )
+        results = collect_test_results(test_cases, exec_result.get("results", []), exec_result["error"])
+        return results, exec_result.get("resource_usage")
+    
+    def _grade_complexity(self, code: str, function_name: str, language: str,
+                          complexity: Dict[str, Any]) -> Dict[str, Any]:
         """
-        results = []
+        Measure how a function scales and compare it with the declared bound.
         
-        # Create a temporary test file that includes the code and test execution
-        for i, test_case in enumerate(test_cases):
-            test_file_path = os.path.join(self.sandbox_dir, f"test_case_{i}.py")
-            
-            with open(test_file_path, 'w') as f:
-                # Write the original code
-                f.write(code + "\n\n")
-                
-                # Write the test case execution
-                input_args = ', '.join([f"{k}={repr(v)}" for k, v in test_case["input"].items()])
-                expected_output = repr(test_case["expected_output"])
-                
-                f.write(f"""
-# Test case execution
-try:
-    result = add({input_args})
-    expected = {expected_output}
-    print(f"RESULT: {{repr(result)}}")
-    print(f"EXPECTED: {{repr(expected)}}")
-    print(f"PASSED: {{result == expected}}")
-except Exception as e:
-    print(f"ERROR: {{type(e).__name__}}: {{str(e)}}")
-    print("PASSED: False")
-""")
-            
-            # Run the test file
-            exec_result = self._execute_code_in_sandbox(test_file_path, "python")
-            
-            # Parse the output
-            passed = False
-            actual_output = None
-            error = None
-            
-            if exec_result["success"]:
-                output_lines = exec_result["output"].split("\n")
-                for line in output_lines:
-                    if line.startswith("RESULT: "):
-                        try:
-                            actual_output = eval(line[len("RESULT: "):])
-                        except:
-                            actual_output = line[len("RESULT: "):]
-                    elif line.startswith("PASSED: "):
-                        passed = line[len("PASSED: "):].lower() == "true"
-                    elif line.startswith("ERROR: "):
-                        error = line[len("ERROR: "):]
-            else:
-                error = exec_result["error"]
+        The measurement runs in a pooled sandbox worker; see
+        evaluate_complexity for how the verdict is reached.
+        
+        Args:
+            code: The Python code to grade
+            function_name: Name of the function to measure
+            language: The programming language
+            complexity: Complexity requirement as accepted by validate_code_against_testcases
             
-            results.append({
-                "test_case_index": i,
-                "input": test_case["input"],
-                "expected_output": test_case["expected_output"],
-                "actual_output": actual_output,
-                "passed": passed,
-                "error": error
-            })
+        Returns:
+            Dictionary with the verdict, the estimated class and the measurements
+        """
+        bound = complexity.get("bound")
+        try:
+            bound = parse_complexity_bound(bound or "")
+        except ValueError as e:
+            return {"bound": bound, "estimated": None, "passed": False, "measurements": [], "error": str(e)}
         
-        return results
+        if language != "python":
+            return {
+                "bound": bound,
+                "estimated": None,
+                "passed": False,
+                "measurements": [],
+                "error": f"Complexity grading is not supported for {language}"
+            }
+        
+        spec = {
+            "sizes": sorted(complexity.get("sizes") or COMPLEXITY_SIZES),
+            "input_type": complexity.get("input_type", "list"),
+            "argument": complexity.get("argument"),
+            "arguments": complexity.get("arguments") or {},
+            "repeats": complexity.get("repeats") or COMPLEXITY_REPEATS
+        }
+        exec_result = self._get_worker_pool().run(code, function=function_name, complexity=spec,
+                                                  timeout=COMPLEXITY_JOB_TIMEOUT)
+        measured = exec_result.get("complexity") or {"measurements": [], "error": exec_result["error"]}
+        
+        verdict = evaluate_complexity(measured["measurements"], bound)
+        verdict["measurements"] = measured["measurements"]
+        if measured["error"]:
+            verdict["passed"] = False
+            verdict["error"] = measured["error"]
+        return verdict
     
-    def _run_javascript_test_cases(self, code: str, test_cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _run_javascript_test_cases(self, code: str, test_cases: List[Dict[str, Any]],
+                                   function_name: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
         """
         Run JavaScript code against test cases.
         
+        The code and the whole batch of test cases are sent to one pooled
+        Node.js worker, which runs the submission in a fresh vm context and
+        every test with its own time budget.
+        
         Args:
             code: The JavaScript code to test
             test_cases: List of test cases
+            function_name: Name of the function the test cases call
             
         Returns:
-            List of test results
+            Tuple of (test results, resource usage of the run)
         """
-        results = []
+        pool = self._get_worker_pool("javascript")
+        exec_result = pool.run(
+            code,
+            test_cases=test_cases,
+            function=function_name,
+            timeout=TEST_CASE_TIME_BUDGET * (len(test_cases) + 1) + pool.timeout,
+            test_timeout=TEST_CASE_TIME_BUDGET
+        )
+        results = collect_test_results(test_cases, exec_result.get("results", []), exec_result["error"])
+        return results, exec_result.get("resource_usage")
+    
+    def _get_similarity_index(self):
+        """Get the submission similarity index, opening the shared one on first use."""
+        if self.similarity_index is None:
+            self.similarity_index = get_submission_similarity_index()
+        return self.similarity_index
+
+    @handle_service_errors(service_name="cs_tools")
+    def index_submission(self, submission_id: str, code: str, language: str,
+                         user_id: Optional[str] = None, exercise_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Add a submission to the near-duplicate index.
         
-        # Create a temporary test file that includes the code and test execution
-        for i, test_case in enumerate(test_cases):
-            test_file_path = os.path.join(self.sandbox_dir, f"test_case_{i}.js")
-            
-            with open(test_file_path, 'w') as f:
-                # Write the original code
-                f.write(code + "\n\n")
-                
-                # Write the test case execution
-                input_args = ', '.join([f"{repr(v)}" for k, v in test_case["input"].items()])
-                expected_output = repr(test_case["expected_output"])
-                
-                f.write(f"""
-// Test case execution
-try {{
-    const result = add({input_args});
-    const expected = {expected_output};
-    console.log(`RESULT: ${{JSON.stringify(result)}}`);
-    console.log(`EXPECTED: ${{JSON.stringify(expected)}}`);
-    console.log(`PASSED: ${{JSON.stringify(result) === JSON.stringify(expected)}}`);
-}} catch (e) {{
-    console.log(`ERROR: ${{e.name}}: ${{e.message}}`);
-    console.log("PASSED: false");
-}}
-""")
-            
-            # Run the test file
-            exec_result = self._execute_code_in_sandbox(test_file_path, "javascript")
-            
-            # Parse the output
-            passed = False
-            actual_output = None
-            error = None
-            
-            if exec_result["success"]:
-                output_lines = exec_result["output"].split("\n")
-                for line in output_lines:
-                    if line.startswith("RESULT: "):
-                        try:
-                            actual_output = json.loads(line[len("RESULT: "):])
-                        except:
-                            actual_output = line[len("RESULT: "):]
-                    elif line.startswith("PASSED: "):
-                        passed_str = line[len("PASSED: "):].lower()
-                        passed = passed_str == "true"
-                    elif line.startswith("ERROR: "):
-                        error = line[len("ERROR: "):]
-            else:
-                error = exec_result["error"]
+        Args:
+            submission_id: Unique ID of the submission
+            code: The submitted code
+            language: The programming language
+            user_id: Optional author of the submission
+            exercise_id: Optional exercise; only submissions of the same exercise are compared
             
-            results.append({
-                "test_case_index": i,
-                "input": test_case["input"],
-                "expected_output": test_case["expected_output"],
-                "actual_output": actual_output,
-                "passed": passed,
-                "error": error
-            })
+        Returns:
+            Dictionary containing the operation result
+        """
+        self._get_similarity_index().add(submission_id, code, language, user_id=user_id,
+                                         scope=exercise_id or "")
+        return {"submission_id": submission_id, "success": True}
+
+    @handle_service_errors(service_name="cs_tools")
+    def find_similar_submissions(self, code: Optional[str] = None, language: Optional[str] = None,
+                                 submission_id: Optional[str] = None, exercise_id: Optional[str] = None,
+                                 user_id: Optional[str] = None,
+                                 min_similarity: float = DEFAULT_MIN_SIMILARITY,
+                                 limit: int = 10) -> Dict[str, Any]:
+        """
+        Find indexed submissions that are near-duplicates of a submission.
+        
+        Either pass the code and language of a new submission, or the ID of
+        an indexed one. Submissions by the same user are not reported.
         
-        return results
+        Args:
+            code: Code to compare
+            language: The programming language of the code
+            submission_id: ID of an indexed submission to compare instead
+            exercise_id: Exercise whose submissions are searched (with code)
+            user_id: Author of the code, whose own submissions are skipped (with code)
+            min_similarity: Smallest estimated Jaccard similarity reported
+            limit: Maximum number of matches
+            
+        Returns:
+            Dictionary with the matches (submission_id, user_id, similarity), most similar first
+        """
+        index = self._get_similarity_index()
+        if submission_id is not None:
+            try:
+                matches = index.similar_to(submission_id, min_similarity=min_similarity, limit=limit)
+            except KeyError:
+                return {"matches": [], "error": f"Unknown submission: {submission_id}", "success": False}
+        elif code is not None and language:
+            matches = index.query(code, language, scope=exercise_id or "", min_similarity=min_similarity,
+                                  limit=limit, exclude_user_id=user_id)
+        else:
+            return {"matches": [], "error": "Provide code and language or a submission_id", "success": False}
+        return {"matches": matches, "error": None, "success": True}
 
     @handle_service_errors(service_name="cs_tools")
-    def prepare_algorithm_visualization(self, algorithm: str, data: List[Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+    def prepare_algorithm_visualization(self, algorithm: str, data: List[Any], user_id: Optional[str] = None,
+                                        target: Any = None) -> Dict[str, Any]:
         """
         Prepare visualization data for common algorithms.
         
+        At most VISUALIZATION_MAX_STEPS steps are returned; longer runs are
+        marked as truncated and end with the final keyframe, and can be browsed
+        in full with get_algorithm_visualization_page.
+        
         Args:
             algorithm: The algorithm to visualize (e.g., "bubble_sort", "quick_sort")
             data: The input data for the algorithm
             user_id: Optional user ID for tracking usage
+            target: Value to look for in search algorithms, by default the last element
             
         Returns:
             Dictionary containing visualization steps
@@ -561,27 +1160,36 @@ try {{
                 data={"algorithm": algorithm, "data_size": len(data)}
             )
         
-        supported_algorithms = {
-            "bubble_sort": self._visualize_bubble_sort,
-            "insertion_sort": self._visualize_insertion_sort,
-            "selection_sort": self._visualize_selection_sort,
-            "merge_sort": self._visualize_merge_sort,
-            "quick_sort": self._visualize_quick_sort,
-            "linear_search": self._visualize_linear_search,
-            "binary_search": self._visualize_binary_search
-        }
-        
         try:
-            if algorithm not in supported_algorithms:
+            if algorithm not in SUPPORTED_ALGORITHMS:
                 return {
                     "algorithm": algorithm,
                     "success": False,
-                    "error": f"Unsupported algorithm: {algorithm}. Supported algorithms: {', '.join(supported_algorithms.keys())}"
+                    "error": f"Unsupported algorithm: {algorithm}. Supported algorithms: {', '.join(SUPPORTED_ALGORITHMS)}"
                 }
             
-            # Call the appropriate visualization function
-            visualization_func = supported_algorithms[algorithm]
-            steps, additional_data = visualization_func(data)
+            steps = []
+            total_steps = 0
+            final_step = None
+            for step in self.iter_algorithm_steps(algorithm, data, target=target):
+                if total_steps < VISUALIZATION_MAX_STEPS:
+                    steps.append(step)
+                total_steps += 1
+                final_step = step
+            
+            truncated = total_steps > len(steps)
+            if truncated:
+                # The final step is a keyframe, so clients can still show the end state
+                steps.append(final_step)
+            
+            additional_data = dict(ALGORITHM_PROPERTIES[algorithm])
+            additional_data.update(final_step["operation_counts"])
+            additional_data.update({
+                "step_format": "delta",
+                "keyframe_interval": max(KEYFRAME_INTERVAL, len(data)),
+                "total_steps": total_steps,
+                "truncated": truncated
+            })
             
             return {
                 "algorithm": algorithm,
@@ -599,169 +1207,317 @@ try {{
                 "error": str(e)
             }
     
-    def _visualize_bubble_sort(self, data: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    def iter_algorithm_steps(self, algorithm: str, data: List[Any], start: int = 0,
+                             stop: Optional[int] = None, target: Any = None) -> Iterator[Dict[str, Any]]:
         """
-        Generate visualization steps for bubble sort algorithm.
+        Lazily generate the visualization steps of an algorithm.
+        
+        Steps are delta-encoded: the first step holds the initial array, later
+        steps hold only what changed (see apply_visualization_step), and every
+        few steps a keyframe carries a full snapshot for random access. The
+        final step carries the operation counts of the whole run.
         
         Args:
-            data: List of items to sort
+            algorithm: The algorithm to visualize
+            data: The input data for the algorithm
+            start: Index of the first step to yield
+            stop: Index after the last step to yield, or None for all
+            target: Value to look for in search algorithms, by default the last element
             
         Returns:
-            Tuple of (steps, additional_data)
+            Iterator over the steps in the range
         """
-        # Make a copy to avoid modifying the original data
-        arr = data.copy()
-        steps = []
+        if algorithm not in SUPPORTED_ALGORITHMS:
+            raise ValueError(f"Unsupported algorithm: {algorithm}")
+        
+        if algorithm in ("linear_search", "binary_search"):
+            if target is None and data:
+                target = data[-1]
+            if algorithm == "binary_search":
+                data = sorted(data)
+            step_generator = partial(getattr(self, f"_{algorithm}_steps"), target=target)
+        else:
+            step_generator = getattr(self, f"_{algorithm}_steps")
         
-        # Record initial state
-        steps.append({
+        return itertools.islice(self._trace_algorithm(data, step_generator), start, stop)
+
+    @handle_service_errors(service_name="cs_tools")
+    def get_algorithm_visualization_page(self, algorithm: str, data: List[Any], start: int = 0,
+                                         count: int = VISUALIZATION_PAGE_SIZE,
+                                         user_id: Optional[str] = None, target: Any = None) -> Dict[str, Any]:
+        """
+        Get one page of an algorithm visualization.
+        
+        The page is self-contained: start_data is the array state just before
+        its first step, so a client can replay the page without earlier pages.
+        
+        Args:
+            algorithm: The algorithm to visualize
+            data: The input data for the algorithm
+            start: Index of the first step of the page
+            count: Maximum number of steps in the page
+            user_id: Optional user ID for tracking usage
+            target: Value to look for in search algorithms
+            
+        Returns:
+            Dictionary containing the page's steps, start_data and has_more
+        """
+        self._init_dependencies()
+        
+        if user_id:
+            self.tracking_service.track_tool_usage(
+                user_id=user_id,
+                tool_type="algorithm_visualizer",
+                action="page_visualization",
+                data={"algorithm": algorithm, "data_size": len(data), "start": start, "count": count}
+            )
+        
+        try:
+            if algorithm not in SUPPORTED_ALGORITHMS:
+                return {
+                    "algorithm": algorithm,
+                    "success": False,
+                    "error": f"Unsupported algorithm: {algorithm}"
+                }
+            if start < 0 or count < 1:
+                raise ValueError("start must be non-negative and count positive")
+            
+            # Replay the deltas before the page to know the state it starts from
+            state = []
+            steps = self.iter_algorithm_steps(algorithm, data, target=target)
+            for step in itertools.islice(steps, start):
+                apply_visualization_step(state, step)
+            page = list(itertools.islice(steps, count))
+            has_more = next(steps, None) is not None
+            
+            return {
+                "algorithm": algorithm,
+                "start": start,
+                "start_data": state,
+                "steps": page,
+                "has_more": has_more,
+                "success": True,
+                "error": None
+            }
+            
+        except Exception as e:
+            logger.error(f"Error paging visualization for algorithm '{algorithm}': {str(e)}")
+            return {
+                "algorithm": algorithm,
+                "success": False,
+                "error": str(e)
+            }
+
+    def _trace_algorithm(self, data: List[Any], step_generator,
+                         keyframe_interval: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Run an algorithm on a TracedArray and wrap its events into a full step sequence.
+        
+        Args:
+            data: The input data for the algorithm
+            step_generator: Generator function taking a TracedArray and yielding
+                its events and annotation steps; the dictionary it returns is
+                merged into the final step
+            keyframe_interval: Steps between keyframes, by default the larger of
+                KEYFRAME_INTERVAL and the array length
+            
+        Returns:
+            Iterator over the initial step, the algorithm's steps with periodic
+            keyframes and a final keyframe holding the operation counts
+        """
+        interval = keyframe_interval or max(KEYFRAME_INTERVAL, len(data))
+        array = TracedArray(data)
+        state = list(data)
+        
+        yield {
             "type": "initial",
-            "data": arr.copy(),
-            "activeIndices": [],
-            "comparedIndices": [],
+            "data": list(state),
             "description": "Initial array"
-        })
+        }
+        
+        steps = step_generator(array)
+        index = 0
+        while True:
+            try:
+                step = next(steps)
+            except StopIteration as stop:
+                final = stop.value or {}
+                break
+            index += 1
+            apply_visualization_step(state, step)
+            if index % interval == 0:
+                step["data"] = list(state)
+                step["keyframe"] = True
+            yield step
         
+        yield {
+            "type": "final",
+            **final,
+            "data": list(state),
+            "keyframe": True,
+            "operation_counts": dict(array.counts)
+        }
+
+    def _bubble_sort_steps(self, arr: "TracedArray") -> Iterator[Dict[str, Any]]:
+        """Generate the steps of bubble sort."""
         n = len(arr)
         for i in range(n):
             # Flag to optimize if no swaps occur in a pass
             swapped = False
             
             for j in range(0, n - i - 1):
-                # Add comparison step
-                steps.append({
-                    "type": "comparison",
-                    "data": arr.copy(),
-                    "activeIndices": [j, j + 1],
-                    "comparedIndices": [j, j + 1],
-                    "description": f"Comparing {arr[j]} and {arr[j + 1]}"
-                })
-                
                 # If current element is greater than next element, swap them
-                if arr[j] > arr[j + 1]:
-                    arr[j], arr[j + 1] = arr[j + 1], arr[j]
+                if (yield from arr.compare(j, j + 1)) > 0:
+                    yield from arr.swap(j, j + 1)
                     swapped = True
-                    
-                    # Add swap step
-                    steps.append({
-                        "type": "swap",
-                        "data": arr.copy(),
-                        "activeIndices": [j, j + 1],
-                        "swappedIndices": [j, j + 1],
-                        "description": f"Swapped {arr[j + 1]} and {arr[j]}"
-                    })
-            
-            # Add pass completion step
-            steps.append({
+            
+            yield {
                 "type": "pass_complete",
-                "data": arr.copy(),
-                "activeIndices": [],
-                "sortedIndices": list(range(n - i - 1, n)),
-                "description": f"Pass {i + 1} complete. {len(list(range(n - i - 1, n)))} elements sorted."
-            })
+                "sortedRange": [n - i - 1, n],
+                "description": f"Pass {i + 1} complete. {i + 1} elements sorted."
+            }
             
             # If no swaps occurred in this pass, the array is already sorted
             if not swapped:
-                steps.append({
+                yield {
                     "type": "early_termination",
-                    "data": arr.copy(),
-                    "activeIndices": [],
-                    "sortedIndices": list(range(n)),
+                    "sortedRange": [0, n],
                     "description": "No swaps needed. Array is sorted."
-                })
+                }
                 break
         
-        # Add final state
-        steps.append({
-            "type": "final",
-            "data": arr.copy(),
-            "activeIndices": [],
-            "sortedIndices": list(range(n)),
-            "description": "Array sorted"
-        })
+        return {"sortedRange": [0, n], "description": "Array sorted"}
+    
+    def _insertion_sort_steps(self, arr: "TracedArray") -> Iterator[Dict[str, Any]]:
+        """Generate the steps of insertion sort, shifting larger elements right."""
+        n = len(arr)
+        for i in range(1, n):
+            key = yield from arr.read(i)
+            j = i - 1
+            while j >= 0 and (yield from arr.compare_to(j, key)) > 0:
+                yield from arr.write(j + 1, (yield from arr.read(j)))
+                j -= 1
+            yield from arr.write(j + 1, key)
+            yield {
+                "type": "pass_complete",
+                "sortedRange": [0, i + 1],
+                "description": f"Inserted {key} at position {j + 1}"
+            }
         
-        additional_data = {
-            "time_complexity": {
-                "best": "O(n)",      # When array is already sorted
-                "average": "O(n²)",
-                "worst": "O(n²)"
-            },
-            "space_complexity": "O(1)",
-            "stable": True,
-            "comparisons": sum(1 for step in steps if step["type"] == "comparison"),
-            "swaps": sum(1 for step in steps if step["type"] == "swap")
-        }
+        return {"sortedRange": [0, n], "description": "Array sorted"}
+    
+    def _selection_sort_steps(self, arr: "TracedArray") -> Iterator[Dict[str, Any]]:
+        """Generate the steps of selection sort."""
+        n = len(arr)
+        for i in range(n - 1):
+            minimum = i
+            for j in range(i + 1, n):
+                if (yield from arr.compare(j, minimum)) < 0:
+                    minimum = j
+                    yield {"type": "new_minimum", "index": minimum}
+            if minimum != i:
+                yield from arr.swap(i, minimum)
+            yield {
+                "type": "pass_complete",
+                "sortedRange": [0, i + 1],
+                "description": f"Pass {i + 1} complete. {i + 1} elements sorted."
+            }
         
-        return steps, additional_data
+        return {"sortedRange": [0, n], "description": "Array sorted"}
     
-    def _visualize_insertion_sort(self, data: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    def _merge_sort_steps(self, arr: "TracedArray") -> Iterator[Dict[str, Any]]:
         """
-        Generate visualization steps for insertion sort algorithm.
+        Generate the steps of merge sort.
         
-        Args:
-            data: List of items to sort
-            
-        Returns:
-            Tuple of (steps, additional_data)
+        Runs bottom-up so the step generator needs no recursion; runs of width
+        1, 2, 4, ... are merged through an auxiliary buffer.
         """
-        # Make a copy to avoid modifying the original data
-        arr = data.copy()
-        steps = []
-        
-        # Record initial state
-        steps.append({
-            "type": "initial",
-            "data": arr.copy(),
-            "activeIndices": [],
-            "comparedIndices": [],
-            "description": "Initial array"
-        })
+        n = len(arr)
+        buffer = [None] * n
+        width = 1
+        while width < n:
+            for lo in range(0, n - width, 2 * width):
+                mid = lo + width
+                hi = min(lo + 2 * width, n)
+                yield {"type": "merge", "range": [lo, hi], "description": f"Merging [{lo}, {mid}) and [{mid}, {hi})"}
+                
+                for k in range(lo, hi):
+                    buffer[k] = yield from arr.read(k)
+                
+                i, j = lo, mid
+                for k in range(lo, hi):
+                    # Ties take the left element, keeping the sort stable
+                    if j >= hi or (i < mid and (yield from arr.compare_values(buffer[i], buffer[j], [i, j])) <= 0):
+                        yield from arr.write(k, buffer[i])
+                        i += 1
+                    else:
+                        yield from arr.write(k, buffer[j])
+                        j += 1
+            width *= 2
         
-        # Basic placeholder implementation, to be expanded
-        steps.append({
-            "type": "final",
-            "data": sorted(arr),
-            "activeIndices": [],
-            "sortedIndices": list(range(len(arr))),
-            "description": "Array sorted"
-        })
+        return {"sortedRange": [0, n], "description": "Array sorted"}
+    
+    def _quick_sort_steps(self, arr: "TracedArray") -> Iterator[Dict[str, Any]]:
+        """
+        Generate the steps of quick sort.
         
-        additional_data = {
-            "time_complexity": {
-                "best": "O(n)",
-                "average": "O(n²)",
-                "worst": "O(n²)"
-            },
-            "space_complexity": "O(1)",
-            "stable": True
-        }
+        Uses Lomuto partitioning with the middle element as pivot and an
+        explicit stack of ranges instead of recursion.
+        """
+        n = len(arr)
+        stack = [(0, n - 1)]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            
+            mid = (lo + hi) // 2
+            if mid != hi:
+                yield from arr.swap(mid, hi)
+            yield {"type": "pivot", "index": hi, "range": [lo, hi + 1]}
+            
+            store = lo
+            for j in range(lo, hi):
+                if (yield from arr.compare(j, hi)) < 0:
+                    if j != store:
+                        yield from arr.swap(j, store)
+                    store += 1
+            if store != hi:
+                yield from arr.swap(store, hi)
+            yield {"type": "partitioned", "index": store, "description": f"Pivot placed at position {store}"}
+            
+            stack.append((store + 1, hi))
+            stack.append((lo, store - 1))
         
-        return steps, additional_data
-    
-    def _visualize_selection_sort(self, data: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        """Placeholder for selection sort visualization"""
-        # Basic implementation that would be expanded in a full version
-        return [{"type": "placeholder", "data": sorted(data)}], {}
-    
-    def _visualize_merge_sort(self, data: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        """Placeholder for merge sort visualization"""
-        # Basic implementation that would be expanded in a full version
-        return [{"type": "placeholder", "data": sorted(data)}], {}
+        return {"sortedRange": [0, n], "description": "Array sorted"}
     
-    def _visualize_quick_sort(self, data: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        """Placeholder for quick sort visualization"""
-        # Basic implementation that would be expanded in a full version
-        return [{"type": "placeholder", "data": sorted(data)}], {}
-    
-    def _visualize_linear_search(self, data: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        """Placeholder for linear search visualization"""
-        # Basic implementation that would be expanded in a full version
-        return [{"type": "placeholder", "data": data}], {}
+    def _linear_search_steps(self, arr: "TracedArray", target: Any) -> Iterator[Dict[str, Any]]:
+        """Generate the steps of linear search."""
+        for i in range(len(arr)):
+            if (yield from arr.compare_to(i, target)) == 0:
+                yield {"type": "found", "index": i, "description": f"Found {target} at position {i}"}
+                return {"target": target, "index": i, "description": f"Found {target} at position {i}"}
+        
+        yield {"type": "not_found", "description": f"{target} is not in the array"}
+        return {"target": target, "index": -1, "description": f"{target} is not in the array"}
     
-    def _visualize_binary_search(self, data: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        """Placeholder for binary search visualization"""
-        # Basic implementation that would be expanded in a full version
-        return [{"type": "placeholder", "data": sorted(data)}], {}
+    def _binary_search_steps(self, arr: "TracedArray", target: Any) -> Iterator[Dict[str, Any]]:
+        """Generate the steps of binary search over a sorted array."""
+        lo, hi = 0, len(arr) - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            yield {"type": "range", "range": [lo, hi + 1], "index": mid}
+            comparison = yield from arr.compare_to(mid, target)
+            if comparison == 0:
+                yield {"type": "found", "index": mid, "description": f"Found {target} at position {mid}"}
+                return {"target": target, "index": mid, "description": f"Found {target} at position {mid}"}
+            if comparison < 0:
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        
+        yield {"type": "not_found", "description": f"{target} is not in the array"}
+        return {"target": target, "index": -1, "description": f"{target} is not in the array"}
 
     @handle_service_errors(service_name="cs_tools")
     def prepare_data_structure_visualization(self, structure: str, data: List[Any], user_id: Optional[str] = None) -> Dict[str, Any]:
@@ -957,19 +1713,45 @@ try {{
             raise ValueError(f"Unsupported language: {language}")
         
         extension = SUPPORTED_LANGUAGES[language]["extension"]
-        file_path = os.path.join(self.sandbox_dir, f"code{extension}")
+        # A unique name per call so concurrent submissions never overwrite each other
+        fd, file_path = tempfile.mkstemp(prefix="code_", suffix=extension, dir=self.sandbox_dir)
         
-        with open(file_path, 'w') as f:
+        with os.fdopen(fd, 'w') as f:
             f.write(code)
         
         return file_path
 
+    def _execute_python_in_pool(self, code: str, inputs: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Execute a Python program in a pooled worker.
+        
+        Args:
+            code: The Python code to run
+            inputs: Optional list of inputs to provide to the program
+            
+        Returns:
+            Dictionary containing execution results, shaped like _execute_code_in_sandbox
+        """
+        stdin = "\n".join(inputs) if inputs else None
+        result = self._get_worker_pool().run(code, stdin=stdin)
+        return {
+            "output": result["output"].strip() if result["success"] else "",
+            "error": result["error"],
+            "execution_time": result["execution_time"],
+            "resource_usage": result.get("resource_usage"),
+            "success": result["success"]
+        }
+
     def _execute_code_in_sandbox(self, file_path: str, language: str, 
                               inputs: Optional[List[str]] = None, 
                               timeout: int = 5) -> Dict[str, Any]:
         """
         Execute code in a sandbox environment.
         
+        The program runs with rlimits on address space, CPU time, open files
+        and process count, and its CPU time, peak RSS and output size are
+        reported in resource_usage.
+        
         Args:
             file_path: Path to the file containing the code
             language: The programming language
@@ -985,51 +1767,51 @@ try {{
         command = [SUPPORTED_LANGUAGES[language]["command"], file_path]
         
         try:
-            # Prepare input as string if provided
-            input_string = None
+            # Prepare input as bytes if provided
+            input_data = None
             if inputs:
-                input_string = "\n".join(inputs).encode()
+                input_data = "\n".join(inputs).encode()
             
-            # Set resource limits for security
-            # This uses subprocess with timeout to prevent infinite loops and resource exhaustion
-            
-            start_time = time.time()
-            process = subprocess.run(
+            process = run_sandboxed(
                 command,
-                input=input_string,
-                capture_output=True,
-                text=True,
-                timeout=timeout  # Timeout in seconds
+                input_data=input_data,
+                timeout=timeout,
+                cwd=self.sandbox_dir,
+                address_space=SUPPORTED_LANGUAGES[language]["address_space_limit"]
             )
-            execution_time = time.time() - start_time
             
-            if process.returncode != 0:
+            if process["timed_out"]:
+                return {
+                    "output": "",
+                    "error": f"Execution timed out after {timeout} seconds",
+                    "execution_time": timeout,
+                    "resource_usage": process["resource_usage"],
+                    "success": False
+                }
+            
+            if process["returncode"] != 0:
                 return {
                     "output": "",
-                    "error": process.stderr.strip() or f"Process exited with code {process.returncode}",
-                    "execution_time": execution_time,
+                    "error": process["stderr"].strip() or f"Process exited with code {process['returncode']}",
+                    "execution_time": process["wall_time"],
+                    "resource_usage": process["resource_usage"],
                     "success": False
                 }
             
             return {
-                "output": process.stdout.strip(),
+                "output": process["stdout"].strip(),
                 "error": None,
-                "execution_time": execution_time,
+                "execution_time": process["wall_time"],
+                "resource_usage": process["resource_usage"],
                 "success": True
             }
             
-        except subprocess.TimeoutExpired:
-            return {
-                "output": "",
-                "error": f"Execution timed out after {timeout} seconds",
-                "execution_time": timeout,
-                "success": False
-            }
         except Exception as e:
             logger.error(f"Error executing code: {str(e)}")
             return {
                 "output": "",
                 "error": str(e),
                 "execution_time": 0,
+                "resource_usage": None,
                 "success": False
-            } 
\ No newline at end of file
+            }
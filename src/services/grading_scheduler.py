@@ -0,0 +1,435 @@
+"""
+Asynchronous grading scheduler for code submissions.
+
+GradingScheduler queues submissions and runs them with
+asyncio.create_subprocess_exec, each job in its own temporary workspace.
+At most max_concurrency jobs run at once (one per core by default). Waiting
+jobs are served by priority and, within a priority, round-robin across
+users, so one student resubmitting in a loop cannot starve the others. When
+the queue is full, or a user already has too many jobs waiting, new
+submissions are rejected immediately with a retry hint instead of piling up
+until they time out. Captured output is capped like run_sandboxed's.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from src.services.code_worker_pool import (
+    DEFAULT_JOB_TIMEOUT, DEFAULT_MEMORY_LIMIT, WORKER_REPLY_GRACE, worker_command
+)
+from src.services.sandbox_process import CPU_LIMIT_MARGIN, MAX_OUTPUT_BYTES, sandbox_limits
+from src.services.cs_tools_service import (
+    SUPPORTED_LANGUAGES, TEST_CASE_TIME_BUDGET, collect_test_results, find_test_function
+)
+
+logger = logging.getLogger(__name__)
+
+# Priorities; jobs with a lower value run first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Waiting jobs above which new submissions are rejected
+DEFAULT_MAX_QUEUE_SIZE = 500
+
+# Waiting jobs of one user above which that user's submissions are rejected,
+# so a single burst cannot fill the queue for everyone else
+DEFAULT_MAX_QUEUED_PER_USER = 10
+
+# Number of recent jobs kept for latency metrics
+LATENCY_WINDOW = 1000
+
+
+@dataclass
+class GradingJob:
+    """A submission waiting for or undergoing grading."""
+    user_id: str
+    language: str
+    code: str
+    test_cases: List[Dict[str, Any]] = field(default_factory=list)
+    function_name: Optional[str] = None
+    stdin: Optional[str] = None
+    priority: int = PRIORITY_NORMAL
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    submitted_at: float = field(default_factory=time.monotonic)
+    future: Optional[asyncio.Future] = None
+
+
+class GradingScheduler:
+    """
+    Bounded, fair scheduler running grading jobs as asyncio subprocesses.
+
+    Call start() inside a running event loop, then submit() or grade() jobs.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None,
+                 max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+                 max_queued_per_user: int = DEFAULT_MAX_QUEUED_PER_USER,
+                 timeout: float = DEFAULT_JOB_TIMEOUT,
+                 memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency: Jobs run at once, defaults to the number of cores
+            max_queue_size: Waiting jobs above which submissions are rejected
+            max_queued_per_user: Waiting jobs of one user above which that
+                user's submissions are rejected
+            timeout: Wall clock timeout of a job in seconds, excluding test case budgets
+            memory_limit: Address space limit of Python jobs in bytes
+        """
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue_size = max_queue_size
+        self.max_queued_per_user = max_queued_per_user
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+
+        # priority -> user_id -> waiting jobs; users rotate to the end after each dispatch
+        self._queues: Dict[int, "OrderedDict[str, Deque[GradingJob]]"] = {}
+        self._waiting = 0
+        self._waiting_by_user: Dict[str, int] = {}
+        self._running = 0
+        self._wakeup: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+        self._wait_times: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._run_times: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "timeouts": 0}
+
+    async def start(self) -> None:
+        """Start the dispatch workers on the running event loop."""
+        if self._workers:
+            return
+        self._wakeup = asyncio.Condition()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+    async def stop(self) -> None:
+        """Stop the workers and fail every job still waiting."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        for users in self._queues.values():
+            for jobs in users.values():
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(RuntimeError("Grading scheduler stopped"))
+        self._queues.clear()
+        self._waiting = 0
+        self._waiting_by_user.clear()
+
+    def submit(self, user_id: str, language: str, code: str,
+               test_cases: Optional[List[Dict[str, Any]]] = None,
+               function_name: Optional[str] = None, stdin: Optional[str] = None,
+               priority: int = PRIORITY_NORMAL) -> asyncio.Future:
+        """
+        Queue a submission for grading.
+
+        Args:
+            user_id: The submitting user, used for fairness
+            language: The programming language
+            code: The code to grade
+            test_cases: Optional test cases, each with input and expected_output
+            function_name: Name of the function the test cases call
+            stdin: Optional text provided as standard input
+            priority: PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW
+
+        Returns:
+            Future resolving to the grading result
+        """
+        if not self._workers:
+            raise RuntimeError("Grading scheduler is not running")
+
+        loop = asyncio.get_running_loop()
+        job = GradingJob(user_id=user_id, language=language, code=code, test_cases=test_cases or [],
+                         function_name=function_name, stdin=stdin, priority=priority,
+                         future=loop.create_future())
+        self._counts["submitted"] += 1
+
+        user_waiting = self._waiting_by_user.get(user_id, 0)
+        if self._waiting >= self.max_queue_size:
+            self._counts["rejected"] += 1
+            job.future.set_result(self._rejected_result(
+                job, "Grading queue is full, please try again shortly", self._waiting
+            ))
+            return job.future
+        if user_waiting >= self.max_queued_per_user:
+            self._counts["rejected"] += 1
+            # The user's jobs are served one per round, so each waits for a full round
+            job.future.set_result(self._rejected_result(
+                job, "Too many of your submissions are waiting to be graded, please try again shortly",
+                user_waiting * max(1, len(self._waiting_by_user))
+            ))
+            return job.future
+
+        self._queues.setdefault(priority, OrderedDict()).setdefault(user_id, deque()).append(job)
+        self._waiting += 1
+        self._waiting_by_user[user_id] = user_waiting + 1
+        loop.create_task(self._notify())
+        return job.future
+
+    async def grade(self, user_id: str, language: str, code: str, **kwargs) -> Dict[str, Any]:
+        """Submit a job and wait for its result; see submit() for the arguments."""
+        return await self.submit(user_id, language, code, **kwargs)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get queue depth, throughput and latency metrics.
+
+        Returns:
+            Dictionary with queue depth per priority, running jobs, counters
+            and wait and run time summaries over recent jobs
+        """
+        return {
+            "queue_depth": self._waiting,
+            "queue_depth_by_priority": {
+                priority: sum(len(jobs) for jobs in users.values())
+                for priority, users in sorted(self._queues.items())
+            },
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            **self._counts,
+            "wait_time": self._latency_summary(self._wait_times),
+            "run_time": self._latency_summary(self._run_times)
+        }
+
+    async def _notify(self) -> None:
+        async with self._wakeup:
+            self._wakeup.notify()
+
+    def _next_job(self) -> Optional[GradingJob]:
+        """Take the next job: highest priority first, then round-robin over users."""
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            if not users:
+                continue
+            user_id, jobs = next(iter(users.items()))
+            job = jobs.popleft()
+            if jobs:
+                users.move_to_end(user_id)
+            else:
+                del users[user_id]
+            self._waiting -= 1
+            if self._waiting_by_user[job.user_id] == 1:
+                del self._waiting_by_user[job.user_id]
+            else:
+                self._waiting_by_user[job.user_id] -= 1
+            return job
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._wakeup:
+                await self._wakeup.wait_for(lambda: self._waiting > 0)
+                job = self._next_job()
+
+            started_at = time.monotonic()
+            self._wait_times.append(started_at - job.submitted_at)
+            self._running += 1
+            try:
+                result = await self._execute(job)
+            except Exception as e:
+                logger.error(f"Error grading job {job.job_id}: {str(e)}")
+                result = self._error_result(job, str(e))
+            finally:
+                self._running -= 1
+
+            run_time = time.monotonic() - started_at
+            self._run_times.append(run_time)
+            self._counts["completed" if result["success"] else "failed"] += 1
+            result.update({"wait_time": started_at - job.submitted_at, "run_time": run_time})
+            if not job.future.done():
+                job.future.set_result(result)
+
+    async def _execute(self, job: GradingJob) -> Dict[str, Any]:
+        """Run one job in a fresh workspace and build its result."""
+        if job.language not in SUPPORTED_LANGUAGES:
+            return self._error_result(job, f"Unsupported language: {job.language}")
+
+        function_name = job.function_name
+        if job.test_cases:
+            function_name = function_name or find_test_function(job.code, job.language)
+            if not function_name or not function_name.isidentifier():
+                return self._error_result(job, "Could not determine which function to test; specify function_name")
+
+        timeout = self.timeout + TEST_CASE_TIME_BUDGET * len(job.test_cases)
+        workspace = tempfile.mkdtemp(prefix="grading_job_")
+        try:
+            uses_worker = self._uses_worker(job)
+            if uses_worker:
+                # A one-shot sandbox worker, speaking the protocol of the pooled ones
+                memory_limit = (self.memory_limit if job.language == "python"
+                                else SUPPORTED_LANGUAGES[job.language]["address_space_limit"])
+                command, preexec = worker_command(job.language, memory_limit, int(timeout) + CPU_LIMIT_MARGIN)
+                stdin = json.dumps({
+                    "code": job.code,
+                    "stdin": job.stdin,
+                    "function": function_name,
+                    "test_cases": job.test_cases,
+                    "test_timeout": TEST_CASE_TIME_BUDGET,
+                    "timeout": timeout
+                }) + "\n"
+                # The worker stops the job itself and reports the timeout
+                wait_timeout = timeout + WORKER_REPLY_GRACE
+            else:
+                # JavaScript programs reading standard input need a full Node.js runtime
+                file_path = os.path.join(workspace, "submission.js")
+                with open(file_path, "w") as f:
+                    f.write(job.code)
+                command = [SUPPORTED_LANGUAGES["javascript"]["command"], file_path]
+                stdin = job.stdin or ""
+                preexec = sandbox_limits(SUPPORTED_LANGUAGES["javascript"]["address_space_limit"],
+                                         int(timeout) + CPU_LIMIT_MARGIN)
+                wait_timeout = timeout
+
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=workspace,
+                preexec_fn=preexec,
+                start_new_session=os.name == "posix"
+            )
+            try:
+                (stdout, stdout_size), (stderr, _) = await asyncio.wait_for(
+                    self._communicate(process, stdin.encode()), wait_timeout
+                )
+            except asyncio.TimeoutError:
+                self._kill(process)
+                await process.wait()
+                self._counts["timeouts"] += 1
+                return self._error_result(job, f"Execution timed out after {timeout} seconds")
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+        output = stdout.decode(errors="replace")
+        if uses_worker:
+            reply = self._parse_worker_reply(output)
+            if reply is None and stdout_size > MAX_OUTPUT_BYTES:
+                return self._error_result(job, f"Output exceeded the limit of {MAX_OUTPUT_BYTES} bytes")
+            if reply is None:
+                return self._error_result(job, stderr.decode(errors="replace").strip()
+                                          or f"Process exited with code {process.returncode}")
+            if reply.get("job_failure") == "timeout":
+                self._counts["timeouts"] += 1
+            result = self._build_result(job, reply["success"], reply["output"], reply["error"], reply["results"])
+            result["resource_usage"] = reply.get("resource_usage")
+            return result
+
+        if process.returncode != 0:
+            return self._build_result(job, False, "", stderr.decode(errors="replace").strip()
+                                      or f"Process exited with code {process.returncode}", [])
+        return self._build_result(job, True, output, None, [])
+
+    async def _communicate(self, process: asyncio.subprocess.Process, input_data: bytes):
+        """
+        Feed a process its input and read its output until it exits.
+
+        Returns:
+            Tuple of (stdout, total stdout size) and (stderr, total stderr
+            size), each stream keeping at most MAX_OUTPUT_BYTES
+        """
+        async def feed() -> None:
+            try:
+                process.stdin.write(input_data)
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # The program exited without reading its input
+                pass
+            process.stdin.close()
+
+        async def drain(stream: asyncio.StreamReader):
+            chunks, kept, total = [], 0, 0
+            while True:
+                chunk = await stream.read(65536)
+                if not chunk:
+                    return b"".join(chunks), total
+                total += len(chunk)
+                if kept < MAX_OUTPUT_BYTES:
+                    chunk = chunk[:MAX_OUTPUT_BYTES - kept]
+                    chunks.append(chunk)
+                    kept += len(chunk)
+
+        _, stdout, stderr, _ = await asyncio.gather(
+            feed(), drain(process.stdout), drain(process.stderr), process.wait()
+        )
+        return stdout, stderr
+
+    def _kill(self, process: asyncio.subprocess.Process) -> None:
+        """Kill a job process together with the processes it started."""
+        if os.name == "posix":
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+                return
+            except OSError:
+                pass
+        process.kill()
+
+    def _uses_worker(self, job: GradingJob) -> bool:
+        """Whether a job runs in a sandbox worker rather than as a plain program."""
+        return job.language == "python" or bool(job.test_cases)
+
+    def _parse_worker_reply(self, output: str) -> Optional[Dict[str, Any]]:
+        """Get the job reply from a sandbox worker's output, skipping its ready message."""
+        for line in reversed(output.splitlines()):
+            if not line.strip():
+                continue
+            try:
+                reply = json.loads(line)
+            except ValueError:
+                return None
+            return None if reply.get("ready") else reply
+        return None
+
+    def _build_result(self, job: GradingJob, success: bool, output: str, error: Optional[str],
+                      worker_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        results = collect_test_results(job.test_cases, worker_results, error)
+        passed_count = sum(1 for result in results if result["passed"])
+        return {
+            "job_id": job.job_id,
+            "user_id": job.user_id,
+            "language": job.language,
+            "output": output.strip(),
+            "all_passed": bool(results) and passed_count == len(results),
+            "passed_count": passed_count,
+            "failed_count": len(results) - passed_count,
+            "total_count": len(results),
+            "results": results,
+            "error": error,
+            "resource_usage": None,
+            "success": success
+        }
+
+    def _error_result(self, job: GradingJob, error: str) -> Dict[str, Any]:
+        return self._build_result(job, False, "", error, [])
+
+    def _rejected_result(self, job: GradingJob, error: str, jobs_ahead: int) -> Dict[str, Any]:
+        """Result for a submission turned away, with a retry hint for when jobs_ahead have run."""
+        result = self._error_result(job, error)
+        mean_run_time = self._latency_summary(self._run_times)["mean"] or self.timeout
+        result["retry_after"] = jobs_ahead * mean_run_time / self.max_concurrency
+        result["wait_time"] = 0.0
+        result["run_time"] = 0.0
+        return result
+
+    def _latency_summary(self, samples: Deque[float]) -> Dict[str, Optional[float]]:
+        if not samples:
+            return {"mean": None, "p50": None, "p95": None, "max": None}
+        ordered = sorted(samples)
+        return {
+            "mean": sum(ordered) / len(ordered),
+            "p50": ordered[(len(ordered) - 1) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+            "max": ordered[-1]
+        }
@@ -0,0 +1,38 @@
+/*
+ * Long-lived JavaScript syntax checker for Mathtermind.
+ *
+ * Started by JavaScriptSyntaxChecker (see syntax_checker.py). Reads one JSON
+ * object {"code": ...} per line on stdin and writes one JSON reply
+ * {"is_valid": ..., "error": ...} per line on stdout. Code is compiled with
+ * the CommonJS module wrapper, as `node --check` does, and never run.
+ */
+"use strict";
+
+const readline = require("readline");
+const vm = require("vm");
+
+const MODULE_PARAMETERS = ["exports", "require", "module", "__filename", "__dirname"];
+
+function check(code) {
+    try {
+        vm.compileFunction(code, MODULE_PARAMETERS, { filename: "submission.js" });
+        return { is_valid: true, error: null };
+    } catch (e) {
+        // Keep the location, source line and message, as `node --check` reports them
+        const stack = String(e && e.stack || e);
+        const frames = stack.indexOf("\n    at ");
+        return { is_valid: false, error: (frames >= 0 ? stack.slice(0, frames) : stack).trim() };
+    }
+}
+
+const lines = readline.createInterface({ input: process.stdin, terminal: false });
+lines.on("line", (line) => {
+    let reply;
+    try {
+        reply = check(JSON.parse(line).code);
+    } catch (e) {
+        reply = { is_valid: false, error: `Error checking syntax: ${e.message}` };
+    }
+    process.stdout.write(JSON.stringify(reply) + "\n");
+});
+process.stdout.write(JSON.stringify({ ready: true }) + "\n");
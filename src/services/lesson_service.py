@@ -23,7 +23,6 @@ from src.core.error_handling import (
 )
 from src.services.base_service import BaseService
 
-from src.db import get_db
 from src.db.repositories import lesson_repo
 from src.models.lesson import Lesson
 from src.db.models import Lesson as DBLesson
@@ -38,8 +37,6 @@ class LessonService(BaseService):
     
     def __init__(self, repo=None):
         super().__init__()
-        # Connect to the database
-        self.db = next(get_db())
         # Use the provided repository (for testing) or create a new one
         self.lesson_repo = repo if repo is not None else lesson_repo
         # Create an instance of the progress service for checking lesson completion
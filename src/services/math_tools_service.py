@@ -1,7 +1,17 @@
+import atexit
+import json
 import logging
 import math
+import os
 import re
-from typing import Dict, List, Optional, Any, Tuple, Union
+import sqlite3
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple, Union, FrozenSet, Iterable
 from decimal import Decimal, InvalidOperation
 import numpy as np
 # Handle scipy import gracefully for test coverage
@@ -19,9 +29,10 @@ except ImportError:
             # Return dummy values that match the structure expected by the code
             return (0, 0, 0, 0, 0)  # slope, intercept, r_value, p_value, std_err
     stats = DummyStats()
-import sympy as sp
 
-from src.services.base_service import BaseService, handle_service_errors
+from config import DATA_DIR
+from src.services.base_service import BaseService, ValidationError, handle_service_errors
+from src.services.streaming_statistics import ExactStatistics, StreamingStatistics
 from src.services.tracking_service import TrackingService
 
 logger = logging.getLogger(__name__)
@@ -54,20 +65,550 @@ FUNCTIONS = {
     'ceil': math.ceil
 }
 
+# NumPy counterparts of the supported functions for vectorized evaluation
+NUMPY_FUNCTIONS = {
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'asin': np.arcsin,
+    'acos': np.arccos,
+    'atan': np.arctan,
+    'sqrt': np.sqrt,
+    'log': np.log10,
+    'ln': np.log,
+    'abs': np.abs,
+    'exp': np.exp,
+    'round': np.round,
+    'floor': np.floor,
+    'ceil': np.ceil
+}
+
+# NumPy counterparts of the binary operators for vectorized evaluation
+NUMPY_OPERATORS = {
+    '+': np.add,
+    '-': np.subtract,
+    '*': np.multiply,
+    '/': np.true_divide,
+    '^': np.power,
+    '**': np.power
+}
+
 # Define constants
 CONSTANTS = {
     'pi': math.pi,
     'e': math.e
 }
 
+# Single-pass lexer for expressions with spaces removed. Characters matching no
+# other group are kept as "other" tokens and ignored by evaluation.
+_LEXER_PATTERN = re.compile(
+    r'(?P<number>[0-9.]+)'
+    r'|(?P<name>[A-Za-z_][A-Za-z0-9_]*)'
+    r'|(?P<operator>\*\*|[-+*/^])'
+    r'|(?P<paren>[()])'
+    r'|(?P<other>.)',
+    re.DOTALL
+)
+
+# Constant values as they appear in preprocessed expressions
+_CONSTANT_TEXT = {name: str(value) for name, value in CONSTANTS.items()}
+
+# Maximum number of compiled expressions kept in the shared LRU cache
+COMPILED_CACHE_SIZE = 1024
+
+# Number of random variable assignments used to probe expression equivalence
+PROBE_COUNT = 32
+
+# Minimum number of probes where both expressions are defined for a conclusive result
+PROBE_MIN_VALID = 8
+
+# Probe values are drawn uniformly from [-PROBE_RANGE, PROBE_RANGE]
+PROBE_RANGE = 3.0
+
+# Fixed seed so probing gives the same verdict for the same answers every time
+PROBE_SEED = 20240917
+
+# Default path of the persistent cache of symbolic canonical forms
+CANONICAL_CACHE_PATH = DATA_DIR / "math_canonical_forms.db"
+
+# Canonical forms kept in memory by the persistent cache, least recently used evicted first
+CANONICAL_CACHE_MEMORY_SIZE = 4096
+
+# Rows kept in the persistent cache's table, oldest written evicted first
+CANONICAL_CACHE_MAX_ROWS = 100000
+
+# Writes to the persistent cache committed together
+CANONICAL_CACHE_COMMIT_INTERVAL = 64
+
+# Default time limit in seconds for canonicalizing one expression with SymPy
+SYMBOLIC_TIMEOUT = 2.0
+
+# Script of the child process canonicalizing expressions with SymPy
+SYMBOLIC_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbolic_worker.py")
+
+# Seconds the symbolic worker gets to import SymPy and report ready
+SYMBOLIC_WORKER_STARTUP_TIMEOUT = 30.0
+
+# Values beyond this magnitude are treated as discontinuities when graphing
+GRAPH_VALUE_LIMIT = 1e10
+
+# A sign-changing step this many times larger than the median step is treated as a jump
+GRAPH_JUMP_FACTOR = 50
+
+# Supported sampling modes for function graphs
+GRAPH_SAMPLING_MODES = ("uniform", "adaptive")
+
+# Number of evenly spaced samples adaptive sampling starts from
+ADAPTIVE_INITIAL_POINTS = 33
+
+# Intervals narrower than this fraction of the x range are never split further
+ADAPTIVE_MIN_WIDTH_FRACTION = 1e-6
+
+# Curvature alone never splits intervals narrower than this fraction of the x range
+ADAPTIVE_CURVE_WIDTH_FRACTION = 1e-3
+
+# A step larger than this fraction of the visible y range is treated as a possible jump
+ADAPTIVE_JUMP_FRACTION = 0.25
+
+# Instruction kinds used by compiled expression programs
+_NUMBER = 0
+_VARIABLE = 1
+_OPERATOR = 2
+_FUNCTION = 3
+
+
+def _apply_operator(token: str, a: float, b: float) -> float:
+    """Apply a binary operator to two operands."""
+    if token == '+':
+        return a + b
+    if token == '-':
+        return a - b
+    if token == '*':
+        return a * b
+    if token == '/':
+        if b == 0:
+            raise ValueError("Division by zero")
+        return a / b
+    if token in ('^', '**'):
+        return a ** b
+    raise ValueError(f"Unknown operator: {token}")
+
+
+def _apply_function(token: str, a: float) -> float:
+    """Apply a supported function to a single operand."""
+    try:
+        return FUNCTIONS[token](a)
+    except Exception as e:
+        raise ValueError(f"Error applying function {token}: {str(e)}")
+
+
+@dataclass(frozen=True)
+class CompiledExpression:
+    """
+    Immutable program produced by compiling a mathematical expression.
+
+    The expression is stored as Reverse Polish Notation instructions, so it can
+    be evaluated any number of times without preprocessing, tokenizing or
+    running the shunting-yard algorithm again.
+    """
+    source: str  # Normalized source the program was compiled from
+    instructions: Tuple[Tuple[int, Any], ...]  # RPN instructions as (kind, value) pairs
+    variables: FrozenSet[str]  # Names of free variables referenced by the expression
+
+    def evaluate(self, variables: Optional[Dict[str, float]] = None) -> float:
+        """
+        Evaluate the program.
+        
+        Args:
+            variables: Optional mapping of variable names to values
+            
+        Returns:
+            The evaluation result
+        """
+        stack = []
+        
+        for kind, value in self.instructions:
+            if kind == _NUMBER:
+                stack.append(value)
+            elif kind == _VARIABLE:
+                if not variables or value not in variables:
+                    raise ValueError(f"Unknown token: {value}")
+                stack.append(variables[value])
+            elif kind == _OPERATOR:
+                if len(stack) < 2:
+                    raise ValueError(f"Not enough operands for operator: {value}")
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(_apply_operator(value, a, b))
+            else:
+                if len(stack) < 1:
+                    raise ValueError(f"Not enough operands for function: {value}")
+                stack.append(_apply_function(value, stack.pop()))
+        
+        if len(stack) != 1:
+            raise ValueError("Invalid expression: too many values left on stack")
+        
+        return stack[0]
+
+    def evaluate_array(self, variables: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        """
+        Evaluate the program over whole arrays of variable values at once.
+        
+        Invalid operations such as division by zero or out-of-domain function
+        arguments produce NaN or Inf entries instead of raising.
+        
+        Args:
+            variables: Optional mapping of variable names to arrays of values
+            
+        Returns:
+            The element-wise evaluation result (a 0-d array for constant expressions)
+        """
+        stack = []
+        
+        with np.errstate(all='ignore'):
+            for kind, value in self.instructions:
+                if kind == _NUMBER:
+                    stack.append(np.float64(value))
+                elif kind == _VARIABLE:
+                    if not variables or value not in variables:
+                        raise ValueError(f"Unknown token: {value}")
+                    stack.append(np.asarray(variables[value], dtype=float))
+                elif kind == _OPERATOR:
+                    if len(stack) < 2:
+                        raise ValueError(f"Not enough operands for operator: {value}")
+                    b = stack.pop()
+                    a = stack.pop()
+                    stack.append(NUMPY_OPERATORS[value](a, b))
+                else:
+                    if len(stack) < 1:
+                        raise ValueError(f"Not enough operands for function: {value}")
+                    stack.append(NUMPY_FUNCTIONS[value](stack.pop()))
+        
+        if len(stack) != 1:
+            raise ValueError("Invalid expression: too many values left on stack")
+        
+        return np.asarray(stack[0], dtype=float)
+
+
+class CompiledExpressionCache:
+    """Thread-safe bounded LRU cache of compiled expressions keyed by normalized source."""
+
+    def __init__(self, max_size: int = COMPILED_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, CompiledExpression]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CompiledExpression]:
+        """Return the cached program for a key, marking it as recently used."""
+        with self._lock:
+            program = self._entries.get(key)
+            if program is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return program
+
+    def put(self, key: str, program: CompiledExpression) -> None:
+        """Store a program, evicting the least recently used entries if needed."""
+        with self._lock:
+            self._entries[key] = program
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached programs and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared across service instances so hot reference answers stay compiled
+_compiled_cache = CompiledExpressionCache()
+
+# Marks a canonical form lookup that found nothing
+_MISSING = object()
+
+
+class CanonicalFormCache:
+    """
+    Persistent cache of symbolic canonical forms keyed by normalized source.
+
+    Canonical forms are stored in a small SQLite database so expensive SymPy
+    simplification runs once per distinct expression across restarts. Entries
+    whose canonicalization failed or timed out are stored as None so they are
+    not retried on the grading hot path.
+
+    Recently used forms are also kept in a bounded in-memory LRU. Writes are
+    committed in batches of commit_interval and on flush; each commit drops
+    the oldest written rows beyond max_rows.
+    """
+
+    def __init__(self, path: Union[str, Any] = CANONICAL_CACHE_PATH,
+                 memory_size: int = CANONICAL_CACHE_MEMORY_SIZE,
+                 max_rows: int = CANONICAL_CACHE_MAX_ROWS,
+                 commit_interval: int = CANONICAL_CACHE_COMMIT_INTERVAL):
+        self.path = str(path)
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.commit_interval = commit_interval
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._pending = 0
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS canonical_forms ("
+            "source TEXT PRIMARY KEY, canonical TEXT)"
+        )
+        self._connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        """Return the cached canonical form (possibly None), or _MISSING if unknown."""
+        with self._lock:
+            if key in self._memory:
+                self.hits += 1
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            row = self._connection.execute(
+                "SELECT canonical FROM canonical_forms WHERE source = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return _MISSING
+            self.hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key: str, canonical: Optional[str]) -> None:
+        """Store the canonical form of an expression."""
+        with self._lock:
+            self._remember(key, canonical)
+            # Replacing gives the row a new rowid, so rowids follow write order
+            self._connection.execute(
+                "INSERT OR REPLACE INTO canonical_forms (source, canonical) VALUES (?, ?)",
+                (key, canonical)
+            )
+            self._pending += 1
+            if self._pending >= self.commit_interval:
+                self._commit()
+
+    def flush(self) -> None:
+        """Commit writes not committed yet."""
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+    def close(self) -> None:
+        """Commit pending writes and close the database."""
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def clear(self) -> None:
+        """Remove all cached canonical forms and reset the statistics."""
+        with self._lock:
+            self._memory.clear()
+            self._connection.execute("DELETE FROM canonical_forms")
+            self._connection.commit()
+            self._pending = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit statistics."""
+        with self._lock:
+            size = self._connection.execute("SELECT COUNT(*) FROM canonical_forms").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "memory_size": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _remember(self, key: str, canonical: Optional[str]) -> None:
+        """Keep a form in memory, evicting the least recently used beyond memory_size."""
+        self._memory[key] = canonical
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _commit(self) -> None:
+        """Drop the oldest rows beyond max_rows and commit."""
+        self._connection.execute(
+            "DELETE FROM canonical_forms WHERE rowid <= "
+            "(SELECT MAX(rowid) FROM canonical_forms) - ?",
+            (self.max_rows,)
+        )
+        self._connection.commit()
+        self._pending = 0
+
+
+# Opened on first use so importing the module doesn't touch the data directory
+_canonical_cache: Optional[CanonicalFormCache] = None
+_canonical_cache_lock = threading.Lock()
+
+
+def get_canonical_form_cache() -> CanonicalFormCache:
+    """Get the shared persistent canonical form cache."""
+    global _canonical_cache
+    with _canonical_cache_lock:
+        if _canonical_cache is None:
+            _canonical_cache = CanonicalFormCache()
+            atexit.register(_canonical_cache.flush)
+        return _canonical_cache
+
+
+class SymbolicWorker:
+    """
+    Child process canonicalizing compiled expressions with SymPy.
+
+    SymPy computations cannot be interrupted from another thread, so they run
+    in symbolic_worker.py. A computation overrunning its time limit gets the
+    process killed, which stops it for certain; the next request starts a
+    fresh process. Requests are served one at a time.
+    """
+
+    def __init__(self, startup_timeout: float = SYMBOLIC_WORKER_STARTUP_TIMEOUT):
+        self.startup_timeout = startup_timeout
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._timed_out = False
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def canonical_form(self, instructions: List[Tuple[int, Any]], timeout: float) -> str:
+        """
+        Canonicalize a compiled expression program.
+
+        Args:
+            instructions: The program's (kind, value) instructions
+            timeout: Time limit of the computation in seconds
+
+        Returns:
+            The canonical form as a SymPy srepr string
+
+        Raises:
+            TimeoutError: If the computation does not finish in time
+            ValueError: If the expression cannot be canonicalized
+            RuntimeError: If the worker cannot be started or dies
+        """
+        with self._lock:
+            if not self.alive:
+                self._start()
+            try:
+                self._process.stdin.write(json.dumps({"instructions": instructions}) + "\n")
+                self._process.stdin.flush()
+            except OSError:
+                self._stop()
+                raise RuntimeError("Symbolic worker is not running")
+
+            reply = self._read_reply(timeout)
+            if reply is None:
+                timed_out = self._timed_out
+                self._stop()
+                if timed_out:
+                    raise TimeoutError(f"Timed out after {timeout} seconds")
+                raise RuntimeError("Symbolic worker exited unexpectedly")
+            if "error" in reply:
+                raise ValueError(reply["error"])
+            return reply["canonical"]
+
+    def close(self) -> None:
+        """Stop the worker process."""
+        with self._lock:
+            self._stop()
+
+    def _start(self) -> None:
+        self._process = subprocess.Popen(
+            [sys.executable, SYMBOLIC_WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8"
+        )
+        reply = self._read_reply(self.startup_timeout)
+        if not (reply and reply.get("ready")):
+            self._stop()
+            raise RuntimeError("Symbolic worker failed to start")
+
+    def _read_reply(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Read one reply line, killing the worker if none arrives in time."""
+        self._timed_out = False
+        timer = threading.Timer(timeout, self._expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            line = self._process.stdout.readline()
+        except (OSError, ValueError):
+            line = ""
+        finally:
+            timer.cancel()
+
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def _expire(self) -> None:
+        self._timed_out = True
+        self._process.kill()
+
+    def _stop(self) -> None:
+        if self._process is None:
+            return
+        self._process.kill()
+        self._process.wait()
+        self._process.stdin.close()
+        self._process.stdout.close()
+        self._process = None
+
+
+# Started on first use and shared, so SymPy is imported once per application
+_symbolic_worker = SymbolicWorker()
+atexit.register(_symbolic_worker.close)
+
 
 class MathToolsService(BaseService):
     """Service for mathematical tools to support educational content."""
 
+    # Tools compute in memory; usage tracking opens its own unit of work
+    uses_database = False
+
     def __init__(self):
         """Initialize the math tools service."""
         super().__init__()
         self.tracking_service = None
+        self.canonical_cache = None
+        self.symbolic_worker = _symbolic_worker
+        self.symbolic_timeout = SYMBOLIC_TIMEOUT
         
     def _init_dependencies(self):
         """Initialize dependencies if not already set."""
@@ -99,54 +640,15 @@ class MathToolsService(BaseService):
             )
         
         try:
-            # Preprocess the expression
-            cleaned_expression = self._preprocess_expression(expression)
-            
-            # Check for balanced parentheses
-            if not self._has_balanced_parentheses(cleaned_expression):
-                return {
-                    "expression": expression,
-                    "is_valid": False,
-                    "error": "Unbalanced parentheses",
-                    "success": True
-                }
-            
-            # Check for invalid operators (like consecutive operators)
-            if self._has_invalid_operators(cleaned_expression):
-                return {
-                    "expression": expression,
-                    "is_valid": False,
-                    "error": "Invalid operator usage",
-                    "success": True
-                }
-            
-            # Check for valid function usage
-            if self._has_invalid_functions(cleaned_expression):
-                return {
-                    "expression": expression,
-                    "is_valid": False,
-                    "error": "Invalid function usage",
-                    "success": True
-                }
+            # Lex once and check parentheses, operators and functions in one scan
+            error = self._validation_error(self._lex_expression(expression))
             
-            # Try parsing the expression (will catch most syntax errors)
-            try:
-                self._tokenize_expression(cleaned_expression)
-                # Expression is valid
-                return {
-                    "expression": expression,
-                    "is_valid": True,
-                    "error": None,
-                    "success": True
-                }
-            except Exception as e:
-                logger.error(f"Error tokenizing expression '{expression}': {str(e)}")
-                return {
-                    "expression": expression,
-                    "is_valid": False,
-                    "error": str(e),
-                    "success": True
-                }
+            return {
+                "expression": expression,
+                "is_valid": error is None,
+                "error": error,
+                "success": True
+            }
             
         except Exception as e:
             logger.error(f"Error validating expression '{expression}': {str(e)}")
@@ -158,7 +660,8 @@ class MathToolsService(BaseService):
             }
 
     @handle_service_errors(service_name="math_tools")
-    def check_answer(self, student_answer: str, correct_answer: str, tolerance: float = 0.001, user_id: Optional[str] = None) -> Dict[str, Any]:
+    def check_answer(self, student_answer: str, correct_answer: str, tolerance: float = 0.001, user_id: Optional[str] = None,
+                     symbolic: bool = True, probe: bool = True) -> Dict[str, Any]:
         """
         Check if a student's answer matches the correct answer within a given tolerance.
         
@@ -167,6 +670,10 @@ class MathToolsService(BaseService):
             correct_answer: The correct answer to compare against
             tolerance: Tolerance for numerical comparison (default: 0.001)
             user_id: Optional user ID for tracking usage
+            symbolic: If True, answers that can't be evaluated numerically are
+                compared by their symbolic canonical forms (e.g. "1+2x" matches "2*x+1")
+            probe: If True, algebraic answers are first compared by evaluating both
+                at random variable values; SymPy is only used if that is inconclusive
             
         Returns:
             Dictionary containing the result and additional information
@@ -183,39 +690,22 @@ class MathToolsService(BaseService):
             )
         
         try:
-            # Preprocess both answers
-            cleaned_student = self._preprocess_expression(student_answer)
-            cleaned_correct = self._preprocess_expression(correct_answer)
+            is_correct = self._answers_match(
+                student_answer,
+                correct_answer,
+                tolerance,
+                self._numeric_answer_value(student_answer),
+                self._numeric_answer_value(correct_answer),
+                symbolic,
+                probe
+            )
             
-            # Try to evaluate both expressions
-            try:
-                student_value = self._evaluate_parsed_expression(cleaned_student)
-                correct_value = self._evaluate_parsed_expression(cleaned_correct)
-                
-                # Compare numerically
-                is_correct = abs(student_value - correct_value) <= tolerance
-                
-                return {
-                    "student_answer": student_answer,
-                    "is_correct": is_correct,
-                    "error": None,
-                    "success": True
-                }
-                
-            except Exception as e:
-                # If numerical evaluation fails, try string comparison
-                # This handles cases like algebraic expressions
-                student_normalized = self._normalize_expression(cleaned_student)
-                correct_normalized = self._normalize_expression(cleaned_correct)
-                
-                is_correct = student_normalized == correct_normalized
-                
-                return {
-                    "student_answer": student_answer,
-                    "is_correct": is_correct,
-                    "error": None,
-                    "success": True
-                }
+            return {
+                "student_answer": student_answer,
+                "is_correct": is_correct,
+                "error": None,
+                "success": True
+            }
             
         except Exception as e:
             logger.error(f"Error checking answer '{student_answer}': {str(e)}")
@@ -226,6 +716,161 @@ class MathToolsService(BaseService):
                 "success": False
             }
 
+    @handle_service_errors(service_name="math_tools")
+    def check_answers_batch(self, answers: List[Tuple], tolerance: float = 0.001, user_id: Optional[str] = None,
+                            max_workers: Optional[int] = None, symbolic: bool = True,
+                            probe: bool = True) -> Dict[str, Any]:
+        """
+        Check many student answers at once.
+        
+        Each distinct answer is compiled and evaluated only once per batch, and a
+        single aggregated tracking record is emitted for the whole batch.
+        
+        Args:
+            answers: Sequence of (student_answer, correct_answer) or
+                (student_answer, correct_answer, tolerance) tuples
+            tolerance: Tolerance used for items that don't specify their own (default: 0.001)
+            user_id: Optional user ID for tracking usage
+            max_workers: Optional number of worker threads used to evaluate the
+                distinct student answers. Evaluates sequentially if not provided.
+            symbolic: If True, compare non-numeric answers by their symbolic canonical forms
+            probe: If True, compare non-numeric answers at random variable values first
+            
+        Returns:
+            Dictionary containing per-answer results in input order and totals
+        """
+        self._init_dependencies()
+        
+        items = []
+        for index, item in enumerate(answers):
+            if not isinstance(item, (tuple, list)) or len(item) not in (2, 3):
+                raise ValidationError(
+                    f"Answer at index {index} must be a (student_answer, correct_answer[, tolerance]) tuple"
+                )
+            items.append((item[0], item[1], item[2] if len(item) == 3 else tolerance))
+        
+        # Compile and evaluate every distinct reference answer once
+        correct_values = {
+            answer: self._numeric_answer_value(answer)
+            for answer in dict.fromkeys(correct for _, correct, _ in items)
+        }
+        
+        # Evaluate every distinct student answer once, optionally in parallel
+        student_answers = list(dict.fromkeys(student for student, _, _ in items))
+        if max_workers and max_workers > 1 and len(student_answers) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                student_values = dict(zip(student_answers, executor.map(self._numeric_answer_value, student_answers)))
+        else:
+            student_values = {answer: self._numeric_answer_value(answer) for answer in student_answers}
+        
+        results = []
+        for student_answer, correct_answer, item_tolerance in items:
+            try:
+                is_correct = self._answers_match(
+                    student_answer,
+                    correct_answer,
+                    item_tolerance,
+                    student_values[student_answer],
+                    correct_values[correct_answer],
+                    symbolic,
+                    probe
+                )
+                results.append({
+                    "student_answer": student_answer,
+                    "is_correct": is_correct,
+                    "error": None,
+                    "success": True
+                })
+            except Exception as e:
+                logger.error(f"Error checking answer '{student_answer}': {str(e)}")
+                results.append({
+                    "student_answer": student_answer,
+                    "is_correct": False,
+                    "error": str(e),
+                    "success": False
+                })
+        
+        correct_count = sum(1 for result in results if result["is_correct"])
+        
+        # Track usage once for the whole batch if user_id provided
+        if user_id:
+            self.tracking_service.track_tool_usage(
+                user_id=user_id,
+                tool_type="answer_checker",
+                action="check_answers_batch",
+                data={
+                    "answers_count": len(results),
+                    "correct_count": correct_count,
+                    "distinct_correct_answers": len(correct_values)
+                }
+            )
+        
+        return {
+            "results": results,
+            "total": len(results),
+            "correct_count": correct_count,
+            "error": None,
+            "success": True
+        }
+
+    def _numeric_answer_value(self, answer: str) -> Optional[Any]:
+        """
+        Evaluate an answer numerically using its cached compiled program.
+        
+        Args:
+            answer: The answer expression
+            
+        Returns:
+            The numeric value, or None if the answer cannot be evaluated numerically
+        """
+        try:
+            return self.compile_expression(answer).evaluate()
+        except Exception:
+            return None
+
+    def _answers_match(self, student_answer: str, correct_answer: str, tolerance: float,
+                       student_value: Optional[Any], correct_value: Optional[Any],
+                       symbolic: bool = True, probe: bool = True) -> bool:
+        """
+        Decide whether a student answer matches the correct answer.
+        
+        Args:
+            student_answer: The student's submitted answer
+            correct_answer: The correct answer to compare against
+            tolerance: Tolerance for numerical comparison
+            student_value: Numeric value of the student answer, or None
+            correct_value: Numeric value of the correct answer, or None
+            symbolic: Whether to compare symbolic canonical forms when numeric comparison fails
+            probe: Whether to compare at random variable values before using SymPy
+            
+        Returns:
+            True if the answers match, False otherwise
+        """
+        if student_value is not None and correct_value is not None:
+            try:
+                # Compare numerically
+                return abs(student_value - correct_value) <= tolerance
+            except Exception:
+                pass
+        
+        if probe:
+            verdict = self._probe_equivalence(student_answer, correct_answer, tolerance)
+            if verdict is not None:
+                return verdict
+        
+        if symbolic:
+            student_canonical = self._canonical_form(student_answer)
+            correct_canonical = self._canonical_form(correct_answer)
+            if student_canonical is not None and correct_canonical is not None:
+                return student_canonical == correct_canonical
+        
+        # If numerical evaluation fails, try string comparison
+        # This handles cases like algebraic expressions
+        student_normalized = self._normalize_expression(self._preprocess_expression(student_answer))
+        correct_normalized = self._normalize_expression(self._preprocess_expression(correct_answer))
+        
+        return student_normalized == correct_normalized
+
     @handle_service_errors(service_name="math_tools")
     def validate_formula(self, formula: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -250,54 +895,15 @@ class MathToolsService(BaseService):
             )
         
         try:
-            # Preprocess the formula
-            cleaned_formula = self._preprocess_expression(formula)
+            # Lex once and check parentheses, operators and functions in one scan
+            error = self._validation_error(self._lex_expression(formula))
             
-            # Check for balanced parentheses
-            if not self._has_balanced_parentheses(cleaned_formula):
-                return {
-                    "formula": formula,
-                    "is_valid": False,
-                    "error": "Unbalanced parentheses",
-                    "success": True
-                }
-            
-            # Check for invalid operators (like consecutive operators)
-            if self._has_invalid_operators(cleaned_formula):
-                return {
-                    "formula": formula,
-                    "is_valid": False,
-                    "error": "Invalid operator usage",
-                    "success": True
-                }
-            
-            # Check for valid function usage
-            if self._has_invalid_functions(cleaned_formula):
-                return {
-                    "formula": formula,
-                    "is_valid": False,
-                    "error": "Invalid function usage",
-                    "success": True
-                }
-            
-            # Try parsing the formula (will catch most syntax errors)
-            try:
-                self._tokenize_expression(cleaned_formula)
-                # Formula is valid
-                return {
-                    "formula": formula,
-                    "is_valid": True,
-                    "error": None,
-                    "success": True
-                }
-            except Exception as e:
-                logger.error(f"Error tokenizing formula '{formula}': {str(e)}")
-                return {
-                    "formula": formula,
-                    "is_valid": False,
-                    "error": str(e),
-                    "success": True
-                }
+            return {
+                "formula": formula,
+                "is_valid": error is None,
+                "error": error,
+                "success": True
+            }
             
         except Exception as e:
             logger.error(f"Error validating formula '{formula}': {str(e)}")
@@ -684,12 +1290,21 @@ class MathToolsService(BaseService):
             }
 
     @handle_service_errors(service_name="math_tools")
-    def prepare_statistics_visualization(self, data: List[float], visualization_type: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+    def prepare_statistics_visualization(self, data: Union[Iterable[float], StreamingStatistics], visualization_type: str,
+                                         user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Prepare data for statistical visualization.
         
+        Summary statistics, histograms and boxplots are computed in one
+        streaming pass, so data may also be a generator, an iterable of chunks,
+        or a StreamingStatistics accumulator merged from partial results.
+        Point-based visualizations (scatter, bar, line) need the data points
+        themselves. Data held in memory (a list, tuple or array) gets exact
+        statistics; quantiles, histograms and outliers of streamed data and
+        accumulators are t-digest estimates.
+        
         Args:
-            data: List of numerical data points
+            data: Numerical data points, or an accumulator for histogram and boxplot
             visualization_type: Type of visualization ("histogram", "boxplot", "scatter", etc.)
             user_id: Optional user ID for tracking usage
             
@@ -704,21 +1319,34 @@ class MathToolsService(BaseService):
                 user_id=user_id,
                 tool_type="statistics_tool",
                 action="prepare_statistics_visualization",
-                data={"visualization_type": visualization_type, "data_points_count": len(data)}
+                data={
+                    "visualization_type": visualization_type,
+                    "data_points_count": len(data) if hasattr(data, "__len__") else None
+                }
             )
         
         try:
-            # Input validation
-            if not data:
+            # Handle different visualization types
+            visualization_type = visualization_type.lower()
+            streaming = visualization_type in ("histogram", "boxplot")
+            
+            if isinstance(data, StreamingStatistics) and not streaming:
                 return {
                     "visualization_type": visualization_type,
-                    "error": "No data provided for visualization",
+                    "error": f"Visualization type {visualization_type} requires the data points",
                     "success": False
                 }
             
-            # Convert all data to float to ensure consistency
+            # Data held in memory, and data point-based types materialize anyway, gets
+            # exact statistics; streamed data is summarized in one pass by the digest
             try:
-                data = [float(x) for x in data]
+                if isinstance(data, StreamingStatistics):
+                    accumulator = data
+                elif streaming and not isinstance(data, (list, tuple, np.ndarray)):
+                    accumulator = StreamingStatistics.from_iterable(data)
+                else:
+                    accumulator = ExactStatistics(data)
+                    data = accumulator.values.tolist()
             except (ValueError, TypeError):
                 return {
                     "visualization_type": visualization_type,
@@ -726,27 +1354,24 @@ class MathToolsService(BaseService):
                     "success": False
                 }
             
-            # Basic statistics calculated for all visualization types
-            basic_stats = {
-                "count": len(data),
-                "min": min(data),
-                "max": max(data),
-                "mean": float(np.mean(data)),
-                "median": float(np.median(data)),
-                "std_dev": float(np.std(data)),
-                "variance": float(np.var(data))
-            }
+            # Input validation
+            if accumulator.count == 0:
+                return {
+                    "visualization_type": visualization_type,
+                    "error": "No data provided for visualization",
+                    "success": False
+                }
             
-            # Handle different visualization types
-            visualization_type = visualization_type.lower()
+            # Basic statistics calculated for all visualization types
+            basic_stats = accumulator.summary()
             
             if visualization_type == "histogram":
                 # Calculate optimal number of bins using Sturges' rule
-                n = len(data)
+                n = accumulator.count
                 num_bins = int(np.ceil(np.log2(n) + 1))
                 
                 # Create histogram bins
-                hist, bin_edges = np.histogram(data, bins=num_bins)
+                hist, bin_edges = accumulator.histogram(num_bins)
                 
                 # Prepare bin data for visualization
                 bins = []
@@ -769,18 +1394,18 @@ class MathToolsService(BaseService):
                 
             elif visualization_type == "boxplot":
                 # Calculate quartiles, min, max for boxplot
-                q1 = np.percentile(data, 25, method='linear')
-                q2 = np.percentile(data, 50, method='linear')
-                q3 = np.percentile(data, 75, method='linear')
-                min_val = np.min(data)
-                max_val = np.max(data)
+                q1 = accumulator.quantile(0.25)
+                q2 = basic_stats["median"]
+                q3 = accumulator.quantile(0.75)
+                min_val = accumulator.min
+                max_val = accumulator.max
                 
                 # Calculate whiskers and outliers
                 lower_whisker = float(max(min_val, q1 - 1.5 * (q3 - q1)))
                 upper_whisker = float(min(max_val, q3 + 1.5 * (q3 - q1)))
                 
-                # Identify outliers
-                outliers = [float(x) for x in data if x < lower_whisker or x > upper_whisker]
+                # Identify outliers; for streamed data the digest estimates them
+                outliers = accumulator.values_outside(lower_whisker, upper_whisker)
                 
                 return {
                     "visualization_type": "boxplot",
@@ -898,18 +1523,33 @@ class MathToolsService(BaseService):
 
     @handle_service_errors(service_name="math_tools")
     def prepare_function_graph_data(self, function_expression: str, x_range: Tuple[float, float], 
-                                 num_points: int = 100, user_id: Optional[str] = None) -> Dict[str, Any]:
+                                 num_points: int = 100, user_id: Optional[str] = None,
+                                 columnar: bool = False, sampling: str = "uniform",
+                                 tolerance: float = 1e-3) -> Dict[str, Any]:
         """
         Prepare data points for graphing a mathematical function.
         
+        The function is compiled once and evaluated with vectorized NumPy passes.
+        In "uniform" mode the x values are spread evenly over the range. In
+        "adaptive" mode sampling starts from a coarse grid and recursively splits
+        intervals where the curve bends or jumps, so flat regions use few points
+        and asymptotes are resolved closely.
+        
         Args:
             function_expression: Mathematical expression representing the function (e.g., "x^2 + 2*x - 1")
             x_range: Tuple containing the range of x values (min_x, max_x)
-            num_points: Number of data points to generate
+            num_points: Number of data points to generate; the point budget in adaptive mode
             user_id: Optional user ID for tracking usage
+            columnar: If True, return the points as "columns" ({"x": [...], "y": [...]})
+                instead of a list of per-point dictionaries
+            sampling: Sampling mode, either "uniform" or "adaptive"
+            tolerance: Adaptive mode only. Maximum allowed deviation of the curve from
+                a straight segment, as a fraction of the visible y range
             
         Returns:
-            Dictionary containing data points for visualization
+            Dictionary containing data points for visualization. Discontinuities are
+            reported both as x values ("discontinuities") and as x intervals that
+            contain them ("discontinuity_intervals").
         """
         self._init_dependencies()
         
@@ -923,6 +1563,15 @@ class MathToolsService(BaseService):
             )
         
         try:
+            if sampling not in GRAPH_SAMPLING_MODES:
+                return {
+                    "function": function_expression,
+                    "x_range": x_range,
+                    "data_points": [],
+                    "error": f"Unsupported sampling mode: {sampling}. Supported modes are: {', '.join(GRAPH_SAMPLING_MODES)}",
+                    "success": False
+                }
+            
             # Validate the function expression
             validation_result = self.validate_expression(function_expression)
             if not validation_result["is_valid"]:
@@ -934,39 +1583,41 @@ class MathToolsService(BaseService):
                     "success": False
                 }
             
-            # Preprocess the function expression
-            preprocessed_expression = self._preprocess_expression(function_expression)
-            
-            # Replace 'x' with a placeholder that won't conflict with other variables
-            expression_template = preprocessed_expression.replace('x', '{x}')
+            # Compile the function once; x is its only allowed variable
+            program = self.compile_expression(function_expression)
+            unknown_variables = program.variables - {'x'}
+            if unknown_variables:
+                return {
+                    "function": function_expression,
+                    "x_range": x_range,
+                    "data_points": [],
+                    "error": f"Invalid function expression: Unknown token: {', '.join(sorted(unknown_variables))}",
+                    "success": False
+                }
             
-            # Generate x values
             min_x, max_x = x_range
-            x_values = np.linspace(min_x, max_x, num_points)
+            if sampling == "adaptive":
+                x_values, y_values, jump_pairs = self._sample_function_adaptive(
+                    program, min_x, max_x, num_points, tolerance
+                )
+                valid = self._graph_valid_mask(y_values)
+            else:
+                # Generate x values and evaluate the whole range at once
+                x_values = np.linspace(min_x, max_x, num_points)
+                y_values = self._evaluate_graph_program(program, x_values)
+                valid = self._graph_valid_mask(y_values)
+                jump_pairs = self._find_graph_jumps(x_values, y_values, valid)
             
-            # Calculate y values
-            data_points = []
-            discontinuities = []
+            # Very large values, NaN/Inf and jumps between samples are discontinuities
+            jumps = (x_values[:-1][jump_pairs] + x_values[1:][jump_pairs]) / 2
+            discontinuities = np.sort(np.concatenate((x_values[~valid], jumps))).tolist()
+            discontinuity_intervals = self._graph_discontinuity_intervals(x_values, valid, jump_pairs)
             
-            for x in x_values:
-                try:
-                    # Replace the placeholder with the current x value
-                    expr = expression_template.format(x=x)
-                    y = self._evaluate_parsed_expression(expr)
-                    
-                    # Check for very large values or NaN/Inf
-                    if not math.isfinite(y) or abs(y) > 1e10:
-                        discontinuities.append(x)
-                        continue
-                    
-                    data_points.append({"x": float(x), "y": float(y)})
-                except Exception as e:
-                    # Skip points that cause evaluation errors
-                    discontinuities.append(x)
-                    logger.debug(f"Error evaluating function at x={x}: {str(e)}")
+            x_valid = x_values[valid]
+            y_valid = y_values[valid]
             
             # Check if we have enough data points
-            if len(data_points) < 2:
+            if len(x_valid) < 2:
                 return {
                     "function": function_expression,
                     "x_range": x_range,
@@ -976,9 +1627,8 @@ class MathToolsService(BaseService):
                 }
             
             # Calculate bounds for y axis
-            y_values = [point["y"] for point in data_points]
-            y_min = min(y_values)
-            y_max = max(y_values)
+            y_min = float(y_valid.min())
+            y_max = float(y_valid.max())
             
             # Add padding to the y range (10% on each side)
             y_padding = (y_max - y_min) * 0.1 if y_max > y_min else 1.0
@@ -988,15 +1638,27 @@ class MathToolsService(BaseService):
             if abs(y_max - y_min) < 1e-10:
                 y_range = (y_min - 1, y_max + 1)
             
-            return {
+            result = {
                 "function": function_expression,
                 "x_range": x_range,
                 "y_range": y_range,
-                "data_points": data_points,
                 "discontinuities": discontinuities,
+                "discontinuity_intervals": discontinuity_intervals,
+                "sampling": sampling,
+                "evaluations": len(x_values),
                 "error": None,
                 "success": True
             }
+            
+            # Per-point dictionaries are only built here, at the output boundary
+            if columnar:
+                result["columns"] = {"x": x_valid.tolist(), "y": y_valid.tolist()}
+            else:
+                result["data_points"] = [
+                    {"x": x, "y": y} for x, y in zip(x_valid.tolist(), y_valid.tolist())
+                ]
+            
+            return result
         except Exception as e:
             logger.error(f"Error preparing graph data for function '{function_expression}': {str(e)}")
             return {
@@ -1007,31 +1669,492 @@ class MathToolsService(BaseService):
                 "success": False
             }
 
-    def _preprocess_expression(self, expression: str) -> str:
+    def _evaluate_graph_program(self, program: CompiledExpression, x_values: np.ndarray) -> np.ndarray:
         """
-        Preprocess an expression for validation or evaluation.
+        Evaluate a compiled function of x over an array of x values.
         
         Args:
-            expression: The expression to preprocess
+            program: The compiled function
+            x_values: The x values to evaluate at
             
         Returns:
-            Preprocessed expression
+            Array of y values with the same shape as x_values
+        """
+        return np.broadcast_to(program.evaluate_array({'x': x_values}), x_values.shape)
+
+    def _graph_valid_mask(self, y_values: np.ndarray) -> np.ndarray:
+        """
+        Get the mask of finite y values within the graphing value limit.
+        
+        Args:
+            y_values: Function values
+            
+        Returns:
+            Boolean mask of plottable values
+        """
+        with np.errstate(invalid='ignore'):
+            return np.isfinite(y_values) & (np.abs(y_values) <= GRAPH_VALUE_LIMIT)
+
+    def _find_graph_jumps(self, x_values: np.ndarray, y_values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """
+        Find jump discontinuities between adjacent valid samples.
+        
+        A jump is a step between two valid samples where the function changes
+        sign and the step is much larger than the median step, as happens
+        around poles such as 1/x that fall between sample points.
+        
+        Args:
+            x_values: Sampled x values
+            y_values: Function values at the sampled x values
+            valid: Mask of samples with finite, bounded values
+            
+        Returns:
+            Boolean mask over adjacent sample pairs, True where pair (i, i + 1) spans a jump
+        """
+        pair_valid = valid[:-1] & valid[1:]
+        if not pair_valid.any():
+            return pair_valid
+        
+        with np.errstate(all='ignore'):
+            steps = np.abs(np.diff(y_values))
+        median_step = np.median(steps[pair_valid])
+        sign_change = np.signbit(y_values[:-1]) != np.signbit(y_values[1:])
+        return pair_valid & sign_change & (steps > GRAPH_JUMP_FACTOR * median_step) & (steps > 0)
+
+    def _sample_function_adaptive(self, program: CompiledExpression, min_x: float, max_x: float,
+                                  max_points: int, tolerance: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sample a function adaptively within a point budget.
+        
+        Starts from a coarse uniform grid and, in rounds, splits every interval
+        that is still too coarse: where the curve deviates from a straight
+        segment by more than the tolerance, where it crosses between valid and
+        invalid values, or where it steps by a large part of the visible range.
+        Likely discontinuities are narrowed down first so the budget is not
+        exhausted before they are found. All new midpoints of a round are
+        evaluated in one vectorized call. Values
+        are clipped to the visible window before measuring, so the budget is not
+        spent chasing values far off screen near asymptotes.
+        
+        Args:
+            program: The compiled function of x
+            min_x: Start of the x range
+            max_x: End of the x range
+            max_points: Maximum number of function evaluations
+            tolerance: Allowed deviation as a fraction of the visible y range
+            
+        Returns:
+            Tuple of (x values, y values, jump mask over adjacent sample pairs)
+        """
+        x_values = np.linspace(min_x, max_x, max(2, min(max_points, ADAPTIVE_INITIAL_POINTS)))
+        y_values = self._evaluate_graph_program(program, x_values)
+        min_width = abs(max_x - min_x) * ADAPTIVE_MIN_WIDTH_FRACTION
+        curve_width = abs(max_x - min_x) * ADAPTIVE_CURVE_WIDTH_FRACTION
+        
+        # Visible window estimated from the initial grid
+        initial_valid = y_values[self._graph_valid_mask(y_values)]
+        if len(initial_valid):
+            low, high = np.percentile(initial_valid, [5, 95])
+        else:
+            low = high = 0.0
+        scale = float(high - low) or max(abs(float(high)), 1.0)
+        window = (low - scale, high + scale)
+        max_deviation = tolerance * scale
+        max_step = ADAPTIVE_JUMP_FRACTION * scale
+        
+        while True:
+            scores, steep = self._adaptive_refinement_scores(
+                x_values, y_values, window, max_deviation, max_step, min_width, curve_width
+            )
+            # Localize likely discontinuities before refining the rest of the curve
+            candidates = np.flatnonzero(np.isinf(scores))
+            if not len(candidates):
+                candidates = np.flatnonzero(scores)
+            budget = max_points - len(x_values)
+            budget_exhausted = budget <= 0 and len(candidates) > 0
+            if not len(candidates) or budget <= 0:
+                break
+            if len(candidates) > budget:
+                # Spend the remaining budget on the worst intervals first
+                candidates = np.sort(candidates[np.argsort(-scores[candidates], kind='stable')[:budget]])
+            
+            midpoints = (x_values[candidates] + x_values[candidates + 1]) / 2
+            midpoint_values = self._evaluate_graph_program(program, midpoints)
+            x_values = np.insert(x_values, candidates + 1, midpoints)
+            y_values = np.insert(y_values, candidates + 1, midpoint_values)
+        
+        # Steep steps that remain after splitting down to the minimum width are jumps.
+        # If the budget ran out first, unresolved poles are reported with a wider interval.
+        resolved = np.diff(x_values) <= min_width
+        if budget_exhausted:
+            resolved |= np.signbit(y_values[:-1]) != np.signbit(y_values[1:])
+        jump_pairs = steep & resolved
+        return x_values, y_values, jump_pairs
+
+    def _adaptive_refinement_scores(self, x_values: np.ndarray, y_values: np.ndarray,
+                                    window: Tuple[float, float], max_deviation: float,
+                                    max_step: float, min_width: float,
+                                    curve_width: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every interval between adjacent samples for further splitting.
+        
+        Args:
+            x_values: Sampled x values in ascending order
+            y_values: Function values at the sampled x values
+            window: Visible (low, high) y window values are clipped to
+            max_deviation: Allowed deviation of a sample from its neighbours' chord
+            max_step: Step size above which an interval may contain a jump
+            min_width: Intervals at or below this width are never split
+            curve_width: Intervals at or below this width are not split for deviation alone
+            
+        Returns:
+            Tuple of (scores, steep mask). Scores are 0 for intervals that need no
+            splitting, inf for likely discontinuities, and the step or deviation
+            size otherwise.
+        """
+        valid = self._graph_valid_mask(y_values)
+        clipped = np.clip(np.where(valid, y_values, 0.0), *window)
+        scores = np.zeros(len(x_values) - 1)
+        
+        # Crossing between valid and invalid values brackets a discontinuity boundary
+        scores[valid[:-1] != valid[1:]] = np.inf
+        
+        # A large step may hide a jump; sign-changing ones (poles) are localized first
+        pair_valid = valid[:-1] & valid[1:]
+        steps = np.abs(np.diff(clipped))
+        steep = pair_valid & (steps > max_step)
+        sign_change = np.signbit(y_values[:-1]) != np.signbit(y_values[1:])
+        scores[steep] = steps[steep]
+        scores[steep & sign_change] = np.inf
+        
+        # Deviation of each interior sample from the chord of its neighbours
+        widths = np.diff(x_values)
+        if len(x_values) >= 3:
+            x0, x1, x2 = x_values[:-2], x_values[1:-1], x_values[2:]
+            y0, y1, y2 = clipped[:-2], clipped[1:-1], clipped[2:]
+            deviation = np.abs(y1 - (y0 + (y2 - y0) * (x1 - x0) / (x2 - x0)))
+            deviation = np.where(valid[:-2] & valid[1:-1] & valid[2:] & (deviation > max_deviation), deviation, 0.0)
+            curved = np.zeros(len(scores))
+            curved[:-1] = deviation
+            curved[1:] = np.maximum(curved[1:], deviation)
+            curved[widths <= curve_width] = 0.0
+            scores = np.maximum(scores, curved)
+        
+        scores[widths <= min_width] = 0.0
+        return scores, steep
+
+    def _graph_discontinuity_intervals(self, x_values: np.ndarray, valid: np.ndarray,
+                                       jump_pairs: np.ndarray) -> List[Dict[str, float]]:
+        """
+        Describe discontinuities as x intervals.
+        
+        Each run of invalid samples becomes the interval between the valid
+        samples around it, and each jump becomes the interval between the two
+        samples it separates. Overlapping intervals are merged.
+        
+        Args:
+            x_values: Sampled x values in ascending order
+            valid: Mask of samples with finite, bounded values
+            jump_pairs: Mask over adjacent sample pairs that span a jump
+            
+        Returns:
+            List of {"start": ..., "end": ...} intervals in ascending order
+        """
+        last = len(x_values) - 1
+        intervals = []
+        
+        # Runs of invalid samples, widened to the neighbouring valid samples
+        edges = np.diff(np.concatenate(([0], (~valid).astype(np.int8), [0])))
+        for run_start, run_end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1):
+            intervals.append((x_values[max(run_start - 1, 0)], x_values[min(run_end + 1, last)]))
+        
+        for i in np.flatnonzero(jump_pairs):
+            intervals.append((x_values[i], x_values[i + 1]))
+        
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1]["end"]:
+                merged[-1]["end"] = max(merged[-1]["end"], float(end))
+            else:
+                merged.append({"start": float(start), "end": float(end)})
+        return merged
+
+    def compile_expression(self, expression: str) -> CompiledExpression:
+        """
+        Compile an expression into a reusable, immutable program.
+        
+        Programs are kept in a bounded LRU cache keyed by the normalized source,
+        so repeated expressions skip preprocessing and parsing entirely.
+        
+        Args:
+            expression: The expression to compile
+            
+        Returns:
+            The compiled expression program
+            
+        Raises:
+            ValueError: If the expression is empty or cannot be parsed
+        """
+        key = self._normalize_expression(expression)
+        program = _compiled_cache.get(key)
+        if program is None:
+            program = self._compile_normalized(key)
+            _compiled_cache.put(key, program)
+        return program
+
+    def _probe_equivalence(self, student_answer: str, correct_answer: str, tolerance: float) -> Optional[bool]:
+        """
+        Compare two expressions at random variable assignments.
+        
+        Both expressions are evaluated over the same batch of random values for
+        all of their variables in one vectorized call each. Probes where either
+        expression is undefined (e.g. sqrt of a negative number) are ignored.
+        
+        Args:
+            student_answer: The student's submitted answer
+            correct_answer: The correct answer to compare against
+            tolerance: Absolute tolerance for comparing values
+            
+        Returns:
+            True if the expressions agree at every usable probe, False if they
+            differ at any, or None if the probes are inconclusive
+        """
+        try:
+            student_program = self.compile_expression(student_answer)
+            correct_program = self.compile_expression(correct_answer)
+        except Exception:
+            return None
+        
+        variables = sorted(student_program.variables | correct_program.variables)
+        rng = np.random.default_rng(PROBE_SEED)
+        assignments = {
+            name: rng.uniform(-PROBE_RANGE, PROBE_RANGE, PROBE_COUNT) for name in variables
+        }
+        
+        try:
+            shape = (PROBE_COUNT,)
+            student_values = np.broadcast_to(student_program.evaluate_array(assignments), shape)
+            correct_values = np.broadcast_to(correct_program.evaluate_array(assignments), shape)
+        except Exception:
+            return None
+        
+        usable = np.isfinite(student_values) & np.isfinite(correct_values)
+        if np.count_nonzero(usable) < PROBE_MIN_VALID:
+            return None
+        
+        # Absolute like the numeric comparison, so coefficients are not judged by their size
+        return bool(np.all(np.isclose(
+            student_values[usable], correct_values[usable], rtol=0, atol=tolerance
+        )))
+
+    def _canonical_form(self, expression: str) -> Optional[str]:
+        """
+        Get the symbolic canonical form of an expression.
+        
+        Forms are looked up in the persistent canonical form cache first and
+        computed with SymPy under a time limit otherwise.
+        
+        Args:
+            expression: The expression to canonicalize
+            
+        Returns:
+            The canonical form, or None if the expression could not be
+            canonicalized within the time limit
+        """
+        if self.canonical_cache is None:
+            self.canonical_cache = get_canonical_form_cache()
+        
+        key = self._normalize_expression(expression)
+        canonical = self.canonical_cache.get(key)
+        if canonical is not _MISSING:
+            return canonical
+        
+        try:
+            program = self.compile_expression(expression)
+            canonical = self._sympy_canonical_form(program)
+        except TimeoutError:
+            logger.warning(f"Symbolic canonicalization of '{expression}' timed out")
+            canonical = None
+        except RuntimeError as e:
+            # The worker failing says nothing about the expression, so it is not cached
+            logger.warning(f"Symbolic worker unavailable: {str(e)}")
+            return None
+        except Exception as e:
+            logger.debug(f"Could not canonicalize '{expression}': {str(e)}")
+            canonical = None
+        
+        self.canonical_cache.put(key, canonical)
+        return canonical
+
+    def _sympy_canonical_form(self, program: CompiledExpression) -> str:
+        """
+        Canonicalize a compiled program with SymPy in the symbolic worker.
+        
+        The expression is built directly from the program instructions, so
+        student input never goes through SymPy's string parser. A computation
+        overrunning symbolic_timeout is stopped by killing the worker.
+        
+        Args:
+            program: The compiled expression
+            
+        Returns:
+            The canonical form as a SymPy srepr string
+            
+        Raises:
+            TimeoutError: If canonicalization does not finish in time
+        """
+        return self.symbolic_worker.canonical_form(
+            [list(instruction) for instruction in program.instructions], self.symbolic_timeout
+        )
+
+    def get_compiled_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of the shared compiled expression cache.
+        
+        Returns:
+            Dictionary with the cache size, capacity, hits, misses and hit rate
+        """
+        return _compiled_cache.stats()
+
+    def _compile_normalized(self, normalized: str) -> CompiledExpression:
+        """
+        Compile a normalized expression without consulting the cache.
+        
+        Args:
+            normalized: The normalized expression source
+            
+        Returns:
+            The compiled expression program
+        """
+        tokens = self._tokenize_expression(normalized)
+        if not tokens:
+            raise ValueError("Empty expression")
+        
+        rpn = self._tokens_to_rpn(tokens, allow_variables=True)
+        
+        instructions = []
+        variables = set()
+        for token in rpn:
+            if isinstance(token, float):
+                instructions.append((_NUMBER, token))
+            elif token in OPERATORS:
+                instructions.append((_OPERATOR, token))
+            elif token in FUNCTIONS:
+                instructions.append((_FUNCTION, token))
+            else:
+                instructions.append((_VARIABLE, token))
+                variables.add(token)
+        
+        return CompiledExpression(
+            source=normalized,
+            instructions=tuple(instructions),
+            variables=frozenset(variables)
+        )
+
+    def _lex_expression(self, expression: str) -> List[Tuple[str, str]]:
         """
-        # Remove spaces
-        expression = expression.replace(' ', '')
+        Split an expression into tokens in a single pass.
         
-        # Replace constants with their values
-        for const, value in CONSTANTS.items():
-            pattern = r'(?<![a-zA-Z0-9_])' + const + r'(?![a-zA-Z0-9_])'
-            expression = re.sub(pattern, str(value), expression)
+        Spaces are removed, constants are replaced with their values, ^ becomes **
+        and implicit multiplication after numbers (2x, 2(3+4)) is made explicit,
+        all while scanning the expression once with a precompiled pattern.
         
-        # Replace ^ with ** for exponentiation
-        expression = expression.replace('^', '**')
+        Args:
+            expression: The expression to lex
+            
+        Returns:
+            List of (kind, text) tokens where kind is "number", "name",
+            "operator", "paren" or "other"
+        """
+        tokens = []
+        previous_kind = None
         
-        # Ensure proper multiplication (e.g., 2(3+4) becomes 2*(3+4))
-        expression = re.sub(r'(\d+)(\()', r'\1*\2', expression)
+        for match in _LEXER_PATTERN.finditer(expression.replace(' ', '')):
+            kind = match.lastgroup
+            text = match.group()
+            
+            # Ensure proper multiplication (e.g., 2x becomes 2*x, 2(3+4) becomes 2*(3+4))
+            if previous_kind == 'number' and (kind == 'name' or text == '('):
+                tokens.append(('operator', '*'))
+            
+            if kind == 'name' and text in _CONSTANT_TEXT:
+                kind, text = 'number', _CONSTANT_TEXT[text]
+            elif text == '^':
+                text = '**'
+            
+            tokens.append((kind, text))
+            previous_kind = kind
         
-        return expression
+        return tokens
+
+    def _scan_tokens(self, tokens: List[Tuple[str, str]]) -> Tuple[bool, bool, bool]:
+        """
+        Check a token stream for structural problems in one scan.
+        
+        Args:
+            tokens: Tokens produced by _lex_expression
+            
+        Returns:
+            Tuple of (balanced parentheses, invalid operators, invalid functions)
+        """
+        depth = 0
+        balanced = True
+        invalid_operators = False
+        invalid_functions = False
+        previous = (None, None)
+        
+        for kind, text in tokens:
+            if text == '(':
+                depth += 1
+                # A name directly before a parenthesis is a function call
+                if previous[0] == 'name' and previous[1] not in FUNCTIONS:
+                    invalid_functions = True
+            elif text == ')':
+                depth -= 1
+                if depth < 0:
+                    balanced = False
+            elif kind == 'operator':
+                # Consecutive operators, or an operator other than + and - at the beginning
+                if previous[0] == 'operator' or (previous[0] is None and text not in '+-'):
+                    invalid_operators = True
+            previous = (kind, text)
+        
+        # Operators at the end
+        if previous[0] == 'operator':
+            invalid_operators = True
+        
+        return balanced and depth == 0, invalid_operators, invalid_functions
+
+    def _validation_error(self, tokens: List[Tuple[str, str]]) -> Optional[str]:
+        """
+        Get the validation error for a token stream.
+        
+        Args:
+            tokens: Tokens produced by _lex_expression
+            
+        Returns:
+            The error message, or None if the expression is valid
+        """
+        balanced, invalid_operators, invalid_functions = self._scan_tokens(tokens)
+        if not balanced:
+            return "Unbalanced parentheses"
+        if invalid_operators:
+            return "Invalid operator usage"
+        if invalid_functions:
+            return "Invalid function usage"
+        return None
+
+    def _preprocess_expression(self, expression: str) -> str:
+        """
+        Preprocess an expression for validation or evaluation.
+        
+        Args:
+            expression: The expression to preprocess
+            
+        Returns:
+            Preprocessed expression
+        """
+        return ''.join(text for _, text in self._lex_expression(expression))
 
     def _normalize_expression(self, expression: str) -> str:
         """
@@ -1059,51 +2182,7 @@ class MathToolsService(BaseService):
         Returns:
             List of tokens
         """
-        tokens = []
-        i = 0
-        
-        while i < len(expression):
-            char = expression[i]
-            
-            # Handle numbers (including decimals)
-            if char.isdigit() or char == '.':
-                j = i
-                while j < len(expression) and (expression[j].isdigit() or expression[j] == '.'):
-                    j += 1
-                tokens.append(expression[i:j])
-                i = j
-                continue
-            
-            # Handle operators
-            if char in OPERATORS or (char == '*' and i + 1 < len(expression) and expression[i + 1] == '*'):
-                if char == '*' and i + 1 < len(expression) and expression[i + 1] == '*':
-                    tokens.append('**')
-                    i += 2
-                else:
-                    tokens.append(char)
-                    i += 1
-                continue
-            
-            # Handle functions and variables (which could be multiple characters)
-            if char.isalpha():
-                j = i
-                while j < len(expression) and (expression[j].isalnum() or expression[j] == '_'):
-                    j += 1
-                name = expression[i:j]
-                tokens.append(name)
-                i = j
-                continue
-            
-            # Handle parentheses
-            if char in '()':
-                tokens.append(char)
-                i += 1
-                continue
-            
-            # Skip other characters (should not get here if the expression is valid)
-            i += 1
-        
-        return tokens
+        return [text for kind, text in self._lex_expression(expression) if kind != 'other']
 
     def _has_balanced_parentheses(self, expression: str) -> bool:
         """
@@ -1115,15 +2194,7 @@ class MathToolsService(BaseService):
         Returns:
             True if parentheses are balanced, False otherwise
         """
-        count = 0
-        for char in expression:
-            if char == '(':
-                count += 1
-            elif char == ')':
-                count -= 1
-                if count < 0:
-                    return False
-        return count == 0
+        return self._scan_tokens(self._lex_expression(expression))[0]
 
     def _has_invalid_operators(self, expression: str) -> bool:
         """
@@ -1135,22 +2206,7 @@ class MathToolsService(BaseService):
         Returns:
             True if there are invalid operators, False otherwise
         """
-        # Check for consecutive operators (++, --, +*, etc.)
-        for i in range(len(expression) - 1):
-            if expression[i] in '+-*/^' and expression[i+1] in '+-*/^':
-                # Allow for double asterisk (**) for exponentiation
-                if not (expression[i] == '*' and expression[i+1] == '*'):
-                    return True
-        
-        # Check for operators at the beginning (except + and -)
-        if expression and expression[0] in '*/^':
-            return True
-        
-        # Check for operators at the end
-        if expression and expression[-1] in '+-*/^':
-            return True
-        
-        return False
+        return self._scan_tokens(self._lex_expression(expression))[1]
 
     def _has_invalid_functions(self, expression: str) -> bool:
         """
@@ -1162,14 +2218,7 @@ class MathToolsService(BaseService):
         Returns:
             True if there are invalid functions, False otherwise
         """
-        # Find all function-like patterns and check if they are valid
-        function_pattern = r'([a-zA-Z_][a-zA-Z0-9_]*)\('
-        for match in re.finditer(function_pattern, expression):
-            func_name = match.group(1)
-            if func_name not in FUNCTIONS:
-                return True
-        
-        return False
+        return self._scan_tokens(self._lex_expression(expression))[2]
 
     def _is_number(self, s: str) -> bool:
         """
@@ -1202,8 +2251,7 @@ class MathToolsService(BaseService):
         if not expression:
             raise ValueError("Empty expression")
         
-        tokens = self._tokenize_expression(expression)
-        return self._evaluate_tokens(tokens)
+        return self.compile_expression(expression).evaluate()
 
     def _evaluate_tokens(self, tokens: List[str]) -> float:
         """
@@ -1216,6 +2264,20 @@ class MathToolsService(BaseService):
         Returns:
             The evaluation result
         """
+        return self._evaluate_rpn(self._tokens_to_rpn(tokens))
+
+    def _tokens_to_rpn(self, tokens: List[str], allow_variables: bool = False) -> List[Any]:
+        """
+        Convert a list of tokens to Reverse Polish Notation using the shunting-yard algorithm.
+        
+        Args:
+            tokens: List of tokens to convert
+            allow_variables: If True, unknown identifiers are kept as variable names
+                instead of being rejected
+            
+        Returns:
+            The RPN expression as a list of numbers, operators, functions and variable names
+        """
         # Implementation of the shunting-yard algorithm
         output_queue = []
         operator_stack = []
@@ -1258,6 +2320,10 @@ class MathToolsService(BaseService):
                 if operator_stack and operator_stack[-1] in FUNCTIONS:
                     output_queue.append(operator_stack.pop())
             
+            # Variable, kept by name for compiled programs
+            elif allow_variables and token.isidentifier():
+                output_queue.append(token)
+            
             # Unknown token
             else:
                 raise ValueError(f"Unknown token: {token}")
@@ -1270,8 +2336,7 @@ class MathToolsService(BaseService):
                 raise ValueError("Mismatched parentheses")
             output_queue.append(operator_stack.pop())
         
-        # Evaluate the Reverse Polish Notation (RPN) expression
-        return self._evaluate_rpn(output_queue)
+        return output_queue
 
     def _evaluate_rpn(self, rpn: List[Any]) -> float:
         """
@@ -1295,31 +2360,13 @@ class MathToolsService(BaseService):
                 
                 b = stack.pop()
                 a = stack.pop()
-                
-                if token == '+':
-                    stack.append(a + b)
-                elif token == '-':
-                    stack.append(a - b)
-                elif token == '*':
-                    stack.append(a * b)
-                elif token == '/':
-                    if b == 0:
-                        raise ValueError("Division by zero")
-                    stack.append(a / b)
-                elif token in ['^', '**']:
-                    stack.append(a ** b)
+                stack.append(_apply_operator(token, a, b))
             
             elif token in FUNCTIONS:
                 if len(stack) < 1:
                     raise ValueError(f"Not enough operands for function: {token}")
                 
-                a = stack.pop()
-                func = FUNCTIONS[token]
-                
-                try:
-                    stack.append(func(a))
-                except Exception as e:
-                    raise ValueError(f"Error applying function {token}: {str(e)}")
+                stack.append(_apply_function(token, stack.pop()))
             
             else:
                 raise ValueError(f"Unknown token in RPN: {token}")
@@ -9,6 +9,8 @@ import uuid
 import logging
 from datetime import datetime
 
+import numpy as np
+
 from src.db import get_db
 from src.db.models import (
     Progress as DBProgress,
@@ -17,6 +19,7 @@ from src.db.models import (
     CompletedCourse as DBCompletedCourse,
     UserContentProgress as DBUserContentProgress
 )
+from src.db.models.enums import ContentType
 from src.db.repositories import (
     ProgressRepository,
     ContentStateRepository,
@@ -25,7 +28,8 @@ from src.db.repositories import (
     UserContentProgressRepository,
     LessonRepository,
     CourseRepository,
-    ContentRepository
+    ContentRepository,
+    CourseContentWeightsRepository
 )
 from src.models.progress import (
     Progress, 
@@ -38,6 +42,49 @@ from src.models.progress import (
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Weight of a content item relative to theory, by content type
+CONTENT_TYPE_WEIGHTS = {
+    ContentType.ASSESSMENT: 2.0,
+    ContentType.EXERCISE: 1.5,
+}
+
+# Version of compute_content_weights; bump it when the weighting changes so
+# that weights stored by an earlier version are recomputed
+WEIGHTS_ALGORITHM_VERSION = 1
+
+
+def compute_content_weights(outline: List[Any]) -> Tuple[List[str], np.ndarray, Dict[str, float]]:
+    """
+    Compute the normalized weight of every content item of a course.
+    
+    A lesson weighs between 0.5 and 1.0: later lessons and lessons that reward
+    more points, relative to the richest lesson of the course, weigh more.
+    Each content item weighs its type weight times the weight of its lesson.
+    
+    Args:
+        outline: Rows of LessonRepository.get_course_content_outline
+        
+    Returns:
+        A tuple of the content IDs in outline order, their weights summing
+        to 1, and the weight of each lesson by lesson ID
+    """
+    lessons = {}
+    for row in outline:
+        lessons.setdefault(str(row.lesson_id), (row.lesson_order, row.points_reward or 0))
+    max_points = max(points for _, points in lessons.values()) or 1
+    lesson_weights = {
+        lesson_id: 0.5 + ((order / len(lessons) + points / max_points) / 2) * 0.5
+        for lesson_id, (order, points) in lessons.items()
+    }
+    
+    contents = [row for row in outline if row.content_id is not None]
+    content_ids = [str(row.content_id) for row in contents]
+    weights = np.array([CONTENT_TYPE_WEIGHTS.get(row.content_type, 1.0) for row in contents])
+    weights *= np.array([lesson_weights[str(row.lesson_id)] for row in contents])
+    if len(weights) and weights.sum() > 0:
+        weights /= weights.sum()
+    return content_ids, weights, lesson_weights
+
 
 class ProgressService:
     """Service for managing user progress."""
@@ -53,6 +100,7 @@ class ProgressService:
         self.lesson_repo = LessonRepository()
         self.course_repo = CourseRepository()
         self.content_repo = ContentRepository()
+        self.course_content_weights_repo = CourseContentWeightsRepository()
     
     # Progress Methods
     
@@ -974,14 +1022,50 @@ class ProgressService:
             logger.error(f"Error checking content interaction: {str(e)}")
             return False
 
+    def get_course_content_weights(self, course_id: uuid.UUID) -> Tuple[List[str], np.ndarray, Dict[str, float]]:
+        """
+        Get the content weights of a course, recomputing them if they are stale.
+        
+        Args:
+            course_id: The ID of the course
+            
+        Returns:
+            The content IDs, their weights and the lesson weights, as returned
+            by compute_content_weights; all empty if the course has no lessons
+        """
+        stored = self.course_content_weights_repo.get_weights(
+            self.db, course_id, WEIGHTS_ALGORITHM_VERSION
+        )
+        if stored is not None:
+            return stored
+        
+        # Read before the structure, so an edit made while computing keeps the result stale
+        version = self.course_content_weights_repo.get_current_version(self.db, course_id)
+        
+        # All lessons and content of the course in one query
+        outline = self.lesson_repo.get_course_content_outline(self.db, course_id)
+        if not outline:
+            return [], np.zeros(0), {}
+        
+        content_ids, weights, lesson_weights = compute_content_weights(outline)
+        self.course_content_weights_repo.save_weights(
+            self.db, course_id, WEIGHTS_ALGORITHM_VERSION, version, content_ids, weights, lesson_weights
+        )
+        return content_ids, weights, lesson_weights
+
     def calculate_weighted_course_progress(self, user_id: str, course_id: str) -> Tuple[float, Dict[str, Any]]:
         """
         Calculate a weighted progress percentage based on content difficulty and importance.
         
         This method implements a more sophisticated progress calculation algorithm that
-        considers each content item's difficulty level and assigned importance when
-        calculating overall course progress. Content with higher difficulty or importance
-        contributes more to the overall progress percentage.
+        considers each content item's type and the position and points of its lesson
+        when calculating overall course progress. Assessments, exercises and later or
+        more rewarding lessons contribute more to the overall progress percentage.
+        
+        The content weights are stored per course and only recomputed after the
+        lessons or content of the course change, so the calculation reads the
+        stored weights and the user's progress with one query each and takes
+        their dot product.
         
         Args:
             user_id: The ID of the user
@@ -996,111 +1080,42 @@ class ProgressService:
             user_uuid = uuid.UUID(user_id)
             course_uuid = uuid.UUID(course_id)
             
-            # Get all lessons in the course
-            lessons = self.lesson_repo.get_lessons_by_course_id(self.db, course_uuid)
-            if not lessons:
+            content_ids, weights, lesson_weights = self.get_course_content_weights(course_uuid)
+            if not lesson_weights:
                 logger.warning(f"No lessons found for course ID: {course_id}")
                 return 0.0, {"status": "no_lessons", "details": {}}
-
-            # Collect all content items across all lessons
-            all_content = []
-            lesson_weights = {}
-            for lesson in lessons:
-                # Get lesson content items
-                lesson_obj, content_items = self.lesson_repo.get_lesson_with_content(self.db, lesson.id)
-                all_content.extend(content_items)
-                
-                # Calculate lesson weight based on its position in the course and difficulty
-                # Earlier lessons typically have lower weights as they are foundational
-                order_factor = lesson.lesson_order / len(lessons)  # Normalized to 0-1
-                difficulty_factor = lesson.difficulty_level.value / 5.0  # Assuming 5 levels, normalized to 0-1
-                
-                # Combine factors: later lessons and higher difficulty increase weight
-                lesson_weights[str(lesson.id)] = 0.5 + ((order_factor + difficulty_factor) / 2) * 0.5
-            
-            if not all_content:
+            if not content_ids:
                 logger.warning(f"No content items found for course ID: {course_id}")
                 return 0.0, {"status": "no_content", "details": {}}
             
-            # Calculate the weight of each content item
-            content_weights = {}
-            total_weight = 0.0
-            
-            for content in all_content:
-                # Base weight considering content type importance
-                base_weight = 1.0
-                if content.content_type.lower() in ['assessment', 'quiz', 'exam']:
-                    base_weight = 2.0  # Assessments count twice as much
-                elif content.content_type.lower() in ['exercise', 'practice']:
-                    base_weight = 1.5  # Exercises count 1.5 times as much
-                
-                # Adjust weight by content metadata if available
-                if hasattr(content, 'metadata') and content.metadata:
-                    # Consider importance if specified in metadata
-                    importance = content.metadata.get('importance', 1.0)
-                    base_weight *= importance
-                    
-                    # Consider points value if specified
-                    points = content.metadata.get('points', 1.0)
-                    base_weight *= points
-                
-                # Factor in the lesson weight
-                lesson_id = str(content.lesson_id) if hasattr(content, 'lesson_id') else None
-                if lesson_id and lesson_id in lesson_weights:
-                    base_weight *= lesson_weights[lesson_id]
-                
-                content_weights[str(content.id)] = base_weight
-                total_weight += base_weight
-            
-            # Normalize weights so they sum to 1.0
-            if total_weight > 0:
-                for content_id in content_weights:
-                    content_weights[content_id] /= total_weight
-            
-            # Get all completed content for this user and course
-            completed_content_ids = set()
-            partial_content_progress = {}
-            
-            # Check which content items the user has completed
-            for content in all_content:
-                content_id = str(content.id)
-                
-                # Get progress for this content
-                progress = self.user_content_progress_repo.get_progress(
-                    self.db, user_uuid, content.id
-                )
-                
-                if progress:
-                    if progress.status.lower() == 'completed':
-                        completed_content_ids.add(content_id)
-                    elif hasattr(progress, 'percentage') and progress.percentage is not None:
-                        # Store partial progress if available
-                        partial_content_progress[content_id] = progress.percentage / 100.0
-                    elif hasattr(progress, 'score') and progress.score is not None:
-                        # Use score as percentage if available
-                        partial_content_progress[content_id] = progress.score / 100.0
-            
-            # Calculate weighted progress
-            weighted_progress = 0.0
-            
-            # Add up weights for completed content
-            for content_id in completed_content_ids:
-                weighted_progress += content_weights.get(content_id, 0.0)
-            
-            # Add partial progress for in-progress content
-            for content_id, partial in partial_content_progress.items():
-                if content_id not in completed_content_ids:  # Don't double count
-                    weighted_progress += content_weights.get(content_id, 0.0) * partial
-            
-            # Convert to percentage (0-100)
-            weighted_percentage = float(weighted_progress * 100.0)
+            # All of the user's progress on the course in a second query
+            position = {content_id: i for i, content_id in enumerate(content_ids)}
+            completion = np.zeros(len(content_ids))
+            completed = np.zeros(len(content_ids), dtype=bool)
+            for row in self.user_content_progress_repo.get_course_content_progress(
+                self.db, user_uuid, course_uuid
+            ):
+                i = position.get(str(row.content_id))
+                if i is None:
+                    continue
+                if row.is_completed:
+                    completed[i] = True
+                elif row.score is not None:
+                    # Use the score as partial progress
+                    completion[i] = max(completion[i], min(max(row.score / 100.0, 0.0), 1.0))
+            completion[completed] = 1.0
+            
+            completed_count = int(completed.sum())
+            partial_count = int(np.count_nonzero(completion[~completed]))
+            weighted_percentage = float(weights @ completion * 100.0)
+            content_weights = dict(zip(content_ids, weights.tolist()))
             
             # Prepare detailed metrics
             details = {
-                "completed_count": len(completed_content_ids),
-                "total_count": len(all_content),
-                "completion_ratio": len(completed_content_ids) / len(all_content),
-                "partial_progress_count": len(partial_content_progress),
+                "completed_count": completed_count,
+                "total_count": len(content_ids),
+                "completion_ratio": completed_count / len(content_ids),
+                "partial_progress_count": partial_count,
                 "content_weights": content_weights,
                 "lesson_weights": lesson_weights,
             }
@@ -0,0 +1,202 @@
+"""
+Resource-limited execution of sandboxed processes.
+
+run_sandboxed starts a program with rlimits on address space, CPU time, open
+files and process count, enforces a wall clock timeout, caps the captured
+output and reports the CPU time, peak RSS and output size of the run from
+wait4. On platforms without the resource module (Windows) the program runs
+with the timeout only and no usage is reported.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Default address space limit in bytes
+DEFAULT_ADDRESS_SPACE_LIMIT = 512 * 1024 * 1024
+
+# Open file descriptors a sandboxed program may hold
+MAX_OPEN_FILES = 64
+
+# Processes and threads a sandboxed program may create. Linux counts every
+# thread of the user against this limit, so it is sized to stop fork bombs
+# rather than to count the program's own processes
+MAX_PROCESSES = 2048
+
+# Captured bytes per output stream; the rest is drained and discarded
+MAX_OUTPUT_BYTES = 1024 * 1024
+
+# Seconds of CPU time granted beyond the wall clock timeout
+CPU_LIMIT_MARGIN = 1
+
+
+def sandbox_limits(address_space: int = DEFAULT_ADDRESS_SPACE_LIMIT,
+                   cpu_seconds: Optional[int] = None) -> Optional[Callable[[], None]]:
+    """
+    Build a preexec function applying the sandbox rlimits in the child process.
+
+    Args:
+        address_space: Address space limit in bytes (0 for none)
+        cpu_seconds: CPU time limit in seconds, or None for none
+
+    Returns:
+        The preexec function, or None where rlimits are unsupported
+    """
+    if resource is None:
+        return None
+
+    def apply_limits() -> None:
+        if address_space:
+            resource.setrlimit(resource.RLIMIT_AS, (address_space, address_space))
+        if cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (MAX_OPEN_FILES, MAX_OPEN_FILES))
+        resource.setrlimit(resource.RLIMIT_NPROC, (MAX_PROCESSES, MAX_PROCESSES))
+
+    return apply_limits
+
+
+def usage_from_rusage(usage: Any, output_bytes: int) -> Dict[str, Any]:
+    """
+    Convert a struct_rusage into the resource usage reported with results.
+
+    Args:
+        usage: Result of resource.getrusage or os.wait4
+        output_bytes: Size of the program's output
+
+    Returns:
+        Dictionary with cpu_user, cpu_system, peak_rss_bytes and output_bytes
+    """
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "cpu_user": usage.ru_utime,
+        "cpu_system": usage.ru_stime,
+        "peak_rss_bytes": usage.ru_maxrss * rss_unit,
+        "output_bytes": output_bytes
+    }
+
+
+def _drain(stream, chunks: List[bytes], sizes: List[int]) -> None:
+    """Read a stream to the end, keeping at most MAX_OUTPUT_BYTES of it."""
+    kept = 0
+    total = 0
+    while True:
+        chunk = stream.read(65536)
+        if not chunk:
+            break
+        total += len(chunk)
+        if kept < MAX_OUTPUT_BYTES:
+            chunk = chunk[:MAX_OUTPUT_BYTES - kept]
+            chunks.append(chunk)
+            kept += len(chunk)
+    sizes.append(total)
+    stream.close()
+
+
+def run_sandboxed(command: List[str], input_data: Optional[bytes] = None, timeout: float = 5,
+                  cwd: Optional[str] = None,
+                  address_space: int = DEFAULT_ADDRESS_SPACE_LIMIT) -> Dict[str, Any]:
+    """
+    Run a program with sandbox rlimits and measure its resource usage.
+
+    Args:
+        command: The program and its arguments
+        input_data: Optional bytes written to the program's stdin
+        timeout: Wall clock timeout in seconds
+        cwd: Working directory of the program
+        address_space: Address space limit in bytes (0 for none)
+
+    Returns:
+        Dictionary with returncode, stdout, stderr (decoded text), timed_out,
+        wall_time and resource_usage (None where unsupported)
+    """
+    if resource is None or not hasattr(os, "wait4"):
+        return _run_unlimited(command, input_data, timeout, cwd)
+
+    start_time = time.time()
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        preexec_fn=sandbox_limits(address_space, int(timeout) + CPU_LIMIT_MARGIN)
+    )
+
+    timed_out = threading.Event()
+
+    def expire() -> None:
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, expire)
+    timer.daemon = True
+    timer.start()
+
+    stdout_chunks, stderr_chunks, sizes = [], [], []
+    readers = [
+        threading.Thread(target=_drain, args=(process.stdout, stdout_chunks, sizes), daemon=True),
+        threading.Thread(target=_drain, args=(process.stderr, stderr_chunks, []), daemon=True)
+    ]
+    for reader in readers:
+        reader.start()
+
+    try:
+        if input_data:
+            process.stdin.write(input_data)
+        process.stdin.close()
+    except OSError:
+        # The program exited without reading its input
+        pass
+
+    # Reap the child ourselves so its rusage is not lost to Popen.wait
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    timer.cancel()
+    for reader in readers:
+        # Background processes left behind may keep the pipes open
+        reader.join(timeout=1)
+
+    output_bytes = sizes[0] if sizes else 0
+    return {
+        "returncode": process.returncode,
+        "stdout": b"".join(stdout_chunks).decode(errors="replace"),
+        "stderr": b"".join(stderr_chunks).decode(errors="replace"),
+        "timed_out": timed_out.is_set(),
+        "wall_time": time.time() - start_time,
+        "resource_usage": usage_from_rusage(usage, output_bytes)
+    }
+
+
+def _run_unlimited(command: List[str], input_data: Optional[bytes], timeout: float,
+                   cwd: Optional[str]) -> Dict[str, Any]:
+    """Fallback without rlimits or usage reporting."""
+    start_time = time.time()
+    try:
+        process = subprocess.run(command, input=input_data, capture_output=True, timeout=timeout, cwd=cwd)
+    except subprocess.TimeoutExpired:
+        return {
+            "returncode": None,
+            "stdout": "",
+            "stderr": "",
+            "timed_out": True,
+            "wall_time": timeout,
+            "resource_usage": None
+        }
+    return {
+        "returncode": process.returncode,
+        "stdout": process.stdout[:MAX_OUTPUT_BYTES].decode(errors="replace"),
+        "stderr": process.stderr[:MAX_OUTPUT_BYTES].decode(errors="replace"),
+        "timed_out": False,
+        "wall_time": time.time() - start_time,
+        "resource_usage": None
+    }
@@ -0,0 +1,319 @@
+/*
+ * Node.js sandbox worker for Mathtermind code execution.
+ *
+ * Started by CodeWorkerPool as a long-lived child process and speaking the
+ * same protocol as sandbox_worker.py: one JSON job per line on stdin, one
+ * JSON reply per line on stdout. Address space and CPU limits are applied
+ * by the parent before exec; the V8 heap is capped with --max-old-space-size
+ * and, per job, with the worker thread's resource limits.
+ *
+ * A job is an object with:
+ *     code: Source code of the submission
+ *     function: Name of the function test cases call
+ *     test_cases: Optional list of {"input": ..., "expected_output": ...}
+ *     test_timeout: Optional time budget of the program and of each test case in seconds
+ *     timeout: Optional wall clock time limit of the whole job in seconds
+ *
+ * Every job runs in a worker thread of its own that is terminated once it
+ * replies, so nothing a submission changes outlives its job. Inside the
+ * thread the submission runs in a vm context that is only ever handed
+ * strings: its console and the test harness are built by a prelude running
+ * in the context itself, so no function of the thread's realm is reachable
+ * from submission code. Test arguments are parsed inside the context for
+ * each test case, so one test cannot change the input of another.
+ */
+"use strict";
+
+const readline = require("readline");
+const vm = require("vm");
+const { Worker, isMainThread, parentPort } = require("worker_threads");
+
+// Time budget in seconds when the job does not set one
+const DEFAULT_TIME_BUDGET = 5;
+
+// Characters of console output kept per test case or program run
+const MAX_OUTPUT_CHARS = 1024 * 1024;
+
+// V8 heap limit of a job's worker thread in megabytes, passed by the pool
+const HEAP_LIMIT_MB = Number(process.argv[2]) || 256;
+
+// Runs in the submission's context before the submission. It installs a
+// console formatting values the way util.format does for common cases and a
+// frozen harness holding its own references to JSON, so a submission
+// replacing globals cannot change how its results are reported.
+const PRELUDE = `(() => {
+    "use strict";
+    const stringify = JSON.stringify;
+    const parse = JSON.parse;
+    const isArray = Array.isArray;
+    const keysOf = Object.keys;
+    let buffer = [];
+    let size = 0;
+
+    const quote = (text) => "'" + text + "'";
+    const inspect = (value, depth, seen) => {
+        if (typeof value === "string") return quote(value);
+        if (typeof value === "bigint") return value + "n";
+        if (typeof value === "symbol") return value.toString();
+        if (typeof value === "function") return "[Function: " + (value.name || "(anonymous)") + "]";
+        if (value === null || typeof value !== "object") return Object.is(value, -0) ? "-0" : String(value);
+        if (seen.includes(value)) return "[Circular]";
+        if (value instanceof Error) return value.stack || String(value);
+        if (depth > 2) return isArray(value) ? "[Array]" : "[Object]";
+        seen = seen.concat([value]);
+        const nested = (item) => inspect(item, depth + 1, seen);
+        let items;
+        let prefix = "";
+        if (isArray(value)) {
+            items = value.map(nested);
+            return items.length ? "[ " + items.join(", ") + " ]" : "[]";
+        }
+        if (value instanceof Map) {
+            prefix = "Map(" + value.size + ") ";
+            items = [...value].map(([key, item]) => nested(key) + " => " + nested(item));
+        } else if (value instanceof Set) {
+            prefix = "Set(" + value.size + ") ";
+            items = [...value].map(nested);
+        } else {
+            items = keysOf(value).map((key) =>
+                (/^[A-Za-z_$][\\w$]*$/.test(key) ? key : quote(key)) + ": " + nested(value[key]));
+        }
+        return prefix + (items.length ? "{ " + items.join(", ") + " }" : "{}");
+    };
+    const format = (args) => {
+        let rest = args;
+        let text = "";
+        if (typeof args[0] === "string" && args.length > 1) {
+            let index = 1;
+            text = args[0].replace(/%[sdifjoO%]/g, (spec) => {
+                if (spec === "%%") return "%";
+                if (index >= args.length) return spec;
+                const arg = args[index++];
+                if (spec === "%s") return typeof arg === "string" ? arg : inspect(arg, 1, []);
+                if (spec === "%d" || spec === "%i") return String(spec === "%i" ? parseInt(arg) : Number(arg));
+                if (spec === "%f") return String(parseFloat(arg));
+                if (spec === "%j") return stringify(arg);
+                return inspect(arg, 0, []);
+            });
+            rest = args.slice(index);
+        } else if (args.length) {
+            text = typeof args[0] === "string" ? args[0] : inspect(args[0], 0, []);
+            rest = args.slice(1);
+        }
+        return [text, ...rest.map((arg) => typeof arg === "string" ? arg : inspect(arg, 0, []))].join(" ");
+    };
+    const write = (...args) => {
+        if (size >= ${MAX_OUTPUT_CHARS}) return;
+        const text = format(args) + "\\n";
+        buffer.push(text);
+        size += text.length;
+    };
+    globalThis.console = { log: write, info: write, warn: write, error: write, debug: write };
+
+    const harness = Object.freeze({
+        takeOutput() {
+            const output = buffer.join("");
+            buffer = [];
+            size = 0;
+            return output;
+        },
+        call(func, inputJson) {
+            const input = parse(inputJson);
+            const args = isArray(input) ? input
+                : (input !== null && typeof input === "object") ? Object.values(input) : [input];
+            return stringify(func(...args));
+        }
+    });
+    Object.defineProperty(globalThis, "__harness", { value: harness });
+})();`;
+
+function createSandbox() {
+    const context = vm.createContext({}, { microtaskMode: "afterEvaluate" });
+    new vm.Script(PRELUDE).runInContext(context);
+    const takeOutput = new vm.Script("__harness.takeOutput()");
+    return {
+        context,
+        takeOutput: () => {
+            const output = takeOutput.runInContext(context);
+            return typeof output === "string" ? output : "";
+        }
+    };
+}
+
+function formatError(error, timeBudget) {
+    if (error && error.code === "ERR_SCRIPT_EXECUTION_TIMEOUT") {
+        return `Timeout: test case exceeded ${timeBudget} seconds`;
+    }
+    if (error && typeof error === "object" && "name" in error) {
+        return `${error.name}: ${error.message}`;
+    }
+    return `Uncaught ${String(error)}`;
+}
+
+function runTestCase(sandbox, call, index, testCase, timeBudget) {
+    sandbox.context.__input = JSON.stringify(testCase.input === undefined ? null : testCase.input);
+    const start = process.hrtime.bigint();
+    let actual;
+    try {
+        actual = call.runInContext(sandbox.context, { timeout: timeBudget * 1000 });
+    } catch (e) {
+        return {
+            test_case_index: index,
+            actual_output: null,
+            output: sandbox.takeOutput(),
+            passed: false,
+            error: formatError(e, timeBudget),
+            execution_time: Number(process.hrtime.bigint() - start) / 1e9
+        };
+    }
+    actual = typeof actual === "string" ? actual : undefined;
+    return {
+        test_case_index: index,
+        actual_output: actual === undefined ? null : JSON.parse(actual),
+        output: sandbox.takeOutput(),
+        passed: actual === JSON.stringify(testCase.expected_output),
+        error: null,
+        execution_time: Number(process.hrtime.bigint() - start) / 1e9
+    };
+}
+
+function runJob(job) {
+    const sandbox = createSandbox();
+    const timeBudget = job.test_timeout || DEFAULT_TIME_BUDGET;
+    let error = null;
+    const results = [];
+
+    try {
+        new vm.Script(job.code, { filename: "submission.js" })
+            .runInContext(sandbox.context, { timeout: timeBudget * 1000 });
+    } catch (e) {
+        error = e && e.code === "ERR_SCRIPT_EXECUTION_TIMEOUT"
+            ? `Timeout: program exceeded ${timeBudget} seconds` : formatError(e, timeBudget);
+    }
+    const output = sandbox.takeOutput();
+
+    const testCases = job.test_cases || [];
+    if (error === null && testCases.length) {
+        const name = job.function;
+        if (!/^[A-Za-z_$][\w$]*$/.test(name || "")) {
+            error = `Invalid function name: ${name}`;
+        } else {
+            // Declarations made with const and let are only reachable from scripts in the same context
+            const call = new vm.Script(`__harness.call(${name}, __input)`);
+            testCases.forEach((testCase, index) => {
+                results.push(runTestCase(sandbox, call, index, testCase, timeBudget));
+            });
+        }
+    }
+
+    return { success: error === null, output, error, results };
+}
+
+function jobUsage(before, after, output) {
+    return {
+        cpu_user: (after.userCPUTime - before.userCPUTime) / 1e6,
+        cpu_system: (after.systemCPUTime - before.systemCPUTime) / 1e6,
+        peak_rss_bytes: after.maxRSS * 1024,
+        output_bytes: Buffer.byteLength(output, "utf8")
+    };
+}
+
+function failedReply(error, failure) {
+    return { success: false, output: "", error, results: [], job_failure: failure };
+}
+
+// Thread booted ahead of the next job, so jobs do not wait for thread startup
+let spareThread = null;
+
+// Set once stdin is closed; no more spare threads are started
+let closing = false;
+
+function startThread() {
+    return new Worker(__filename, {
+        resourceLimits: { maxOldGenerationSizeMb: HEAP_LIMIT_MB },
+        stdout: true,
+        stderr: true
+    });
+}
+
+function runJobInThread(job) {
+    return new Promise((resolve) => {
+        const before = process.resourceUsage();
+        const worker = spareThread || startThread();
+        spareThread = null;
+        let timer = null;
+        let settled = false;
+        const finish = (reply) => {
+            if (settled) {
+                return;
+            }
+            settled = true;
+            clearTimeout(timer);
+            // The next thread starts once this one has released its address space
+            const exited = worker.terminate().catch(() => undefined);
+            exited.then(() => {
+                reply.resource_usage = jobUsage(before, process.resourceUsage(), reply.output);
+                spareThread = closing ? null : startThread();
+                resolve(reply);
+            });
+        };
+        if (job.timeout) {
+            timer = setTimeout(
+                () => finish(failedReply(`Execution timed out after ${job.timeout} seconds`, "timeout")),
+                job.timeout * 1000
+            );
+        }
+        worker.once("message", finish);
+        worker.once("error", (e) => finish(failedReply(
+            e && e.code === "ERR_WORKER_OUT_OF_MEMORY" ? "RangeError: out of memory" : `Worker error: ${e}`,
+            "crash"
+        )));
+        worker.once("exit", (code) => finish(failedReply(`Submission exited unexpectedly with code ${code}`, "crash")));
+        worker.postMessage(job);
+    });
+}
+
+async function handleLine(line) {
+    let reply;
+    try {
+        reply = await runJobInThread(JSON.parse(line));
+    } catch (e) {
+        reply = { success: false, output: "", error: `Worker error: ${e}`, results: [], resource_usage: null };
+    }
+    process.stdout.write(JSON.stringify(reply) + "\n");
+}
+
+function main() {
+    const lines = readline.createInterface({ input: process.stdin, terminal: false });
+    // Jobs run one at a time, in the order they arrive
+    let pending = Promise.resolve();
+    lines.on("line", (line) => {
+        pending = pending.then(() => handleLine(line));
+    });
+    lines.on("close", () => {
+        closing = true;
+        pending.then(() => {
+            if (spareThread) {
+                spareThread.terminate();
+                spareThread = null;
+            }
+        });
+    });
+    spareThread = startThread();
+    process.stdout.write(JSON.stringify({ ready: true, pid: process.pid }) + "\n");
+}
+
+if (isMainThread) {
+    main();
+} else {
+    // A job thread serves exactly one job
+    parentPort.once("message", (job) => {
+        let reply;
+        try {
+            reply = runJob(job);
+        } catch (e) {
+            reply = { success: false, output: "", error: `Worker error: ${e}`, results: [] };
+        }
+        parentPort.postMessage(reply);
+    });
+}
@@ -0,0 +1,534 @@
+"""
+Sandbox worker process for Mathtermind code execution.
+
+This script is started by CodeWorkerPool as a long-lived child process. It
+applies its resource limits, imports the modules exercises commonly use and
+then serves jobs: one JSON object per line on stdin, one JSON reply per line
+on stdout. Only the standard library is used so the worker can run in
+isolated mode (python -I).
+
+The worker never executes submission code itself. Every job runs in a child
+forked from the warmed-up worker, which starts with the modules already
+imported and exits after the job, so nothing a submission patches (builtins,
+preloaded modules or this module's own functions) reaches a later job.
+
+A job is a dictionary with:
+    code: Source code of the submission
+    stdin: Optional text the submission reads as standard input
+    function: Name of the function test cases call
+    test_cases: Optional list of {"input": ..., "expected_output": ...}
+    test_timeout: Optional time budget of each test case in seconds
+    timeout: Optional wall clock time limit of the whole job in seconds
+    complexity: Optional scaling measurement of the function, with
+        sizes: Ladder of input sizes, smallest first
+        input_type: Kind of generated input, one of COMPLEXITY_INPUT_TYPES
+        argument: Keyword argument receiving the input (first positional if None)
+        arguments: Other keyword arguments passed unchanged
+        repeats: Timed samples taken at every size
+
+Every test case gets deep-copied arguments, its own captured output and its
+own time budget, so one test cannot hide the results of another.
+
+Besides the fields of run_job, a reply may carry job_failure ("timeout" or
+"crash") when the job process was killed or died without replying, and
+retire when the worker cannot isolate jobs and must be replaced.
+"""
+
+import contextlib
+import copy
+import io
+import gc
+import json
+import os
+import random
+import select
+import signal
+import string
+import sys
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Modules loaded once at startup so submissions importing them start instantly
+PRELOADED_MODULES = (
+    "math", "random", "string", "re", "collections", "itertools",
+    "functools", "heapq", "bisect", "statistics", "fractions", "decimal"
+)
+
+# Inputs the complexity measurement can generate
+COMPLEXITY_INPUT_TYPES = ("list", "sorted_list", "string", "int")
+
+# Seconds a single call may take during the complexity measurement
+COMPLEXITY_CALL_LIMIT = 1.0
+
+# The ladder stops climbing once a call takes longer than this many seconds
+COMPLEXITY_STOP_TIME = 0.05
+
+# Minimum seconds covered by one timed sample; fast calls are batched
+COMPLEXITY_SAMPLE_TIME = 0.002
+
+# Upper bound on calls batched into one sample and on the input elements
+# prepared for a batch
+COMPLEXITY_MAX_BATCH = 1000
+COMPLEXITY_MAX_BATCH_ELEMENTS = 2000000
+
+# Keep our own references in case a submission patches the json module
+_dumps = json.dumps
+_loads = json.loads
+
+
+class TestCaseTimeout(BaseException):
+    """
+    Raised inside a test case that exceeds its time budget.
+
+    Derived from BaseException so submissions catching Exception cannot swallow it.
+    """
+
+
+def _on_test_timeout(signum, frame):
+    raise TestCaseTimeout()
+
+
+# Per-test budgets need an interval timer, which Windows does not provide
+_HAS_TIMER = hasattr(signal, "setitimer")
+
+# Jobs run in forked children; without fork (Windows) the worker runs a
+# single job in process and retires
+_HAS_FORK = hasattr(os, "fork")
+
+# Seconds of CPU time a job process gets beyond its wall clock timeout
+JOB_CPU_MARGIN = 1
+
+
+def _apply_limits(memory_limit: int, cpu_limit: int, open_files: int, processes: int) -> None:
+    """Cap the address space, total CPU time, open files and processes of this worker."""
+    if resource is None:
+        return
+    if memory_limit > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    if cpu_limit > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit))
+    if open_files > 0:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (open_files, open_files))
+    if processes > 0:
+        resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+
+
+def _job_usage(usage, output: str) -> dict:
+    """Resource usage of one job from the rusage of its process."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "cpu_user": usage.ru_utime,
+        "cpu_system": usage.ru_stime,
+        "peak_rss_bytes": usage.ru_maxrss * rss_unit,
+        "output_bytes": len(output.encode("utf-8", errors="replace"))
+    }
+
+
+def _jsonable(value):
+    """Convert a value into something JSON can represent, falling back to repr."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    return repr(value)
+
+
+def _format_exception(error: BaseException) -> str:
+    """Format an exception raised by the submission without the worker frames."""
+    tb = error.__traceback__.tb_next if error.__traceback__ else None
+    return "".join(traceback.format_exception(type(error), error, tb)).strip()
+
+
+def _run_test_case(func, index: int, test_case: dict, time_budget: float) -> dict:
+    """
+    Call the tested function with one test case's input.
+
+    Args:
+        func: The function under test
+        index: Index of the test case
+        test_case: Test case with input and expected_output
+        time_budget: Seconds the call may take (0 for no budget)
+
+    Returns:
+        Dictionary with the test's actual output, captured output, verdict and error
+    """
+    arguments = copy.deepcopy(test_case.get("input", {}))
+    expected = test_case.get("expected_output")
+    stdout = io.StringIO()
+    result = None
+    error = None
+
+    if time_budget and _HAS_TIMER:
+        signal.setitimer(signal.ITIMER_REAL, time_budget)
+    start_time = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(stdout):
+            if isinstance(arguments, dict):
+                result = func(**arguments)
+            elif isinstance(arguments, list):
+                result = func(*arguments)
+            else:
+                result = func(arguments)
+    except TestCaseTimeout:
+        error = f"Timeout: test case exceeded {time_budget} seconds"
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)}"
+    finally:
+        if time_budget and _HAS_TIMER:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    execution_time = time.perf_counter() - start_time
+
+    if error is not None:
+        return {
+            "test_case_index": index,
+            "actual_output": None,
+            "output": stdout.getvalue(),
+            "passed": False,
+            "error": error,
+            "execution_time": execution_time
+        }
+
+    actual = _jsonable(result)
+    # Expected values arrive as JSON, so tuples are compared as lists
+    try:
+        passed = bool(result == expected or actual == expected)
+    except Exception:
+        passed = actual == expected
+    return {
+        "test_case_index": index,
+        "actual_output": actual,
+        "output": stdout.getvalue(),
+        "passed": passed,
+        "error": None,
+        "execution_time": execution_time
+    }
+
+
+def _complexity_input(input_type: str, size: int, rng: random.Random):
+    """Generate an input of the given size."""
+    if input_type == "int":
+        return size
+    if input_type == "string":
+        return "".join(rng.choice(string.ascii_lowercase) for _ in range(size))
+    values = [rng.randrange(4 * size) for _ in range(size)]
+    if input_type == "sorted_list":
+        values.sort()
+    return values
+
+
+def _call_with_limit(call, limit: float):
+    """Run call() under an interval timer of limit seconds."""
+    if _HAS_TIMER:
+        signal.setitimer(signal.ITIMER_REAL, limit)
+    try:
+        return call()
+    finally:
+        if _HAS_TIMER:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _count_operations(call) -> int:
+    """
+    Count the lines of submission code executed by call().
+
+    Unlike timings the count does not depend on machine load, but work done
+    inside builtins (e.g. sorted) counts as a single line.
+    """
+    count = [0]
+
+    def local_trace(frame, event, arg):
+        if event == "line":
+            count[0] += 1
+        return local_trace
+
+    def global_trace(frame, event, arg):
+        if frame.f_code.co_filename == "<submission>":
+            return local_trace
+        return None
+
+    sys.settrace(global_trace)
+    try:
+        call()
+    finally:
+        sys.settrace(None)
+    return count[0]
+
+
+def _measure_complexity(func, spec: dict) -> dict:
+    """
+    Measure how the running time and operation count of func grow with input size.
+
+    Every size gets one warm-up call, one traced call counting operations and
+    spec["repeats"] timed samples with the garbage collector paused. The
+    fastest sample is kept, as slower ones only add noise from other load on
+    the machine. The ladder stops at the first size that gets slow.
+
+    Args:
+        func: The function under test
+        spec: Complexity specification as described in the module docstring
+
+    Returns:
+        Dictionary with measurements (size, time, operations) and error
+    """
+    input_type = spec.get("input_type", "list")
+    if input_type not in COMPLEXITY_INPUT_TYPES:
+        return {"measurements": [], "error": f"Unsupported input type: {input_type}"}
+    argument = spec.get("argument")
+    fixed = spec.get("arguments") or {}
+    repeats = max(1, int(spec.get("repeats") or 1))
+    # Mutable inputs are copied for every call, immutable ones are shared
+    duplicate = list if input_type in ("list", "sorted_list") else (lambda value: value)
+
+    def invoke(value):
+        if argument:
+            return func(**dict(fixed, **{argument: value}))
+        return func(value, **fixed)
+
+    measurements = []
+    error = None
+    rng = random.Random(0)
+    for size in spec.get("sizes") or []:
+        value = _complexity_input(input_type, size, rng)
+        try:
+            start_time = time.perf_counter()
+            _call_with_limit(lambda: invoke(duplicate(value)), COMPLEXITY_CALL_LIMIT)
+            call_time = time.perf_counter() - start_time
+            operations = _call_with_limit(lambda: _count_operations(lambda: invoke(duplicate(value))),
+                                          COMPLEXITY_CALL_LIMIT)
+        except TestCaseTimeout:
+            break
+        except Exception as e:
+            error = f"{type(e).__name__} at input size {size}: {str(e)}"
+            break
+
+        batch = int(COMPLEXITY_SAMPLE_TIME / max(call_time, 1e-7))
+        batch = max(1, min(batch, COMPLEXITY_MAX_BATCH, COMPLEXITY_MAX_BATCH_ELEMENTS // max(size, 1)))
+        samples = []
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(repeats):
+                inputs = [duplicate(value) for _ in range(batch)]
+                start_time = time.perf_counter()
+                for item in inputs:
+                    invoke(item)
+                samples.append((time.perf_counter() - start_time) / batch)
+        except Exception as e:
+            error = f"{type(e).__name__} at input size {size}: {str(e)}"
+            break
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        measurements.append({"size": size, "time": min(samples), "operations": operations})
+        if call_time > COMPLEXITY_STOP_TIME:
+            break
+
+    return {"measurements": measurements, "error": error}
+
+
+def run_job(job: dict) -> dict:
+    """
+    Execute a submission and run its test cases.
+
+    Args:
+        job: Job dictionary as described in the module docstring
+
+    Returns:
+        Dictionary with success, output, error, results and, when requested,
+        complexity
+    """
+    stdout = io.StringIO()
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    error = None
+    results = []
+    complexity = None
+
+    sys.stdin = io.StringIO(job.get("stdin") or "")
+    try:
+        with contextlib.redirect_stdout(stdout):
+            try:
+                exec(compile(job["code"], "<submission>", "exec"), namespace)
+            except SystemExit as e:
+                if e.code not in (None, 0):
+                    error = f"SystemExit: {e.code}"
+            except BaseException as e:
+                error = _format_exception(e)
+
+            test_cases = job.get("test_cases") or []
+            if error is None and test_cases:
+                name = job.get("function")
+                func = namespace.get(name)
+                time_budget = job.get("test_timeout") or 0
+                for index, test_case in enumerate(test_cases):
+                    if not callable(func):
+                        results.append({
+                            "test_case_index": index,
+                            "actual_output": None,
+                            "output": "",
+                            "passed": False,
+                            "error": f"NameError: name '{name}' is not defined",
+                            "execution_time": 0.0
+                        })
+                    else:
+                        results.append(_run_test_case(func, index, test_case, time_budget))
+
+        if error is None and job.get("complexity"):
+            name = job.get("function")
+            func = namespace.get(name)
+            if callable(func):
+                # Output printed while measuring is discarded
+                with contextlib.redirect_stdout(io.StringIO()):
+                    complexity = _measure_complexity(func, job["complexity"])
+            else:
+                complexity = {"measurements": [], "error": f"NameError: name '{name}' is not defined"}
+    finally:
+        sys.stdin = sys.__stdin__
+
+    reply = {
+        "success": error is None,
+        "output": stdout.getvalue(),
+        "error": error,
+        "results": results
+    }
+    if complexity is not None:
+        reply["complexity"] = complexity
+    return reply
+
+
+def _failed_reply(error: str, failure: str) -> dict:
+    """Reply for a job whose process did not produce a reply of its own."""
+    return {"success": False, "output": "", "error": error, "results": [], "job_failure": failure}
+
+
+def _limit_job_cpu(timeout) -> None:
+    """Cap the CPU time of a job process, so it cannot outlive its timeout for long."""
+    if resource is None or not timeout:
+        return
+    seconds = int(timeout) + JOB_CPU_MARGIN
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        seconds = min(seconds, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds))
+
+
+def _run_forked(job: dict, protocol_fds) -> dict:
+    """
+    Run a job in a child forked from this worker and collect its reply.
+
+    The child sends its reply through a pipe and exits. It is killed when it
+    exceeds the job's timeout, and its rusage from wait4 is the job's usage.
+
+    Args:
+        job: Job dictionary as described in the module docstring
+        protocol_fds: Descriptors of the protocol pipes, closed in the child
+
+    Returns:
+        The job's reply
+    """
+    timeout = job.get("timeout")
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            os.close(read_fd)
+            for fd in protocol_fds:
+                os.close(fd)
+            _limit_job_cpu(timeout)
+            data = memoryview(_dumps(run_job(job)).encode("utf-8"))
+            while data:
+                data = data[os.write(write_fd, data):]
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    chunks = []
+    timed_out = False
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                timed_out = True
+                break
+            ready, _, _ = select.select([read_fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(read_fd)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status, usage = os.wait4(pid, 0)
+
+    if timed_out:
+        reply = _failed_reply(f"Execution timed out after {timeout} seconds", "timeout")
+    else:
+        try:
+            reply = _loads(b"".join(chunks))
+        except ValueError:
+            reply = _failed_reply(
+                f"Submission process exited unexpectedly with code {os.waitstatus_to_exitcode(status)}",
+                "crash"
+            )
+    reply["resource_usage"] = _job_usage(usage, reply["output"]) if resource else None
+    return reply
+
+
+def main() -> None:
+    """Serve jobs until stdin is closed."""
+    limits = [int(arg) for arg in sys.argv[1:5]]
+    memory_limit, cpu_limit, open_files, processes = limits + [0] * (4 - len(limits))
+
+    # Keep private copies of the protocol pipes and point the standard
+    # descriptors at devnull, so submissions writing to them directly cannot
+    # corrupt the protocol.
+    protocol_in = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    protocol_out = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    _apply_limits(memory_limit, cpu_limit, open_files, processes)
+    for module in PRELOADED_MODULES:
+        __import__(module)
+    if _HAS_TIMER:
+        signal.signal(signal.SIGALRM, _on_test_timeout)
+
+    protocol_out.write(_dumps({"ready": True, "pid": os.getpid()}) + "\n")
+    protocol_out.flush()
+
+    for line in protocol_in:
+        try:
+            job = _loads(line)
+            if _HAS_FORK:
+                reply = _run_forked(job, (protocol_in.fileno(), protocol_out.fileno()))
+            else:
+                reply = run_job(job)
+                reply["resource_usage"] = None
+                reply["retire"] = True
+        except BaseException as e:
+            reply = {"success": False, "output": "", "error": f"Worker error: {e!r}", "results": [],
+                     "resource_usage": None}
+        protocol_out.write(_dumps(reply) + "\n")
+        protocol_out.flush()
+        if reply.get("retire"):
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Streaming statistics for Mathtermind.
+
+This module provides a mergeable, constant-memory accumulator for summary
+statistics, quantiles and histograms. Values can be fed one at a time, in
+chunks or from generators, and accumulators built on different workers can
+be merged into one. Values that are already held in memory get exact
+statistics with the same interface from ExactStatistics.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Default t-digest compression; higher values keep more centroids and give more accurate quantiles
+DEFAULT_COMPRESSION = 100
+
+# Values are buffered and folded into the digest once this many times the compression are pending
+BUFFER_FACTOR = 20
+
+# Chunk size used when consuming generators value by value
+DEFAULT_CHUNK_SIZE = 4096
+
+
+class StreamingStatistics:
+    """
+    Mergeable streaming accumulator for summary statistics.
+
+    Count, mean and variance are tracked exactly with Welford's algorithm,
+    combined per chunk with Chan's parallel update. Quantiles and histograms
+    come from a merging t-digest: a bounded set of weighted centroids that
+    keeps single values near the tails. While fewer values than the
+    compression have been seen every centroid is a single value, so quantiles
+    match NumPy's linear interpolation exactly.
+    """
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        """
+        Initialize an empty accumulator.
+
+        Args:
+            compression: t-digest compression controlling the number of centroids
+        """
+        self.compression = compression
+        self.count = 0
+        self.mean = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._m2 = 0.0
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._buffered = 0
+
+    @classmethod
+    def from_iterable(cls, data: Iterable[Any], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      compression: int = DEFAULT_COMPRESSION) -> "StreamingStatistics":
+        """
+        Build an accumulator from any iterable without materializing it.
+
+        Args:
+            data: Values, or chunks of values (lists, tuples or arrays)
+            chunk_size: Number of single values gathered before each update
+            compression: t-digest compression
+
+        Returns:
+            The populated accumulator
+
+        Raises:
+            ValueError, TypeError: If the data contains non-numerical values
+        """
+        statistics = cls(compression)
+        if isinstance(data, (list, tuple, np.ndarray)):
+            statistics.update_many(data)
+            return statistics
+
+        pending = []
+        for item in data:
+            if isinstance(item, (list, tuple, np.ndarray)):
+                statistics.update_many(item)
+                continue
+            pending.append(item)
+            if len(pending) >= chunk_size:
+                statistics.update_many(pending)
+                pending = []
+        if pending:
+            statistics.update_many(pending)
+        return statistics
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the values seen so far."""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std_dev(self) -> float:
+        """Population standard deviation of the values seen so far."""
+        return math.sqrt(self.variance)
+
+    def update(self, value: float) -> None:
+        """Add a single value."""
+        self.update_many([value])
+
+    def update_many(self, values: Iterable[float]) -> None:
+        """
+        Add a chunk of values.
+
+        Args:
+            values: Array-like chunk of numbers
+
+        Raises:
+            ValueError, TypeError: If the chunk contains non-numerical values
+        """
+        chunk = np.asarray(values, dtype=float).ravel()
+        if chunk.size == 0:
+            return
+
+        chunk_mean = float(chunk.mean())
+        chunk_m2 = float(np.square(chunk - chunk_mean).sum())
+        self._merge_moments(chunk.size, chunk_mean, chunk_m2, float(chunk.min()), float(chunk.max()))
+        self._add_centroids(chunk, np.ones(chunk.size))
+
+    def merge(self, other: "StreamingStatistics") -> "StreamingStatistics":
+        """
+        Merge another accumulator into this one.
+
+        Args:
+            other: Accumulator built from other values, e.g. on another worker
+
+        Returns:
+            This accumulator
+        """
+        if other.count == 0:
+            return self
+
+        other._compress()
+        self._merge_moments(other.count, other.mean, other._m2, other.min, other.max)
+        self._add_centroids(other._means, other._weights)
+        return self
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile with linear interpolation between centroids.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            The estimated quantile value
+        """
+        if self.count == 0:
+            raise ValueError("No values have been added")
+
+        self._compress()
+        # Position of each centroid's center in the sorted values (0-based)
+        centers = np.cumsum(self._weights) - self._weights / 2 - 0.5
+        positions = np.concatenate(([0.0], centers, [self.count - 1.0]))
+        values = np.concatenate(([self.min], self._means, [self.max]))
+        return float(np.interp(q * (self.count - 1), positions, values))
+
+    def histogram(self, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build a histogram with equal-width bins between the minimum and maximum.
+
+        Args:
+            bins: Number of bins
+
+        Returns:
+            Tuple of (counts, bin edges) like numpy.histogram
+        """
+        if self.count == 0:
+            raise ValueError("No values have been added")
+
+        self._compress()
+        counts, edges = np.histogram(self._means, bins=bins, range=(self.min, self.max), weights=self._weights)
+        return np.rint(counts).astype(int), edges
+
+    def values_outside(self, lower: float, upper: float) -> List[float]:
+        """
+        Estimate the values below lower or above upper.
+
+        The result is approximate. Values near the tails are often kept as
+        single-value centroids, but a merged centroid outside the bounds
+        contributes its mean repeated by its weight, so both the values and
+        their number can differ from the exact result. Callers holding the
+        values themselves should select outliers from those.
+
+        Args:
+            lower: Lower bound
+            upper: Upper bound
+
+        Returns:
+            List of values outside the bounds in ascending order
+        """
+        self._compress()
+        outside = (self._means < lower) | (self._means > upper)
+        return [
+            float(mean)
+            for mean, weight in zip(self._means[outside], self._weights[outside])
+            for _ in range(int(round(weight)))
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the basic summary statistics.
+
+        Returns:
+            Dictionary with count, min, max, mean, median, std_dev and variance
+        """
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "median": self.quantile(0.5),
+            "std_dev": self.std_dev,
+            "variance": self.variance
+        }
+
+    def _merge_moments(self, count: int, mean: float, m2: float, minimum: float, maximum: float) -> None:
+        """Combine the running moments with those of another batch of values."""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def _add_centroids(self, means: np.ndarray, weights: np.ndarray) -> None:
+        """Buffer centroids and fold them into the digest when the buffer is full."""
+        self._buffer.append((means, weights))
+        self._buffered += len(means)
+        if self._buffered >= BUFFER_FACTOR * self.compression:
+            self._compress()
+
+    def _compress(self) -> None:
+        """Merge buffered centroids into the digest, keeping it within its size bound."""
+        if not self._buffer:
+            return
+
+        means = np.concatenate([self._means] + [m for m, _ in self._buffer])
+        weights = np.concatenate([self._weights] + [w for _, w in self._buffer])
+        self._buffer = []
+        self._buffered = 0
+
+        order = np.argsort(means, kind='mergesort')
+        means = means[order]
+        weights = weights[order]
+
+        # Group neighbouring centroids that fall into the same unit of the
+        # k-scale k(q) = compression / 4 * log(q / (1 - q)). Its slope grows
+        # towards both tails, so centroids may be large in the middle of the
+        # distribution but stay single values at the extremes.
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        k = np.floor(self.compression / 4 * np.log(q / (1 - q)))
+        starts = np.flatnonzero(np.concatenate(([True], k[1:] != k[:-1])))
+
+        self._weights = np.add.reduceat(weights, starts)
+        self._means = np.add.reduceat(means * weights, starts) / self._weights
+
+
+class ExactStatistics:
+    """
+    Exact summary statistics of values held in memory.
+
+    Offers the read interface of StreamingStatistics, with quantiles,
+    histograms and outliers computed by NumPy from the values themselves.
+    Use it when the data is materialized anyway; the digest is only needed
+    for streamed data and merged partial results.
+    """
+
+    def __init__(self, values: Iterable[Any]):
+        """
+        Initialize from values, or from chunks of values.
+
+        Args:
+            values: Numerical values
+
+        Raises:
+            ValueError: If a value is not numerical
+            TypeError: If a value is not numerical
+        """
+        if not isinstance(values, (list, tuple, np.ndarray)):
+            values = list(values)
+        self.values = np.asarray(values, dtype=float).ravel()
+        self.count = len(self.values)
+        self.mean = float(np.mean(self.values)) if self.count else 0.0
+        self.min = float(np.min(self.values)) if self.count else math.inf
+        self.max = float(np.max(self.values)) if self.count else -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the values."""
+        return float(np.var(self.values)) if self.count else 0.0
+
+    @property
+    def std_dev(self) -> float:
+        """Population standard deviation of the values."""
+        return math.sqrt(self.variance)
+
+    def quantile(self, q: float) -> float:
+        """
+        Compute a quantile with linear interpolation, like numpy.quantile.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            The quantile value
+        """
+        if self.count == 0:
+            raise ValueError("No values have been added")
+        return float(np.quantile(self.values, q))
+
+    def histogram(self, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build a histogram with equal-width bins between the minimum and maximum.
+
+        Args:
+            bins: Number of bins
+
+        Returns:
+            Tuple of (counts, bin edges) from numpy.histogram
+        """
+        if self.count == 0:
+            raise ValueError("No values have been added")
+        return np.histogram(self.values, bins=bins, range=(self.min, self.max))
+
+    def values_outside(self, lower: float, upper: float) -> List[float]:
+        """
+        Get the values below lower or above upper.
+
+        Args:
+            lower: Lower bound
+            upper: Upper bound
+
+        Returns:
+            List of values outside the bounds in ascending order
+        """
+        outside = (self.values < lower) | (self.values > upper)
+        return np.sort(self.values[outside]).tolist()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the basic summary statistics.
+
+        Returns:
+            Dictionary with count, min, max, mean, median, std_dev and variance
+        """
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "median": self.quantile(0.5),
+            "std_dev": self.std_dev,
+            "variance": self.variance
+        }
@@ -0,0 +1,369 @@
+"""
+Near-duplicate detection for code submissions.
+
+Comparing every pair of submissions is quadratic in the size of a cohort.
+SubmissionSimilarityIndex instead reduces each submission to a MinHash
+signature of its token shingles and files the signature under one
+locality-sensitive hash bucket per band. A query only compares signatures
+that share a bucket, so it stays sub-linear in the number of stored
+submissions. Submissions are added one at a time as they arrive, and the
+index is stored in SQLite so it survives restarts.
+
+Python code is tokenized from its AST with user-chosen names and literals
+replaced by placeholders, so renaming variables, reformatting or editing
+comments does not hide a copy. Other languages, and Python code that does
+not parse, use a lexical tokenizer with the same normalization.
+"""
+
+import ast
+import builtins
+import hashlib
+import keyword
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from config import DATA_DIR
+
+SIMILARITY_INDEX_PATH = DATA_DIR / "submission_similarity.db"
+
+# Tokens per shingle
+SHINGLE_SIZE = 5
+
+# MinHash permutations; the standard error of a similarity estimate is about 1 / sqrt(NUM_PERMUTATIONS)
+NUM_PERMUTATIONS = 128
+
+# LSH bands of NUM_PERMUTATIONS // NUM_BANDS rows each. Pairs become
+# candidates with a probability of 1 - (1 - s^rows)^bands for similarity s,
+# which rises steeply around (1 / bands)^(1 / rows), about 0.7 here
+NUM_BANDS = 16
+
+# Estimated Jaccard similarity from which submissions are reported as similar
+DEFAULT_MIN_SIMILARITY = 0.7
+
+# Modulus of the MinHash permutations, a Mersenne prime above the 32-bit shingle hashes
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Permutation coefficients; fixed so signatures stay comparable across restarts
+_rng = np.random.RandomState(20240517)
+_PERMUTATION_A = _rng.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERMUTATION_B = _rng.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+del _rng
+
+# Names kept verbatim by the Python tokenizer
+_BUILTIN_NAMES = frozenset(dir(builtins))
+
+_JAVASCRIPT_KEYWORDS = frozenset(
+    "break case catch class const continue debugger default delete do else export extends false "
+    "finally for function if import in instanceof let new null of return super switch this throw "
+    "true try typeof undefined var void while with yield async await".split()
+)
+
+_LEXICAL_TOKEN = re.compile(
+    r"(?P<comment>#[^\n]*|//[^\n]*|/\*.*?\*/)"
+    r"|(?P<string>\"\"\".*?\"\"\"|'''.*?'''|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)"
+    r"|(?P<number>\b\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?\b)"
+    r"|(?P<name>[A-Za-z_$][\w$]*)"
+    r"|(?P<operator>[^\s\w])",
+    re.DOTALL
+)
+
+
+def _python_tokens(tree: ast.AST) -> List[str]:
+    """Node types of a Python AST in source order, with names and literals normalized."""
+    tokens = []
+    for node in _walk_in_order(tree):
+        tokens.append(type(node).__name__)
+        if isinstance(node, ast.Name):
+            tokens.append(node.id if node.id in _BUILTIN_NAMES else "ID")
+        elif isinstance(node, ast.Attribute):
+            tokens.append(node.attr)
+        elif isinstance(node, ast.Constant):
+            tokens.append(type(node.value).__name__)
+    return tokens
+
+
+def _walk_in_order(tree: ast.AST):
+    """Yield the nodes of a tree depth first in source order, skipping docstrings."""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+                and isinstance(node.value.value, str):
+            # Docstrings and bare string statements carry no structure
+            continue
+        yield node
+        stack.extend(reversed(list(ast.iter_child_nodes(node))))
+
+
+def _lexical_tokens(code: str, keywords: frozenset) -> List[str]:
+    """Tokens of source code with comments dropped and names and literals normalized."""
+    tokens = []
+    for match in _LEXICAL_TOKEN.finditer(code):
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        if kind == "string":
+            tokens.append("STR")
+        elif kind == "number":
+            tokens.append("NUM")
+        elif kind == "name":
+            text = match.group()
+            tokens.append(text if text in keywords else "ID")
+        else:
+            tokens.append(match.group())
+    return tokens
+
+
+def tokenize_code(code: str, language: str) -> List[str]:
+    """
+    Tokenize a submission for similarity detection.
+
+    Args:
+        code: The submitted code
+        language: The programming language
+
+    Returns:
+        Normalized tokens in source order
+    """
+    if language == "python":
+        try:
+            return _python_tokens(ast.parse(code))
+        except (SyntaxError, ValueError, RecursionError):
+            return _lexical_tokens(code, frozenset(keyword.kwlist) | _BUILTIN_NAMES)
+    return _lexical_tokens(code, _JAVASCRIPT_KEYWORDS)
+
+
+def shingle_hashes(tokens: List[str], size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Hash the overlapping token k-grams of a token sequence.
+
+    Sequences shorter than a shingle form a single shingle.
+
+    Returns:
+        Array of distinct 32-bit shingle hashes
+    """
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    count = max(1, len(tokens) - size + 1)
+    hashes = {
+        int.from_bytes(hashlib.blake2b("\x1f".join(tokens[i:i + size]).encode(), digest_size=4).digest(), "little")
+        for i in range(count)
+    }
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def minhash_signature(shingles: np.ndarray) -> np.ndarray:
+    """
+    Compute the MinHash signature of a set of shingle hashes.
+
+    Each permutation is (a * x + b) mod p truncated to 32 bits; the signature
+    keeps the minimum of every permutation over the set. An empty set gets
+    the maximum value in every position.
+
+    Returns:
+        Array of NUM_PERMUTATIONS unsigned 32-bit values (as uint64)
+    """
+    if shingles.size == 0:
+        return np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+    # a, b and x are below 2^32, so a * x + b stays below 2^64
+    products = np.outer(shingles, _PERMUTATION_A) + _PERMUTATION_B
+    permuted = (products % np.uint64(_MERSENNE_PRIME)) & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+def estimate_similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Estimate the Jaccard similarity of two shingle sets from their signatures."""
+    return float(np.mean(signature_a == signature_b))
+
+
+def _band_keys(signature: np.ndarray, bands: int) -> List[int]:
+    """LSH bucket keys of a signature, one per band, as signed 64-bit integers."""
+    rows = len(signature) // bands
+    keys = []
+    for band in range(bands):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].astype("<u4").tobytes(),
+                                 digest_size=8, person=band.to_bytes(2, "little")).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+class SubmissionSimilarityIndex:
+    """
+    Persistent MinHash/LSH index of code submissions.
+
+    Submissions are grouped by scope (e.g. an exercise ID); queries only
+    consider submissions of the same scope.
+    """
+
+    def __init__(self, path: Union[str, Any] = SIMILARITY_INDEX_PATH, bands: int = NUM_BANDS):
+        """
+        Open or create the index.
+
+        Args:
+            path: SQLite database file, or ":memory:"
+            bands: Number of LSH bands; must divide NUM_PERMUTATIONS
+        """
+        if NUM_PERMUTATIONS % bands:
+            raise ValueError(f"Number of bands must divide {NUM_PERMUTATIONS}")
+        self.path = str(path)
+        self.bands = bands
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            "submission_id TEXT PRIMARY KEY, scope TEXT NOT NULL, user_id TEXT, language TEXT NOT NULL, "
+            "signature BLOB NOT NULL, created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS lsh_buckets ("
+            "scope TEXT NOT NULL, bucket INTEGER NOT NULL, submission_id TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS ix_lsh_buckets_bucket ON lsh_buckets (scope, bucket);"
+            "CREATE INDEX IF NOT EXISTS ix_lsh_buckets_submission ON lsh_buckets (submission_id);"
+        )
+        self._connection.commit()
+
+    def add(self, submission_id: str, code: str, language: str, user_id: Optional[str] = None,
+            scope: str = "") -> None:
+        """
+        Add a submission, replacing an earlier one with the same ID.
+
+        Args:
+            submission_id: Unique ID of the submission
+            code: The submitted code
+            language: The programming language
+            user_id: Optional author, reported with query results
+            scope: Group of comparable submissions, e.g. an exercise ID
+        """
+        shingles = shingle_hashes(tokenize_code(code, language))
+        signature = minhash_signature(shingles)
+        # Submissions without tokens would all share every bucket
+        buckets = _band_keys(signature, self.bands) if shingles.size else []
+        with self._lock:
+            self._delete(submission_id)
+            self._connection.execute(
+                "INSERT INTO submissions (submission_id, scope, user_id, language, signature, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (submission_id, scope, user_id, language, signature.astype("<u4").tobytes(), time.time())
+            )
+            self._connection.executemany(
+                "INSERT INTO lsh_buckets (scope, bucket, submission_id) VALUES (?, ?, ?)",
+                [(scope, bucket, submission_id) for bucket in buckets]
+            )
+            self._connection.commit()
+
+    def remove(self, submission_id: str) -> None:
+        """Remove a submission from the index."""
+        with self._lock:
+            self._delete(submission_id)
+            self._connection.commit()
+
+    def query(self, code: str, language: str, scope: str = "",
+              min_similarity: float = DEFAULT_MIN_SIMILARITY, limit: int = 10,
+              exclude_user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find stored submissions similar to a piece of code.
+
+        Args:
+            code: The code to compare
+            language: The programming language
+            scope: Group of submissions to search
+            min_similarity: Smallest estimated Jaccard similarity reported
+            limit: Maximum number of results
+            exclude_user_id: Leave out submissions of this user, e.g. the author's own
+
+        Returns:
+            List of dictionaries with submission_id, user_id and similarity,
+            most similar first
+        """
+        shingles = shingle_hashes(tokenize_code(code, language))
+        if shingles.size == 0:
+            return []
+        signature = minhash_signature(shingles)
+        with self._lock:
+            return self._search(signature, scope, min_similarity, limit, exclude_user_id, None)
+
+    def similar_to(self, submission_id: str, min_similarity: float = DEFAULT_MIN_SIMILARITY,
+                   limit: int = 10, exclude_same_user: bool = True) -> List[Dict[str, Any]]:
+        """
+        Find submissions similar to a stored submission.
+
+        Args:
+            submission_id: ID of the stored submission
+            min_similarity: Smallest estimated Jaccard similarity reported
+            limit: Maximum number of results
+            exclude_same_user: Leave out other submissions of the same author
+
+        Returns:
+            List of dictionaries with submission_id, user_id and similarity,
+            most similar first
+
+        Raises:
+            KeyError: If the submission is not in the index
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT scope, user_id, signature FROM submissions WHERE submission_id = ?", (submission_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(submission_id)
+            scope, user_id, blob = row
+            signature = np.frombuffer(blob, dtype="<u4").astype(np.uint64)
+            if np.all(signature == _MAX_HASH):
+                return []
+            exclude_user_id = user_id if exclude_same_user and user_id is not None else None
+            return self._search(signature, scope, min_similarity, limit, exclude_user_id, submission_id)
+
+    def count(self, scope: Optional[str] = None) -> int:
+        """Number of stored submissions, optionally of one scope."""
+        with self._lock:
+            if scope is None:
+                return self._connection.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM submissions WHERE scope = ?", (scope,)
+            ).fetchone()[0]
+
+    def _search(self, signature: np.ndarray, scope: str, min_similarity: float, limit: int,
+                exclude_user_id: Optional[str], exclude_submission_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Compare a signature with the submissions sharing one of its buckets."""
+        buckets = _band_keys(signature, self.bands)
+        placeholders = ", ".join("?" * len(buckets))
+        rows = self._connection.execute(
+            "SELECT s.submission_id, s.user_id, s.signature FROM submissions s "
+            "WHERE s.submission_id IN ("
+            f"SELECT submission_id FROM lsh_buckets WHERE scope = ? AND bucket IN ({placeholders}))",
+            [scope] + buckets
+        ).fetchall()
+
+        matches = []
+        for candidate_id, user_id, blob in rows:
+            if candidate_id == exclude_submission_id:
+                continue
+            if exclude_user_id is not None and user_id == exclude_user_id:
+                continue
+            similarity = estimate_similarity(signature, np.frombuffer(blob, dtype="<u4").astype(np.uint64))
+            if similarity >= min_similarity:
+                matches.append({"submission_id": candidate_id, "user_id": user_id, "similarity": similarity})
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+        return matches[:limit]
+
+    def _delete(self, submission_id: str) -> None:
+        self._connection.execute("DELETE FROM lsh_buckets WHERE submission_id = ?", (submission_id,))
+        self._connection.execute("DELETE FROM submissions WHERE submission_id = ?", (submission_id,))
+
+
+# Opened on first use so importing the module doesn't touch the data directory
+_similarity_index: Optional[SubmissionSimilarityIndex] = None
+_similarity_index_lock = threading.Lock()
+
+
+def get_submission_similarity_index() -> SubmissionSimilarityIndex:
+    """Get the shared persistent submission similarity index."""
+    global _similarity_index
+    with _similarity_index_lock:
+        if _similarity_index is None:
+            _similarity_index = SubmissionSimilarityIndex()
+        return _similarity_index
@@ -0,0 +1,105 @@
+"""
+Symbolic canonicalization worker for Mathtermind's math tools.
+
+This script is started by MathToolsService as a long-lived child process.
+It imports SymPy once and then serves requests: one JSON object per line on
+stdin, one JSON reply per line on stdout. SymPy computations cannot be
+interrupted from another thread, so the service kills this process when a
+computation overruns its time limit and starts a fresh one on next use.
+
+A request is a dictionary with:
+    instructions: Compiled expression program as a list of [kind, value]
+        pairs, with kinds numbered as in math_tools_service
+
+A reply holds either canonical, the SymPy srepr string of the expanded and
+simplified expression, or error, a description of why it has none.
+"""
+
+import json
+import sys
+
+import sympy as sp
+
+# Instruction kinds of compiled expression programs
+_NUMBER = 0
+_VARIABLE = 1
+_OPERATOR = 2
+_FUNCTION = 3
+
+# SymPy counterparts of the functions compiled expressions support
+SYMPY_FUNCTIONS = {
+    'sin': sp.sin,
+    'cos': sp.cos,
+    'tan': sp.tan,
+    'asin': sp.asin,
+    'acos': sp.acos,
+    'atan': sp.atan,
+    'sqrt': sp.sqrt,
+    'log': lambda a: sp.log(a, 10),
+    'ln': sp.log,
+    'abs': sp.Abs,
+    'exp': sp.exp,
+    'round': sp.Function('round'),
+    'floor': sp.floor,
+    'ceil': sp.ceiling
+}
+
+
+def canonical_form(instructions) -> str:
+    """
+    Build a SymPy expression from a compiled program and canonicalize it.
+
+    The expression is built directly from the program instructions, so
+    student input never goes through SymPy's string parser. Decimal numbers
+    become exact rationals so that 0.5*x and x/2 canonicalize identically.
+
+    Args:
+        instructions: The program as (kind, value) pairs
+
+    Returns:
+        The canonical form as a SymPy srepr string
+    """
+    stack = []
+    for kind, value in instructions:
+        if kind == _NUMBER:
+            stack.append(sp.Rational(repr(value)))
+        elif kind == _VARIABLE:
+            stack.append(sp.Symbol(value))
+        elif kind == _OPERATOR:
+            b = stack.pop()
+            a = stack.pop()
+            if value == '+':
+                stack.append(a + b)
+            elif value == '-':
+                stack.append(a - b)
+            elif value == '*':
+                stack.append(a * b)
+            elif value == '/':
+                stack.append(a / b)
+            else:
+                stack.append(a ** b)
+        else:
+            stack.append(SYMPY_FUNCTIONS[value](stack.pop()))
+
+    if len(stack) != 1:
+        raise ValueError("Invalid expression: too many values left on stack")
+
+    return sp.srepr(sp.expand(sp.simplify(stack[0])))
+
+
+def main() -> None:
+    """Serve requests until stdin is closed."""
+    sys.stdout.write(json.dumps({"ready": True}) + "\n")
+    sys.stdout.flush()
+
+    for line in sys.stdin:
+        try:
+            reply = {"canonical": canonical_form(json.loads(line)["instructions"])}
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
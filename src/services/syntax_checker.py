@@ -0,0 +1,252 @@
+"""
+In-memory syntax checking for code submissions.
+
+Editors validate code whenever typing pauses, so a syntax check must not
+touch the disk or start a process. Python code is compiled in memory and
+JavaScript code is sent to one long-lived Node.js checker process (see
+js_syntax_checker.js). Verdicts are kept in a small LRU keyed by a hash of
+the language and code, since editors re-check unchanged code often.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js_syntax_checker.js")
+
+# Syntax verdicts kept in memory
+SYNTAX_CACHE_SIZE = 256
+
+# Seconds a single JavaScript check may take
+CHECK_TIMEOUT = 5.0
+
+# Seconds to wait for the JavaScript checker to start
+CHECKER_STARTUP_TIMEOUT = 10.0
+
+
+class SyntaxCache:
+    """Thread-safe LRU of syntax verdicts keyed by content hash."""
+
+    def __init__(self, max_size: int = SYNTAX_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(code: str, language: str) -> str:
+        return hashlib.sha256(f"{language}\0{code}".encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def check_python_syntax(code: str) -> Dict[str, Any]:
+    """
+    Check Python code syntax in memory without executing it.
+
+    The code is fully compiled rather than only parsed, so errors found after
+    parsing (e.g. 'return' outside function) are reported as well.
+
+    Returns:
+        Dictionary with is_valid and error
+    """
+    try:
+        compile(code, "<submission>", "exec", dont_inherit=True)
+        return {"is_valid": True, "error": None}
+    except SyntaxError as e:
+        error_msg = f"SyntaxError: {str(e)}"
+        if e.lineno is not None and e.offset is not None:
+            error_msg += f" at line {e.lineno}, position {e.offset}"
+        return {"is_valid": False, "error": error_msg}
+    except (ValueError, OverflowError, RecursionError, MemoryError) as e:
+        # e.g. null bytes in the source or nesting too deep for the compiler
+        return {"is_valid": False, "error": f"Error checking syntax: {str(e)}"}
+
+
+class JavaScriptSyntaxChecker:
+    """
+    Client of a long-lived Node.js syntax checker process.
+
+    Checks are serialized over the process's stdin and stdout. The process
+    is started on first use and restarted after it dies or times out.
+    """
+
+    def __init__(self, timeout: float = CHECK_TIMEOUT):
+        self.timeout = timeout
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._timed_out = False
+
+    def check(self, code: str) -> Dict[str, Any]:
+        """
+        Check JavaScript code syntax without executing it.
+
+        Returns:
+            Dictionary with is_valid and error
+        """
+        with self._lock:
+            try:
+                process = self._ensure_process()
+                process.stdin.write(json.dumps({"code": code}) + "\n")
+                process.stdin.flush()
+            except (OSError, RuntimeError) as e:
+                self._stop()
+                return {"is_valid": False, "error": f"Error checking syntax: {str(e)}"}
+
+            reply = self._read_reply(self.timeout)
+            if reply is None:
+                timed_out = self._timed_out
+                self._stop()
+                if timed_out:
+                    return {"is_valid": False, "error": "Timeout while checking syntax"}
+                return {"is_valid": False, "error": "Error checking syntax: checker process exited unexpectedly"}
+            return {"is_valid": bool(reply.get("is_valid")), "error": reply.get("error")}
+
+    def close(self) -> None:
+        """Stop the checker process."""
+        with self._lock:
+            self._stop()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._process is not None and self._process.poll() is None:
+            return self._process
+        self._stop()
+        self._process = subprocess.Popen(
+            ["node", CHECKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8"
+        )
+        reply = self._read_reply(CHECKER_STARTUP_TIMEOUT)
+        if not reply or not reply.get("ready"):
+            self._stop()
+            raise RuntimeError("JavaScript syntax checker failed to start")
+        return self._process
+
+    def _read_reply(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Read one reply line, killing the checker if none arrives in time."""
+        process = self._process
+        self._timed_out = False
+
+        def expire() -> None:
+            self._timed_out = True
+            process.kill()
+
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            line = process.stdout.readline()
+        except (OSError, ValueError):
+            line = ""
+        finally:
+            timer.cancel()
+
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def _stop(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stdin.close()
+            process.stdout.close()
+        except Exception as e:
+            logger.warning(f"Failed to stop JavaScript syntax checker: {str(e)}")
+
+
+_syntax_cache = SyntaxCache()
+_javascript_checker: Optional[JavaScriptSyntaxChecker] = None
+_javascript_checker_lock = threading.Lock()
+
+
+def get_syntax_cache() -> SyntaxCache:
+    """Get the shared syntax verdict cache."""
+    return _syntax_cache
+
+
+def get_javascript_syntax_checker() -> JavaScriptSyntaxChecker:
+    """Get the shared JavaScript checker, creating it on first use."""
+    global _javascript_checker
+    with _javascript_checker_lock:
+        if _javascript_checker is None:
+            _javascript_checker = JavaScriptSyntaxChecker()
+            atexit.register(_javascript_checker.close)
+        return _javascript_checker
+
+
+def check_syntax(code: str, language: str) -> Dict[str, Any]:
+    """
+    Check code syntax, answering repeated checks from the syntax cache.
+
+    Args:
+        code: The code to check
+        language: "python" or "javascript"
+
+    Returns:
+        Dictionary with is_valid and error
+
+    Raises:
+        ValueError: If the language has no syntax checker
+    """
+    if language == "python":
+        check = check_python_syntax
+    elif language == "javascript":
+        check = get_javascript_syntax_checker().check
+    else:
+        raise ValueError(f"Syntax checking not implemented for {language}")
+
+    key = SyntaxCache.key(code, language)
+    result = _syntax_cache.get(key)
+    if result is not None:
+        return result
+
+    result = check(code)
+    # Failures of the checker itself may not happen again
+    error = result["error"] or ""
+    if not error.startswith(("Error checking syntax", "Timeout while checking syntax")):
+        _syntax_cache.put(key, result)
+    return result
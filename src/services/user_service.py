@@ -36,7 +36,7 @@ class UserService(BaseService):
     def __init__(self):
         """Initialize the user service."""
         super().__init__()
-        self.user_repo = UserRepository(self.db)
+        self.user_repo = UserRepository()
         logger.debug("UserService initialized")
 
     @handle_service_errors(service_name="user")
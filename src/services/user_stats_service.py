@@ -25,6 +25,9 @@ from src.db.repositories.completed_course_repo import CompletedCourseRepository
 from src.db.repositories.completed_lesson_repo import CompletedLessonRepository
 from src.db.repositories.achievement_repo import AchievementRepository
 
+# Users written per executemany call by batch_update_user_stats
+BATCH_UPDATE_CHUNK_SIZE = 50
+
 
 class UserStatsService(BaseService):
     """Service for managing user statistics.
@@ -289,7 +292,8 @@ class UserStatsService(BaseService):
     def batch_update_user_stats(self, stats_updates: List[Dict[str, Any]]) -> int:
         """Update statistics for multiple users in batches.
         
-        This method demonstrates batch operations.
+        The users are read with one query per chunk of IDs and written back
+        with executemany updates, all in a single transaction.
         
         Args:
             stats_updates: List of dictionaries with user_id, points, and time_spent.
@@ -315,37 +319,38 @@ class UserStatsService(BaseService):
                 }
             )
         
-        updated_count = 0
-        
-        def update_user_stats(update_data):
-            nonlocal updated_count
-            user_id = update_data.get("user_id")
-            points = update_data.get("points", 0)
-            time_spent = update_data.get("time_spent", 0)
-            
+        # Sum the changes per user so each user is read and written once
+        totals = {}
+        for update in stats_updates:
+            user_id = update.get("user_id")
             try:
-                # Get current user
-                user = self.user_repository.get_by_id(self.db, user_id)
-                if user is None:
-                    self.logger.warning(f"User with ID {user_id} not found during batch update")
-                    return
-                
-                # Update stats
-                new_points = user.points + points
-                new_time = user.total_study_time + time_spent
-                self.user_repository.update(
-                    self.db, user_id, 
-                    points=new_points, 
-                    total_study_time=new_time
-                )
-                updated_count += 1
-                
-                # We would invalidate cache here, but we'll do it once after the batch
-            except Exception as e:
-                self.logger.error(f"Error updating stats for user {user_id}: {str(e)}")
+                user_uuid = uuid.UUID(str(user_id))
+            except ValueError:
+                self.logger.warning(f"Invalid user ID {user_id} in batch update")
+                continue
+            entry = totals.setdefault(user_uuid, {"points": 0, "time_spent": 0, "updates": 0})
+            entry["points"] += update.get("points", 0)
+            entry["time_spent"] += update.get("time_spent", 0)
+            entry["updates"] += 1
+        
+        users = self.user_repository.get_by_ids(self.db, totals.keys())
+        rows = []
+        updated_count = 0
+        for user in users:
+            user_uuid = uuid.UUID(str(user.id))
+            entry = totals[user_uuid]
+            rows.append({
+                "id": user_uuid,
+                "points": user.points + entry["points"],
+                "total_study_time": user.total_study_time + entry["time_spent"]
+            })
+            updated_count += entry["updates"]
         
-        # Perform batch operation
-        self.batch_operation(stats_updates, update_user_stats, batch_size=50)
+        missing = len(totals) - len(rows)
+        if missing:
+            self.logger.warning(f"{missing} users not found during batch update")
+        if rows:
+            self.user_repository.bulk_update(self.db, rows, chunk_size=BATCH_UPDATE_CHUNK_SIZE)
         
         # Invalidate all user stats caches
         self.invalidate_cache("user_stats")
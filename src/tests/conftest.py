@@ -30,8 +30,9 @@ from src.db.models.enums import (
 )
 
 # Temporarily commented out for coverage testing
-from src.services.cs_tools_service import CSToolsService
-from src.services.math_tools_service import MathToolsService
+from src.services.cs_tools_service import CSToolsService, GradingResultCache
+from src.services.submission_similarity import SubmissionSimilarityIndex
+from src.services.math_tools_service import MathToolsService, CanonicalFormCache
 
 
 # Database fixtures
@@ -763,6 +764,8 @@ def cs_tools_service():
     service = CSToolsService()
     service.tracking_service = MagicMock()
     service.db = MagicMock()
+    service.result_cache = GradingResultCache(":memory:")
+    service.similarity_index = SubmissionSimilarityIndex(":memory:")
     return service
 
 
@@ -771,5 +774,6 @@ def math_tools_service():
     """Create a test instance of MathToolsService with mocked dependencies."""
     service = MathToolsService()
     service.tracking_service = MagicMock()
+    service.canonical_cache = CanonicalFormCache(":memory:")
     service.db = MagicMock()
     return service
@@ -10,6 +10,7 @@ import uuid
 from datetime import datetime, timezone
 from src.db.repositories.base_repository import BaseRepository
 from src.db.models import User
+from src.db.models.enums import AgeGroup
 from src.tests.utils.test_factories import UserFactory
 
 
@@ -153,4 +154,119 @@ class TestBaseRepository:
         result = self.user_repo.count(test_db)
         
         # Assert
-        assert result == initial_count 
\ No newline at end of file
+        assert result == initial_count
+    
+    def test_get_by_ids(self, test_db, test_user):
+        """Test getting several entities by ID in chunks."""
+        # Arrange
+        users = UserFactory.create_batch(4)
+        for user in users:
+            test_db.add(user)
+        test_db.commit()
+        ids = [user.id for user in users[:3]] + [uuid.uuid4()]
+        
+        # Act
+        results = self.user_repo.get_by_ids(test_db, ids, chunk_size=2)
+        
+        # Assert - the unknown ID is skipped
+        assert sorted(user.id for user in results) == sorted(ids[:3])
+    
+    def test_bulk_create(self, test_db):
+        """Test inserting entities in chunks and returning their IDs."""
+        # Arrange
+        rows = [UserFactory._get_defaults() for _ in range(5)]
+        
+        # Act
+        ids = self.user_repo.bulk_create(test_db, rows, chunk_size=2, return_ids=True)
+        
+        # Assert - IDs come back in the order of the rows
+        assert len(ids) == 5
+        usernames = {user.id: user.username for user in test_db.query(User)}
+        assert [usernames[id] for id in ids] == [row['username'] for row in rows]
+        assert self.user_repo.bulk_create(test_db, [UserFactory._get_defaults()]) == 1
+    
+    def test_bulk_upsert(self, test_db, test_user):
+        """Test that an upsert inserts new rows and updates existing ones."""
+        # Arrange
+        existing = UserFactory._get_defaults()
+        existing.update(username=test_user.username, email=test_user.email, points=70)
+        new = UserFactory._get_defaults()
+        
+        # Act
+        ids = self.user_repo.bulk_upsert(
+            test_db, [existing, new], conflict_columns=["username"],
+            update_columns=["points"], return_ids=True
+        )
+        
+        # Assert
+        assert ids[0] == test_user.id
+        test_db.expire_all()
+        assert self.user_repo.get_by_id(test_db, test_user.id).points == 70
+        assert self.user_repo.get_by_id(test_db, ids[1]).username == new['username']
+        assert self.user_repo.count(test_db) == 2
+    
+    def test_bulk_update(self, test_db, test_user):
+        """Test updating entities by primary key in chunks."""
+        # Arrange
+        users = UserFactory.create_batch(3)
+        for user in users:
+            test_db.add(user)
+        test_db.commit()
+        rows = [{"id": user.id, "points": 10 * i} for i, user in enumerate(users, 1)]
+        
+        # Act
+        result = self.user_repo.bulk_update(test_db, rows, chunk_size=2)
+        
+        # Assert
+        assert result == 3
+        test_db.expire_all()
+        assert [self.user_repo.get_by_id(test_db, user.id).points for user in users] == [10, 20, 30]
+        assert self.user_repo.get_by_id(test_db, test_user.id).points == 0
+    
+    def test_get_page(self, test_db, test_user):
+        """Test walking all entities page by page with keyset cursors."""
+        # Arrange - users created in the same instant are ordered by ID
+        same_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        users = UserFactory.create_batch(6, created_at=same_time)
+        for user in users:
+            test_db.add(user)
+        test_db.commit()
+        
+        # Act
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = self.user_repo.get_page(test_db, limit=3, after=cursor)
+            pages.append(page)
+            if cursor is None:
+                break
+        
+        # Assert - every user appears once, oldest first
+        ids = [user.id for page in pages for user in page]
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert sorted(ids[:6], key=str) == ids[:6]
+        assert ids[-1] == test_user.id
+        assert self.user_repo.get_page(test_db, limit=10, username=test_user.username) == ([test_user], None)
+    
+    def test_iter_filter_streams(self, test_db, test_user):
+        """Test that streaming holds only about one batch of entities in the session."""
+        # Arrange
+        users = UserFactory.create_batch(30, age_group=AgeGroup.TEN_TO_TWELVE)
+        for user in users:
+            test_db.add(user)
+        test_db.commit()
+        expected = sorted((user.created_at, str(user.id)) for user in users)
+        del users
+        test_db.expunge_all()
+        
+        # Act
+        streamed = []
+        largest_identity_map = 0
+        for user in self.user_repo.iter_filter(test_db, batch_size=5, age_group=AgeGroup.TEN_TO_TWELVE):
+            streamed.append((user.created_at, str(user.id)))
+            largest_identity_map = max(largest_identity_map, len(test_db.identity_map))
+        
+        # Assert
+        assert streamed == expected
+        assert largest_identity_map <= 10
+        assert len(list(self.user_repo.iter_all(test_db))) == 31
@@ -0,0 +1,63 @@
+"""
+Tests for the database engine profiles.
+
+This module checks that create_database_engine applies the settings of each
+profile, including the SQLite pragmas of the production profile.
+"""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from src.db import create_database_engine
+from src.db.benchmark import benchmark_profile
+
+
+@pytest.mark.unit
+class TestEngineProfiles:
+    """Tests for create_database_engine."""
+
+    def test_production_profile_pragmas(self, tmp_path):
+        """Test that production connections use WAL and the tuned pragmas."""
+        engine = create_database_engine("production", f"sqlite:///{tmp_path / 'app.db'}")
+        try:
+            assert engine.echo is False
+            assert isinstance(engine.pool, QueuePool)
+            with engine.connect() as connection:
+                pragma = lambda name: connection.execute(text(f"PRAGMA {name}")).scalar()
+                assert pragma("journal_mode") == "wal"
+                assert pragma("synchronous") == 1  # NORMAL
+                assert pragma("cache_size") == -64000
+                assert pragma("temp_store") == 2  # MEMORY
+        finally:
+            engine.dispose()
+
+    def test_development_profile(self, tmp_path):
+        """Test that the development profile echoes statements and keeps SQLite defaults."""
+        engine = create_database_engine("development", f"sqlite:///{tmp_path / 'app.db'}")
+        try:
+            assert engine.echo is True
+            with engine.connect() as connection:
+                assert connection.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+        finally:
+            engine.dispose()
+
+    def test_in_memory_database_shares_one_connection(self):
+        """Test that a pooled in-memory database is one database for all connections."""
+        engine = create_database_engine("production", "sqlite://")
+        assert isinstance(engine.pool, StaticPool)
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT COUNT(*) FROM t")).scalar() == 0
+
+    def test_unknown_profile(self):
+        """Test that unknown profiles are rejected."""
+        with pytest.raises(ValueError):
+            create_database_engine("staging", "sqlite://")
+
+    def test_benchmark_profile(self, tmp_path):
+        """Test that the benchmark runs a small workload and reports its throughput."""
+        result = benchmark_profile("production", operations=5, threads=2, directory=str(tmp_path))
+        assert result["transactions"] == 10
+        assert result["transactions_per_second"] > 0
@@ -0,0 +1,186 @@
+"""
+Tests for unit-of-work sessions.
+
+This module checks that a unit of work commits once at its end, that nested
+units and service calls join the outer unit, and that the session goes back
+to the pool afterwards.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.core.error_handling import DatabaseError
+from src.db import UnitOfWorkSession, enable_sqlite_savepoints, get_current_session, unit_of_work
+from src.db.models import Base
+from src.db.models.content import Tag
+from src.db.repositories.base_repository import BaseRepository
+from src.models.tag import TagCategory
+from src.services.base_service import BaseService, outside_unit_of_work
+from src.services.cs_tools_service import CSToolsService
+from src.services.math_tools_service import MathToolsService
+from src.services.tag_service import TagService
+
+
+class TagNamingService(BaseService):
+    """Service whose public methods write through the repository."""
+
+    def __init__(self, other=None):
+        super().__init__(repository=BaseRepository(Tag))
+        self.other = other
+
+    def add(self, name):
+        tag = self.repository.create(self.db, name=name)
+        if self.other is not None:
+            self.other.add(f"{name}-nested")
+        return tag
+
+    def add_then_fail(self, name):
+        self.add(name)
+        raise ValueError("operation failed")
+
+    def add_each(self, *names):
+        """Add tags one by one, carrying on past the ones that fail."""
+        for name in names:
+            try:
+                self.repository.create(self.db, name=name)
+            except DatabaseError:
+                pass
+
+    def add_then_roll_back(self, name):
+        self.repository.create(self.db, name=name)
+        self.db.rollback()
+        self.repository.create(self.db, name=f"{name}-after")
+
+    def session(self):
+        return self.db
+
+    @outside_unit_of_work
+    def describe(self):
+        return get_current_session()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Point units of work at a temporary database file."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'units.db'}")
+    enable_sqlite_savepoints(engine)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, class_=UnitOfWorkSession, expire_on_commit=False)
+    with patch("src.db.SessionLocal", factory):
+        yield factory
+    engine.dispose()
+
+
+def tag_names(factory):
+    """Read the committed tag names through a separate session."""
+    with factory() as session:
+        return sorted(name for (name,) in session.query(Tag.name))
+
+
+@pytest.mark.unit
+class TestUnitOfWork:
+    """Tests for unit_of_work and BaseService sessions."""
+
+    def test_commits_once_at_the_end(self, session_factory):
+        """Test that repository commits inside a unit are deferred until it ends."""
+        repository = BaseRepository(Tag)
+        with unit_of_work() as session:
+            repository.create(session, name="algebra")
+            repository.create(session, name="geometry")
+            assert tag_names(session_factory) == []
+
+        assert tag_names(session_factory) == ["algebra", "geometry"]
+        assert get_current_session() is None
+
+    def test_nested_units_join(self, session_factory):
+        """Test that a nested unit shares the session and does not commit early."""
+        with unit_of_work() as outer:
+            with unit_of_work() as inner:
+                assert inner is outer
+                BaseRepository(Tag).create(inner, name="logic")
+            assert tag_names(session_factory) == []
+        assert tag_names(session_factory) == ["logic"]
+
+    def test_failure_rolls_back_the_whole_unit(self, session_factory):
+        """Test that an exception discards every write of the unit."""
+        with pytest.raises(ValueError):
+            with unit_of_work() as session:
+                BaseRepository(Tag).create(session, name="sets")
+                raise ValueError("operation failed")
+        assert tag_names(session_factory) == []
+
+    def test_session_is_released(self, session_factory):
+        """Test that the connection goes back to the pool when the unit ends."""
+        pool = session_factory.kw["bind"].pool
+        with unit_of_work() as session:
+            BaseRepository(Tag).create(session, name="graphs")
+            assert pool.checkedout() == 1
+        assert pool.checkedout() == 0
+
+    def test_service_calls_join_the_outer_unit(self, session_factory):
+        """Test that service methods run in a unit and nested services join it."""
+        service = TagNamingService(other=TagNamingService())
+        tag = service.add("numbers")
+
+        assert tag_names(session_factory) == ["numbers", "numbers-nested"]
+        # Loaded attributes stay readable after the session is closed
+        assert tag.name == "numbers"
+
+        with pytest.raises(ValueError):
+            service.add_then_fail("primes")
+        assert tag_names(session_factory) == ["numbers", "numbers-nested"]
+
+        with unit_of_work() as session:
+            assert service.session() is session
+        assert service.session() is not session
+        with pytest.raises(RuntimeError):
+            service.db
+
+    def test_failed_repository_write_keeps_earlier_writes(self, session_factory):
+        """Test that a failed write inside a unit only undoes itself."""
+        service = TagNamingService()
+        service.add("duplicate")
+        service.add_each("fresh", "duplicate")
+        assert tag_names(session_factory) == ["duplicate", "fresh"]
+
+        # The first write of a unit failing leaves the unit usable
+        service.add_each("duplicate", "second")
+        assert tag_names(session_factory) == ["duplicate", "fresh", "second"]
+
+    def test_rollback_inside_service_method_undoes_only_the_method(self, session_factory):
+        """Test that a service rolling back keeps the writes made before it was called."""
+        service = TagNamingService()
+        with unit_of_work() as session:
+            BaseRepository(Tag).create(session, name="kept")
+            service.add_then_roll_back("partial")
+        assert tag_names(session_factory) == ["kept", "partial-after"]
+
+    def test_rollback_outside_an_operation_fails_the_unit(self, session_factory):
+        """Test that a unit rolled back midway raises instead of committing the rest."""
+        with pytest.raises(DatabaseError):
+            with unit_of_work() as session:
+                BaseRepository(Tag).create(session, name="partial")
+                session.rollback()
+                BaseRepository(Tag).create(session, name="partial-after")
+        assert tag_names(session_factory) == []
+
+    def test_duplicate_tag_returns_none(self, session_factory):
+        """Test that a handled duplicate tag neither raises nor loses other writes."""
+        service = TagService()
+        with unit_of_work():
+            assert service.create_tag("calculus", TagCategory.TOPIC) is not None
+            assert service.create_tag("calculus", TagCategory.TOPIC) is None
+            assert service.create_tag("statistics", TagCategory.TOPIC) is not None
+        assert tag_names(session_factory) == ["calculus", "statistics"]
+
+    def test_services_and_methods_can_opt_out(self, session_factory):
+        """Test that opted-out methods and tool services do not open a session."""
+        assert TagNamingService().describe() is None
+        assert not hasattr(MathToolsService.check_answer, "__unit_of_work__")
+        assert not hasattr(CSToolsService.validate_code_against_testcases, "__unit_of_work__")
+        with patch("src.db.SessionLocal") as factory:
+            MathToolsService().check_answer("1+2", "3")
+            factory.assert_not_called()
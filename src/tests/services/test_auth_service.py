@@ -34,6 +34,7 @@ class TestAuthService(unittest.TestCase):
         self.auth_service = AuthService()
         
         # Set the mocked dependencies
+        self.auth_service.db = MagicMock()
         self.auth_service.session_manager = self.mock_session_manager
         self.auth_service.permission_service = self.mock_permission_service
         
@@ -0,0 +1,147 @@
+import pytest
+
+from src.services.code_worker_pool import CodeWorkerPool
+
+
+@pytest.fixture
+def pool():
+    """Create a small worker pool with a short timeout."""
+    pool = CodeWorkerPool(size=1, max_jobs_per_worker=3, timeout=1.0)
+    yield pool
+    pool.shutdown()
+
+
+def test_run_program_with_stdin(pool):
+    """Test running a program that reads input and prints output."""
+    result = pool.run("name = input()\nprint(f'Hello, {name}!')", stdin="world")
+    assert result["success"] is True
+    assert result["output"].strip() == "Hello, world!"
+    assert result["execution_time"] >= 0
+
+
+def test_run_test_case_batch(pool):
+    """Test that a batch of test cases runs against one execution of the code."""
+    code = "calls = []\ndef add(a, b):\n    return a + b"
+    test_cases = [
+        {"input": {"a": 1, "b": 2}, "expected_output": 3},
+        {"input": [2, 2], "expected_output": 5},
+        {"input": {"a": "x"}, "expected_output": 0}
+    ]
+    result = pool.run(code, test_cases=test_cases, function="add")
+    assert result["success"] is True
+    assert [r["passed"] for r in result["results"]] == [True, False, False]
+    assert result["results"][1]["actual_output"] == 4
+    assert result["results"][2]["error"].startswith("TypeError")
+
+
+def test_run_reports_errors(pool):
+    """Test runtime errors and missing functions."""
+    result = pool.run("raise ValueError('bad input')")
+    assert result["success"] is False
+    assert "ValueError: bad input" in result["error"]
+
+    result = pool.run("x = 1", test_cases=[{"input": {}, "expected_output": 1}], function="solve")
+    assert result["results"][0]["error"] == "NameError: name 'solve' is not defined"
+
+
+def test_timeout_stops_job(pool):
+    """Test that a job exceeding its timeout is killed while the worker survives."""
+    worker_pid = pool.run("import os\nprint(os.getppid())")["output"].strip()
+    result = pool.run("while True:\n    pass", timeout=0.5)
+    assert result["success"] is False
+    assert "timed out" in result["error"]
+
+    result = pool.run("import os\nprint(os.getppid())")
+    assert result["output"].strip() == worker_pid
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_crashed_job_is_reported(pool):
+    """Test that a submission killing its interpreter does not break the pool."""
+    result = pool.run("import os\nos._exit(3)")
+    assert result["success"] is False
+    assert "code 3" in result["error"]
+    assert pool.run("print(1)")["success"] is True
+    assert pool.stats()["crashes"] == 1
+
+
+def test_jobs_run_in_fresh_processes(pool):
+    """Test that patches made by one submission do not reach the next one."""
+    pool.run("import builtins\nbuiltins.sum = lambda *args, **kwargs: 42")
+    pool.run("import __main__\n__main__._run_test_case = lambda *args: {'passed': True}")
+
+    result = pool.run("def total(values):\n    return sum(values)",
+                      test_cases=[{"input": [[1, 2]], "expected_output": 3}], function="total")
+    assert result["results"][0]["passed"] is True
+    result = pool.run("def total(values):\n    return 0",
+                      test_cases=[{"input": [[1, 2]], "expected_output": 3}], function="total")
+    assert result["results"][0]["passed"] is False
+
+
+def test_workers_are_recycled(pool):
+    """Test that workers are replaced after serving max_jobs_per_worker jobs."""
+    pids = [pool.run("import os\nprint(os.getpid(), os.getppid())")["output"].split() for _ in range(4)]
+    assert len({job_pid for job_pid, _ in pids}) == 4
+    assert len({worker_pid for _, worker_pid in pids[:3]}) == 1
+    assert pids[3][1] != pids[0][1]
+    assert pool.stats()["recycled"] == 1
+
+
+@pytest.fixture
+def node_pool():
+    """Create a single-worker JavaScript pool."""
+    pool = CodeWorkerPool(size=1, max_jobs_per_worker=10, timeout=5.0, language="javascript")
+    yield pool
+    pool.shutdown()
+
+
+def test_javascript_test_cases_in_fresh_context(node_pool):
+    """Test that JavaScript submissions run in a pooled worker, each in its own context."""
+    code = "let calls = 0;\nconst add = (a, b) => { calls += 1; console.log('call', calls); return a + b; };"
+    test_cases = [
+        {"input": {"a": 1, "b": 2}, "expected_output": 3},
+        {"input": [2, 2], "expected_output": 5},
+        {"input": [1], "expected_output": 1}
+    ]
+    result = node_pool.run(code, test_cases=test_cases, function="add", test_timeout=1.0)
+    assert result["success"] is True
+    assert [r["passed"] for r in result["results"]] == [True, False, False]
+    assert result["results"][1]["output"] == "call 2\n"
+    assert result["results"][2]["actual_output"] is None
+    assert result["resource_usage"]["cpu_user"] >= 0
+
+    # Globals of the previous submission are gone, but the worker is the same
+    result = node_pool.run("console.log(typeof calls, typeof add);")
+    assert result["output"] == "undefined undefined\n"
+    assert node_pool.stats()["recycled"] == 0
+
+
+def test_javascript_timeouts_keep_worker(node_pool):
+    """Test that runaway test cases are stopped by the vm timeout without killing the worker."""
+    code = "function spin(n) { if (n < 0) { while (true) {} } if (n === 0) { throw new RangeError('zero'); } return n; }"
+    test_cases = [
+        {"input": [-1], "expected_output": 0},
+        {"input": [0], "expected_output": 0},
+        {"input": [3], "expected_output": 3}
+    ]
+    result = node_pool.run(code, test_cases=test_cases, function="spin", test_timeout=0.2)
+    assert [r["passed"] for r in result["results"]] == [False, False, True]
+    assert result["results"][0]["error"].startswith("Timeout")
+    assert result["results"][1]["error"] == "RangeError: zero"
+
+    result = node_pool.run("while (true) {}", test_timeout=0.2)
+    assert result["success"] is False
+    assert result["error"].startswith("Timeout")
+    assert node_pool.stats()["timeouts"] == 0
+
+
+def test_javascript_submissions_cannot_reach_the_host_realm(node_pool):
+    """Test that functions handed to a submission only lead back into its own context."""
+    result = node_pool.run("console.log(console.log.constructor('return typeof process')());")
+    assert result["output"] == "undefined\n"
+
+    # Patching JSON through the console does not affect the grading of the next job
+    node_pool.run("console.log.constructor('return JSON')().parse = () => 0;")
+    result = node_pool.run("function f(x) { return 5; }", function="f",
+                           test_cases=[{"input": [1], "expected_output": 5}])
+    assert result["results"][0]["passed"] is True
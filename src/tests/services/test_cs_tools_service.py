@@ -1,8 +1,12 @@
+import os
 import pytest
+import math
 from unittest.mock import MagicMock, patch
 
 # This import will fail until the service is implemented
-from src.services.cs_tools_service import CSToolsService
+from src.services.cs_tools_service import (
+    CSToolsService, GradingResultCache, apply_visualization_step, evaluate_complexity, parse_complexity_bound
+)
 
 
 @pytest.fixture
@@ -108,4 +112,338 @@ def test_tracking_service_integration(cs_tools_service):
         tool_type="code_validator",
         action="validate_code_syntax",
         data={"code": "print('Hello, world!')", "language": "python"}
-    ) 
\ No newline at end of file
+    ) 
+
+def test_validate_code_against_testcases_declared_function(cs_tools_service):
+    """Test that test cases call the function the exercise declares."""
+    code = "def helper(x):\n    return x * 2\n\ndef double_all(values):\n    return [helper(v) for v in values]"
+    test_cases = [
+        {"input": {"values": [1, 2]}, "expected_output": [2, 4]},
+        {"input": {"values": []}, "expected_output": []}
+    ]
+    result = cs_tools_service.validate_code_against_testcases(code, test_cases, "python",
+                                                              function_name="double_all")
+    assert result["all_passed"] is True
+
+    # Two top-level functions and no declared name is ambiguous
+    result = cs_tools_service.validate_code_against_testcases(code, test_cases, "python")
+    assert result["all_passed"] is False
+    assert "function_name" in result["error"]
+
+    # A single top-level function is inferred
+    result = cs_tools_service.validate_code_against_testcases("def square(n): return n * n",
+                                                              [{"input": {"n": 3}, "expected_output": 9}], "python")
+    assert result["all_passed"] is True
+
+
+def test_validate_code_against_testcases_isolates_tests(cs_tools_service):
+    """Test that a slow or failing test case does not affect the others."""
+    code = (
+        "def solve(n, items):\n"
+        "    items.append(n)\n"
+        "    if n < 0:\n"
+        "        while True:\n"
+        "            pass\n"
+        "    if n == 0:\n"
+        "        raise ValueError('zero')\n"
+        "    return len(items)"
+    )
+    test_cases = [
+        {"input": {"n": 1, "items": []}, "expected_output": 1},
+        {"input": {"n": -1, "items": []}, "expected_output": 1},
+        {"input": {"n": 0, "items": []}, "expected_output": 1},
+        {"input": {"n": 2, "items": []}, "expected_output": 1}
+    ]
+    with patch("src.services.cs_tools_service.TEST_CASE_TIME_BUDGET", 0.2):
+        result = cs_tools_service.validate_code_against_testcases(code, test_cases, "python")
+    
+    assert [r["passed"] for r in result["results"]] == [True, False, False, True]
+    assert result["results"][1]["error"].startswith("Timeout")
+    assert result["results"][2]["error"] == "ValueError: zero"
+
+
+def test_sandbox_files_are_removed(cs_tools_service):
+    """Test that running a JavaScript program leaves no file in the sandbox directory."""
+    before = set(os.listdir(cs_tools_service.sandbox_dir))
+    result = cs_tools_service._check_code_output("console.log('cleanup');", "cleanup", "javascript")
+    assert result["is_correct"] is True
+    assert set(os.listdir(cs_tools_service.sandbox_dir)) == before
+
+
+def test_validate_javascript_against_testcases(cs_tools_service):
+    """Test that JavaScript test cases run through a single harness process."""
+    code = "const multiply = (a, b) => a * b;"
+    test_cases = [
+        {"input": {"a": 2, "b": 3}, "expected_output": 6},
+        {"input": [4, 5], "expected_output": 21}
+    ]
+    result = cs_tools_service.validate_code_against_testcases(code, test_cases, "javascript")
+    assert result["success"] is True
+    assert [r["passed"] for r in result["results"]] == [True, False]
+    assert result["results"][1]["actual_output"] == 20
+
+
+def test_validate_code_against_complexity_bound(cs_tools_service):
+    """Test that complexity grading fails solutions that scale worse than the bound."""
+    test_cases = [{"input": {"values": [3, 1, 3]}, "expected_output": True}]
+    linear = "def has_duplicates(values):\n    seen = set()\n    for v in values:\n        if v in seen:\n            return True\n        seen.add(v)\n    return False"
+    result = cs_tools_service.validate_code_against_testcases(
+        linear, test_cases, "python",
+        complexity={"bound": "O(n)", "argument": "values", "input_type": "list"}
+    )
+    assert result["complexity"]["passed"] is True
+    assert result["complexity"]["measurements"][0]["size"] == 16
+    assert result["all_passed"] is True
+
+    result = cs_tools_service.validate_code_against_testcases(
+        "def count_pairs(n):\n    return sum(1 for i in range(n) for j in range(n) if i < j)",
+        [{"input": {"n": 3}, "expected_output": 3}], "python",
+        complexity={"bound": "O(n)", "input_type": "int"}
+    )
+    assert result["results"][0]["passed"] is True
+    assert result["complexity"]["estimated"] == "O(n^2)"
+    assert result["complexity"]["passed"] is False
+    assert result["all_passed"] is False
+
+
+def test_evaluate_complexity_models():
+    """Test fitting measurements against the complexity classes."""
+    sizes = [2 ** k for k in range(4, 12)]
+
+    def measurements(operations, time):
+        return [{"size": n, "operations": operations(n), "time": time(n)} for n in sizes]
+
+    binary_search = evaluate_complexity(measurements(lambda n: 3 + 4 * math.log2(n), lambda n: 1e-6), "O(log n)")
+    assert binary_search["estimated"] == "O(log n)"
+    assert binary_search["passed"] is True
+
+    merge_sort = evaluate_complexity(measurements(lambda n: 5 * n * math.log2(n), lambda n: 1e-7 * n), "O(n)")
+    assert merge_sort["operations_fit"] == "O(n log n)"
+    assert merge_sort["passed"] is False
+
+    # Work hidden in a builtin shows up in the timings only
+    builtin_scan = evaluate_complexity(measurements(lambda n: 2, lambda n: 1e-8 * n), "O(log n)")
+    assert builtin_scan["operations_fit"] == "O(1)"
+    assert builtin_scan["estimated"] == "O(n)"
+    assert builtin_scan["passed"] is False
+
+    assert evaluate_complexity(measurements(lambda n: n, lambda n: n)[:2], "O(n)")["passed"] is False
+    assert parse_complexity_bound("O(n²)") == "O(n^2)"
+    with pytest.raises(ValueError):
+        parse_complexity_bound("O(2^n)")
+
+
+def test_repeated_submissions_use_result_cache(cs_tools_service):
+    """Test that identical submissions are answered from the result cache."""
+    test_cases = [{"input": {"a": 1, "b": 2}, "expected_output": 3}]
+    first = cs_tools_service.validate_code_against_testcases("def add(a, b):\n    return a + b\n", test_cases, "python")
+    
+    with patch.object(cs_tools_service, "_validate_code_against_testcases") as validate:
+        # Line endings do not change the cache key
+        second = cs_tools_service.validate_code_against_testcases("def add(a, b):\r\n    return a + b\r\n", test_cases, "python")
+        validate.assert_not_called()
+    assert second == first
+    
+    # Different test cases are a different request
+    cs_tools_service.validate_code_against_testcases("def add(a, b):\n    return a + b\n", test_cases * 2, "python")
+    
+    stats = cs_tools_service.get_result_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_whitespace_inside_strings_changes_the_result(cs_tools_service):
+    """Test that trailing whitespace is part of the cache key, since strings can hold it."""
+    first = cs_tools_service.check_code_output('print("""a \nb""")', "a \nb", "python")
+    second = cs_tools_service.check_code_output('print("""a\nb""")', "a \nb", "python")
+    assert first["actual_output"] == "a \nb"
+    assert second["actual_output"] == "a\nb"
+    assert cs_tools_service.get_result_cache_stats()["hits"] == 0
+
+
+def test_complexity_verdicts_are_not_cached(cs_tools_service):
+    """Test that timing-based complexity grading is measured on every submission."""
+    with patch.object(cs_tools_service, "_validate_code_against_testcases") as validate:
+        validate.return_value = {"success": True, "all_passed": True, "results": [], "error": None}
+        for _ in range(2):
+            cs_tools_service.validate_code_against_testcases(
+                "def f(n):\n    return n", [{"input": {"n": 1}, "expected_output": 1}], "python",
+                complexity={"bound": "O(1)", "input_type": "int"}
+            )
+        assert validate.call_count == 2
+    assert cs_tools_service.get_result_cache_stats()["size"] == 0
+
+
+def test_transient_failures_are_not_cached(cs_tools_service):
+    """Test that runs hitting a timeout are executed again on resubmission."""
+    with patch.object(cs_tools_service, "_check_code_output") as check:
+        check.return_value = {"is_correct": False, "error": "Execution error: Execution timed out after 5 seconds",
+                              "success": True}
+        cs_tools_service.check_code_output("while True: pass", "", "python")
+        cs_tools_service.check_code_output("while True: pass", "", "python")
+        assert check.call_count == 2
+
+
+def test_grading_result_cache_eviction_and_persistence(tmp_path):
+    """Test LRU eviction by entry count and size, and persistence across instances."""
+    path = tmp_path / "results.db"
+    cache = GradingResultCache(path, max_entries=2)
+    cache.put("a", {"verdict": 1})
+    cache.put("b", {"verdict": 2})
+    assert cache.get("a") == {"verdict": 1}  # "b" is now least recently used
+    cache.put("c", {"verdict": 3})
+    
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+    
+    # Hits do not write to the database
+    changes = cache._connection.total_changes
+    assert cache.get("a") == {"verdict": 1}
+    assert cache._connection.total_changes == changes
+    
+    reopened = GradingResultCache(path, max_entries=2)
+    assert reopened.get("a") == {"verdict": 1}
+    assert reopened.stats()["size"] == 2
+    
+    small = GradingResultCache(":memory:", max_bytes=40)
+    small.put("a", {"output": "x" * 10})
+    small.put("b", {"output": "y" * 10})
+    assert small.get("a") is None
+    assert small.get("b") == {"output": "y" * 10}
+    assert small.stats()["bytes"] <= 40
+
+
+def test_bubble_sort_steps_are_delta_encoded(cs_tools_service):
+    """Test that replaying bubble sort deltas reproduces every keyframe and the sorted array."""
+    data = list(range(80, 0, -1))
+    result = cs_tools_service.prepare_algorithm_visualization("bubble_sort", data)
+    steps = result["steps"]
+    
+    assert steps[0] == {"type": "initial", "data": data, "description": "Initial array"}
+    assert steps[1] == {"type": "comparison", "indices": [0, 1]}
+    assert result["additional_data"]["swaps"] == 80 * 79 // 2
+    
+    state = []
+    keyframes = 0
+    for step in steps:
+        expected = step.get("data")
+        if expected is not None and step["type"] != "initial":
+            step = {key: value for key, value in step.items() if key != "data"}
+            keyframes += 1
+        apply_visualization_step(state, step)
+        if expected is not None:
+            assert state == expected
+    assert state == sorted(data)
+    assert steps[-1]["type"] == "final"
+    # One keyframe per interval of algorithm steps, plus the final step
+    assert keyframes == (len(steps) - 2) // result["additional_data"]["keyframe_interval"] + 1
+    
+    # Snapshots are bounded: full copies appear once per keyframe interval, not once per step
+    snapshot_values = sum(len(step.get("data", [])) for step in steps)
+    assert snapshot_values <= 2 * len(steps) + 2 * len(data)
+
+
+def test_algorithm_steps_are_lazy_and_paged(cs_tools_service):
+    """Test the step generator and paging by step range."""
+    data = [5, 3, 8, 4, 2]
+    all_steps = list(cs_tools_service.iter_algorithm_steps("bubble_sort", data))
+    assert list(cs_tools_service.iter_algorithm_steps("bubble_sort", data, 3, 7)) == all_steps[3:7]
+    
+    page = cs_tools_service.get_algorithm_visualization_page("bubble_sort", data, start=5, count=4)
+    assert page["success"] is True
+    assert page["steps"] == all_steps[5:9]
+    assert page["has_more"] is True
+    
+    # start_data is the state just before the page
+    state = []
+    for step in all_steps[:5]:
+        apply_visualization_step(state, step)
+    assert page["start_data"] == state
+    
+    last_page = cs_tools_service.get_algorithm_visualization_page("bubble_sort", data, start=len(all_steps) - 2)
+    assert len(last_page["steps"]) == 2
+    assert last_page["has_more"] is False
+    
+    result = cs_tools_service.get_algorithm_visualization_page("bogo_sort", data)
+    assert result["success"] is False
+
+
+@pytest.mark.parametrize("algorithm", ["bubble_sort", "insertion_sort", "selection_sort", "merge_sort", "quick_sort"])
+def test_sorting_visualizations_replay_to_sorted_array(cs_tools_service, algorithm):
+    """Test that every sorting visualization's deltas replay to the sorted array."""
+    data = [9, 4, 7, 1, 8, 2, 2, 6, 0, 5, 3, 7]
+    result = cs_tools_service.prepare_algorithm_visualization(algorithm, data)
+    assert result["success"] is True
+    
+    state = []
+    for step in result["steps"]:
+        if step["type"] != "final":
+            apply_visualization_step(state, step)
+    assert state == sorted(data)
+    assert result["steps"][-1]["data"] == sorted(data)
+    
+    additional_data = result["additional_data"]
+    assert additional_data["comparisons"] == sum(1 for s in result["steps"] if s["type"] == "comparison")
+    assert additional_data["swaps"] == sum(1 for s in result["steps"] if s["type"] == "swap")
+    assert additional_data["writes"] == sum(1 for s in result["steps"] if s["type"] == "set")
+    assert additional_data["truncated"] is False
+
+
+def test_search_visualizations(cs_tools_service):
+    """Test linear and binary search visualizations and their comparison counts."""
+    data = list(range(0, 200, 2))
+    
+    result = cs_tools_service.prepare_algorithm_visualization("linear_search", data, target=50)
+    assert result["steps"][-1]["index"] == 25
+    assert result["additional_data"]["comparisons"] == 26
+    
+    result = cs_tools_service.prepare_algorithm_visualization("binary_search", data[::-1], target=50)
+    assert result["steps"][-1]["index"] == 25
+    assert result["additional_data"]["comparisons"] <= 7
+    
+    result = cs_tools_service.prepare_algorithm_visualization("binary_search", data, target=51)
+    assert result["steps"][-1]["index"] == -1
+
+
+def test_large_visualizations_are_truncated(cs_tools_service):
+    """Test that visualizations longer than the step budget are truncated but fully counted."""
+    data = list(range(300, 0, -1))
+    with patch("src.services.cs_tools_service.VISUALIZATION_MAX_STEPS", 1000):
+        result = cs_tools_service.prepare_algorithm_visualization("bubble_sort", data)
+    
+    assert result["additional_data"]["truncated"] is True
+    assert len(result["steps"]) == 1001
+    assert result["steps"][-1]["data"] == sorted(data)
+    assert result["additional_data"]["swaps"] == 300 * 299 // 2
+
+
+def test_results_include_resource_usage(cs_tools_service):
+    """Test that execution results carry the resource usage of the run."""
+    result = cs_tools_service.check_code_output("print('Hello, world!')", "Hello, world!", "python")
+    assert result["is_correct"] is True
+    assert result["resource_usage"]["output_bytes"] == len("Hello, world!\n")
+    
+    result = cs_tools_service.validate_code_against_testcases(
+        "function add(a, b) { return a + b; }", [{"input": [1, 2], "expected_output": 3}], "javascript"
+    )
+    assert result["all_passed"] is True
+    assert result["resource_usage"]["peak_rss_bytes"] > 0
+
+
+def test_find_similar_submissions(cs_tools_service):
+    """Test flagging copied submissions through the service."""
+    code = "def total(values):\n    result = 0\n    for v in values:\n        result += v * v\n    return result"
+    copy = "def total(nums):\n    acc = 0\n    for n in nums:\n        acc += n * n\n    return acc"
+    cs_tools_service.index_submission("sub-1", code, "python", user_id="alice", exercise_id="ex-1")
+    cs_tools_service.index_submission("sub-2", copy, "python", user_id="bob", exercise_id="ex-1")
+
+    result = cs_tools_service.find_similar_submissions(submission_id="sub-2")
+    assert result["success"] is True
+    assert [m["user_id"] for m in result["matches"]] == ["alice"]
+
+    result = cs_tools_service.find_similar_submissions(code=copy, language="python", exercise_id="ex-1",
+                                                       user_id="bob")
+    assert [m["submission_id"] for m in result["matches"]] == ["sub-1"]
+
+    assert cs_tools_service.find_similar_submissions(submission_id="missing")["success"] is False
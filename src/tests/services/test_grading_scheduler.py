@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+from src.services.grading_scheduler import GradingScheduler, PRIORITY_HIGH, PRIORITY_LOW
+from src.services.sandbox_process import MAX_OUTPUT_BYTES
+
+
+def run(coroutine):
+    """Run a coroutine on a fresh event loop."""
+    return asyncio.run(coroutine)
+
+
+def test_grade_python_and_javascript():
+    """Test grading submissions in isolated subprocesses."""
+    async def scenario():
+        scheduler = GradingScheduler(max_concurrency=2)
+        await scheduler.start()
+        try:
+            test_cases = [
+                {"input": {"a": 1, "b": 2}, "expected_output": 3},
+                {"input": {"a": 2, "b": 2}, "expected_output": 5}
+            ]
+            python_result, js_result, output_result = await asyncio.gather(
+                scheduler.grade("u1", "python", "def add(a, b):\n    return a + b", test_cases=test_cases),
+                scheduler.grade("u2", "javascript", "function add(a, b) { return a + b; }", test_cases=test_cases),
+                scheduler.grade("u3", "python", "print(input()[::-1])", stdin="abc")
+            )
+            return python_result, js_result, output_result, scheduler.metrics()
+        finally:
+            await scheduler.stop()
+
+    python_result, js_result, output_result, metrics = run(scenario())
+    for result in (python_result, js_result):
+        assert result["success"] is True
+        assert result["passed_count"] == 1
+        assert [r["passed"] for r in result["results"]] == [True, False]
+    assert output_result["output"] == "cba"
+    assert metrics["completed"] == 3
+    assert metrics["queue_depth"] == 0
+    assert metrics["run_time"]["max"] > 0
+
+
+def test_timeout_and_errors():
+    """Test that failing and runaway jobs produce error results."""
+    async def scenario():
+        scheduler = GradingScheduler(max_concurrency=2, timeout=0.5)
+        await scheduler.start()
+        try:
+            return await asyncio.gather(
+                scheduler.grade("u1", "python", "while True:\n    pass"),
+                scheduler.grade("u1", "python", "raise ValueError('bad')"),
+                scheduler.grade("u1", "ruby", "puts 1")
+            ), scheduler.metrics()
+        finally:
+            await scheduler.stop()
+
+    (timed_out, failed, unsupported), metrics = run(scenario())
+    assert "timed out" in timed_out["error"]
+    assert "ValueError: bad" in failed["error"]
+    assert unsupported["error"] == "Unsupported language: ruby"
+    assert metrics["timeouts"] == 1
+    assert metrics["failed"] == 3
+
+
+def test_priority_and_fairness():
+    """Test that jobs run by priority, then round-robin across users."""
+    async def scenario():
+        scheduler = GradingScheduler(max_concurrency=1)
+        await scheduler.start()
+        order = []
+        try:
+            futures = []
+            for user_id, priority in [("busy", PRIORITY_LOW)] + [("busy", None)] * 3 + [("quiet", None), ("urgent", PRIORITY_HIGH)]:
+                kwargs = {"priority": priority} if priority is not None else {}
+                future = scheduler.submit(user_id, "python", "print(1)", **kwargs)
+                future.add_done_callback(lambda f, u=user_id: order.append(u))
+                futures.append(future)
+            await asyncio.gather(*futures)
+        finally:
+            await scheduler.stop()
+        return order
+
+    order = run(scenario())
+    assert order[0] == "urgent"
+    # The quiet user is served after one job of the busy user, not after all three
+    assert order[1:4] == ["busy", "quiet", "busy"]
+    assert order[-1] == "busy"
+
+
+def test_full_queue_rejects_submissions():
+    """Test that submissions beyond the queue limit are rejected immediately."""
+    async def scenario():
+        scheduler = GradingScheduler(max_concurrency=1, max_queue_size=1)
+        await scheduler.start()
+        try:
+            # Nothing is dispatched before the loop runs, so the second job finds the queue full
+            futures = [scheduler.submit(f"u{i}", "python", "print(1)") for i in range(2)]
+            rejected = futures[1].done() and futures[1].result()
+            await asyncio.gather(*futures)
+            return rejected, scheduler.metrics()
+        finally:
+            await scheduler.stop()
+
+    rejected, metrics = run(scenario())
+    assert rejected["success"] is False
+    assert "queue is full" in rejected["error"]
+    assert rejected["retry_after"] >= 0
+    assert metrics["rejected"] == 1
+
+
+def test_per_user_cap_rejects_only_the_busy_user():
+    """Test that one user's burst is rejected while other users are still admitted."""
+    async def scenario():
+        scheduler = GradingScheduler(max_concurrency=1, max_queued_per_user=2)
+        await scheduler.start()
+        try:
+            futures = [scheduler.submit("busy", "python", "print(1)") for _ in range(4)]
+            futures.append(scheduler.submit("quiet", "python", "print(2)"))
+            return await asyncio.gather(*futures), scheduler.metrics()
+        finally:
+            await scheduler.stop()
+
+    results, metrics = run(scenario())
+    assert [result["success"] for result in results] == [True, True, False, False, True]
+    assert "Too many of your submissions" in results[2]["error"]
+    assert results[2]["retry_after"] >= 0
+    assert metrics["rejected"] == 2
+
+
+def test_output_is_capped():
+    """Test that captured output is bounded like run_sandboxed's."""
+    async def scenario():
+        scheduler = GradingScheduler(max_concurrency=2)
+        await scheduler.start()
+        try:
+            return await asyncio.gather(
+                scheduler.grade("u1", "javascript", "process.stdout.write('x'.repeat(3 * 1024 * 1024));", stdin=""),
+                scheduler.grade("u2", "python", "print('x' * 3 * 1024 * 1024)")
+            )
+        finally:
+            await scheduler.stop()
+
+    program, worker = run(scenario())
+    assert program["success"] is True
+    assert len(program["output"]) == MAX_OUTPUT_BYTES
+    assert worker["success"] is False
+    assert "Output exceeded" in worker["error"]
+
+
+def test_submit_requires_running_scheduler():
+    """Test that submitting before start() fails."""
+    async def scenario():
+        GradingScheduler().submit("u1", "python", "print(1)")
+
+    with pytest.raises(RuntimeError):
+        run(scenario())
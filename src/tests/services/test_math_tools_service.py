@@ -2,6 +2,8 @@ import pytest
 from unittest.mock import MagicMock, patch
 import math
 
+import numpy as np
+
 from src.services.math_tools_service import MathToolsService
 
 
@@ -460,4 +462,332 @@ def test_tracking_service_integration(math_tools_service):
         tool_type="expression_validator",
         action="validate_expression",
         data={"expression": "2 + 3"}
-    ) 
\ No newline at end of file
+    ) 
+
+def test_compile_expression_is_cached(math_tools_service):
+    """Test that equivalent sources share one compiled program."""
+    program = math_tools_service.compile_expression("3 + 4 * 2 ^ 2")
+    assert program.evaluate() == 19.0
+    
+    # Whitespace and power notation normalize to the same cache key
+    assert math_tools_service.compile_expression("3+4*2**2") is program
+    
+    # Programs are immutable
+    with pytest.raises(Exception):
+        program.source = "1"
+    
+    stats = math_tools_service.get_compiled_cache_stats()
+    assert stats["hits"] >= 1
+    assert stats["size"] >= 1
+
+
+def test_compile_expression_with_variables(math_tools_service):
+    """Test compiled programs with free variables."""
+    program = math_tools_service.compile_expression("x^2 + 2*x + 1")
+    assert program.variables == frozenset({"x"})
+    assert program.evaluate({"x": 3}) == 16.0
+    
+    # Missing variables are reported like unknown tokens
+    with pytest.raises(ValueError, match="Unknown token: x"):
+        program.evaluate()
+
+
+def test_compiled_cache_is_bounded():
+    """Test that the compiled expression cache evicts least recently used entries."""
+    from src.services.math_tools_service import CompiledExpressionCache
+    
+    service = MathToolsService()
+    cache = CompiledExpressionCache(max_size=2)
+    first = service._compile_normalized("1+1")
+    cache.put("1+1", first)
+    cache.put("2+2", service._compile_normalized("2+2"))
+    assert cache.get("1+1") is first
+    cache.put("3+3", service._compile_normalized("3+3"))
+    
+    assert len(cache) == 2
+    assert cache.get("2+2") is None
+    assert cache.get("1+1") is first
+
+
+def test_prepare_function_graph_data_vectorized(math_tools_service):
+    """Test vectorized graph evaluation over negative x values and functions containing x."""
+    result = math_tools_service.prepare_function_graph_data("exp(x) - x", (-2, 2), 41)
+    assert result["success"] is True
+    assert len(result["data_points"]) == 41
+    assert result["discontinuities"] == []
+    first_point = result["data_points"][0]
+    assert first_point["x"] == -2.0
+    assert abs(first_point["y"] - (math.exp(-2) + 2)) < 1e-9
+    
+    # Poles between sample points are reported as discontinuities
+    result = math_tools_service.prepare_function_graph_data("tan(x)", (-3, 3), 200)
+    assert result["success"] is True
+    assert len(result["discontinuities"]) == 2
+    assert all(abs(abs(x) - math.pi / 2) < 0.05 for x in result["discontinuities"])
+    
+    # Unknown variables are rejected
+    result = math_tools_service.prepare_function_graph_data("x + y", (-1, 1), 10)
+    assert result["success"] is False
+
+
+def test_prepare_function_graph_data_columnar(math_tools_service):
+    """Test the columnar response option for graph data."""
+    result = math_tools_service.prepare_function_graph_data("sqrt(x)", (-1, 1), 21, columnar=True)
+    assert result["success"] is True
+    assert "data_points" not in result
+    assert len(result["columns"]["x"]) == len(result["columns"]["y"]) == 11
+    assert len(result["discontinuities"]) == 10
+
+
+def test_prepare_function_graph_data_adaptive(math_tools_service):
+    """Test adaptive sampling of function graphs."""
+    # Straight lines need no refinement beyond the initial grid
+    result = math_tools_service.prepare_function_graph_data("2*x + 3", (-10, 10), 500, sampling="adaptive")
+    assert result["success"] is True
+    assert result["sampling"] == "adaptive"
+    assert result["evaluations"] < 50
+    assert result["discontinuity_intervals"] == []
+    
+    # Poles are narrowed down to tight intervals within the budget
+    result = math_tools_service.prepare_function_graph_data("1/(x-2)", (-5, 10), 200, sampling="adaptive")
+    assert result["success"] is True
+    assert result["evaluations"] <= 200
+    assert len(result["discontinuity_intervals"]) == 1
+    interval = result["discontinuity_intervals"][0]
+    assert interval["start"] < 2 < interval["end"]
+    assert interval["end"] - interval["start"] < 1e-4
+    
+    # Samples are concentrated where the curve bends
+    result = math_tools_service.prepare_function_graph_data("x^2", (-1, 1), 500, sampling="adaptive")
+    assert result["success"] is True
+    assert result["evaluations"] < 500
+    assert all(abs(p["y"] - p["x"] ** 2) < 1e-9 for p in result["data_points"])
+
+
+def test_prepare_function_graph_data_discontinuity_intervals(math_tools_service):
+    """Test discontinuity intervals in uniform mode and invalid sampling modes."""
+    result = math_tools_service.prepare_function_graph_data("sqrt(x)", (-1, 1), 21)
+    assert result["discontinuity_intervals"] == [{"start": -1.0, "end": 0.0}]
+    
+    result = math_tools_service.prepare_function_graph_data("x", (-1, 1), 21, sampling="random")
+    assert result["success"] is False
+    assert "Unsupported sampling mode" in result["error"]
+
+
+def test_check_answers_batch(math_tools_service):
+    """Test checking many answers in one call."""
+    answers = [
+        ("2+3", "5"),
+        ("3.1415", "pi", 0.001),
+        ("3.1", "3.2", 0.01),
+        ("x^2 + 2*x + 1", "x**2+2*x+1"),
+        ("2+3", "5")
+    ]
+    
+    result = math_tools_service.check_answers_batch(answers, user_id="test_user")
+    
+    assert result["success"] is True
+    assert result["total"] == 5
+    assert [r["is_correct"] for r in result["results"]] == [True, True, False, True, True]
+    assert result["correct_count"] == 4
+    
+    # One aggregated tracking record for the whole batch
+    math_tools_service.tracking_service.track_tool_usage.assert_called_once_with(
+        user_id="test_user",
+        tool_type="answer_checker",
+        action="check_answers_batch",
+        data={"answers_count": 5, "correct_count": 4, "distinct_correct_answers": 4}
+    )
+    
+    # Worker pool gives the same results
+    parallel = math_tools_service.check_answers_batch(answers, max_workers=4)
+    assert parallel["results"] == result["results"]
+
+
+def test_check_answers_batch_invalid_item(math_tools_service):
+    """Test that malformed batch items are rejected."""
+    result = math_tools_service.check_answers_batch([("1", "1"), ("1",)])
+    assert result["success"] is False
+    assert "index 1" in result["error"]
+
+
+def test_check_answer_symbolic_equivalence(math_tools_service):
+    """Test symbolic equivalence checking of algebraic answers."""
+    result = math_tools_service.check_answer("1+2x", "2*x+1")
+    assert result["is_correct"] is True
+    
+    result = math_tools_service.check_answer("(x+1)^2", "x^2 + 2*x + 1")
+    assert result["is_correct"] is True
+    
+    result = math_tools_service.check_answer("x/2 + y", "0.5*x + y")
+    assert result["is_correct"] is True
+    
+    result = math_tools_service.check_answer("sin(x)^2 + cos(x)^2", "1")
+    assert result["is_correct"] is True
+    
+    result = math_tools_service.check_answer("(x+1)^2", "x^2 + 1")
+    assert result["is_correct"] is False
+    
+    # Equivalence checking can be turned off
+    result = math_tools_service.check_answer("1+2x", "2*x+1", symbolic=False, probe=False)
+    assert result["is_correct"] is False
+
+
+def test_canonical_form_cache(math_tools_service, tmp_path):
+    """Test that canonical forms are cached persistently."""
+    from src.services.math_tools_service import CanonicalFormCache
+    
+    cache_path = tmp_path / "canonical.db"
+    math_tools_service.canonical_cache = CanonicalFormCache(cache_path)
+    canonical = math_tools_service._canonical_form("(x+1)^2")
+    assert canonical is not None
+    assert math_tools_service.canonical_cache.stats()["size"] == 1
+    math_tools_service.canonical_cache.close()
+    
+    # A fresh cache on the same file sees the stored form without SymPy
+    reopened = CanonicalFormCache(cache_path)
+    math_tools_service.canonical_cache = reopened
+    with patch.object(math_tools_service, "_sympy_canonical_form") as canonicalize:
+        assert math_tools_service._canonical_form("(x + 1)^2") == canonical
+        canonicalize.assert_not_called()
+    assert reopened.stats()["hits"] == 1
+
+
+def test_canonical_form_cache_is_bounded(tmp_path):
+    """Test LRU eviction in memory, row eviction on disk and batched commits."""
+    from src.services.math_tools_service import CanonicalFormCache, _MISSING
+    
+    cache_path = tmp_path / "canonical.db"
+    cache = CanonicalFormCache(cache_path, memory_size=2, max_rows=3, commit_interval=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert cache.stats()["memory_size"] == 2
+    
+    # "b" was least recently used, so it is read back from disk
+    assert cache.get("b") == "B"
+    assert cache.stats()["hits"] == 2
+    
+    # Only committed writes are visible to another connection
+    reader = CanonicalFormCache(cache_path)
+    assert reader.get("c") is _MISSING
+    cache.put("d", "D")
+    cache.put("e", "E")
+    cache.put("f", "F")
+    cache.flush()
+    assert reader.stats()["size"] == 3
+    assert reader.get("a") is _MISSING
+    assert reader.get("f") == "F"
+
+
+def test_service_opens_canonical_cache_lazily():
+    """Test that creating the service does not touch the canonical form database."""
+    service = MathToolsService()
+    service._init_dependencies()
+    assert service.canonical_cache is None
+
+
+def test_canonical_form_timeout(math_tools_service):
+    """Test that slow canonicalization is stopped and cached as unknown."""
+    from src.services.math_tools_service import SymbolicWorker
+    
+    math_tools_service.symbolic_worker = SymbolicWorker()
+    try:
+        assert math_tools_service._canonical_form("x^2") is not None
+        
+        math_tools_service.symbolic_timeout = 0.2
+        assert math_tools_service._canonical_form("sin(x+y)^12 - cos(x-y)^12") is None
+        # The computation is stopped by killing the worker
+        assert not math_tools_service.symbolic_worker.alive
+        
+        # The failure is cached, so the slow path is not retried
+        with patch.object(math_tools_service, "_sympy_canonical_form") as canonicalize:
+            assert math_tools_service._canonical_form("sin(x+y)^12 - cos(x-y)^12") is None
+            canonicalize.assert_not_called()
+        
+        # The next expression gets a fresh worker
+        math_tools_service.symbolic_timeout = 30
+        assert math_tools_service._canonical_form("(x+1)^2") is not None
+        assert math_tools_service.symbolic_worker.alive
+    finally:
+        math_tools_service.symbolic_worker.close()
+
+
+def test_check_answer_probe_equivalence(math_tools_service):
+    """Test randomized probing of multi-variable algebraic answers."""
+    with patch.object(math_tools_service, "_canonical_form") as canonicalize:
+        result = math_tools_service.check_answer("(x+y)^2", "x^2 + 2*x*y + y^2")
+        assert result["is_correct"] is True
+        
+        result = math_tools_service.check_answer("x*y + z", "z + y*x")
+        assert result["is_correct"] is True
+        
+        result = math_tools_service.check_answer("abs(x)", "x")
+        assert result["is_correct"] is False
+        
+        # Conclusive probes never reach SymPy
+        canonicalize.assert_not_called()
+    
+    # Expressions undefined almost everywhere are inconclusive and fall back to SymPy
+    assert math_tools_service._probe_equivalence("sqrt(x-10)", "sqrt(x-10)", 0.001) is None
+    result = math_tools_service.check_answer("sqrt(x-10)", "sqrt(x - 10)")
+    assert result["is_correct"] is True
+
+
+def test_probe_tolerance_is_absolute(math_tools_service):
+    """Test that probing applies the answer tolerance like the numeric comparison."""
+    near_misses = [("1000x", "1001x"), ("x*500.4", "x*500"), ("x^2+300.2", "x^2+300")]
+    for student, correct in near_misses:
+        assert math_tools_service._probe_equivalence(student, correct, 0.001) is False
+        assert math_tools_service.check_answer(student, correct)["is_correct"] is False
+    assert math_tools_service.check_answer("1000", "1001")["is_correct"] is False
+    
+    # Differences within the tolerance are accepted on both paths
+    assert math_tools_service.check_answer("x^2+300.0005", "x^2+300")["is_correct"] is True
+    assert math_tools_service.check_answer("300.0005", "300")["is_correct"] is True
+
+
+def test_prepare_statistics_visualization_streaming(math_tools_service):
+    """Test statistics visualizations from generators and merged accumulators."""
+    from src.services.streaming_statistics import StreamingStatistics
+    
+    result = math_tools_service.prepare_statistics_visualization((float(x) for x in range(1, 11)), "boxplot")
+    assert result["success"] is True
+    assert result["quartiles"]["q1"] == 3.25
+    assert result["data_summary"]["mean"] == 5.5
+    
+    # Partial results from several workers can be merged and visualized
+    partial = StreamingStatistics.from_iterable(range(1, 6))
+    partial.merge(StreamingStatistics.from_iterable(range(6, 11)))
+    result = math_tools_service.prepare_statistics_visualization(partial, "histogram")
+    assert result["success"] is True
+    assert result["data_summary"]["count"] == 10
+    assert sum(b["count"] for b in result["bins"]) == 10
+    
+    # Point-based visualizations need the data points themselves
+    result = math_tools_service.prepare_statistics_visualization(partial, "scatter")
+    assert result["success"] is False
+
+
+def test_in_memory_statistics_match_numpy(math_tools_service):
+    """Test that statistics of data held in memory are exactly NumPy's."""
+    values = np.random.default_rng(7).normal(size=5_000)
+    
+    result = math_tools_service.prepare_statistics_visualization(values.tolist(), "histogram")
+    counts, edges = np.histogram(values, bins=result["bin_count"])
+    assert [b["count"] for b in result["bins"]] == counts.tolist()
+    assert [b["bin_start"] for b in result["bins"]] == edges[:-1].tolist()
+    assert result["data_summary"]["median"] == np.median(values)
+    assert result["data_summary"]["std_dev"] == pytest.approx(np.std(values))
+    
+    result = math_tools_service.prepare_statistics_visualization(values, "boxplot")
+    q1, q3 = np.percentile(values, [25, 75])
+    assert result["quartiles"]["q1"] == q1
+    assert result["quartiles"]["q3"] == q3
+    assert result["iqr"] == q3 - q1
+    lower, upper = result["whiskers"]["lower"], result["whiskers"]["upper"]
+    assert result["outliers"] == np.sort(values[(values < lower) | (values > upper)]).tolist()
+    
+    result = math_tools_service.prepare_statistics_visualization(tuple(values[:500]), "line")
+    assert result["data_summary"]["median"] == np.median(values[:500])
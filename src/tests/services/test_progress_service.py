@@ -5,9 +5,13 @@ Tests for the progress service.
 import pytest
 import uuid
 import logging
+import numpy as np
 from datetime import datetime, timezone
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+from sqlalchemy import event, insert
+
 from src.core.error_handling.exceptions import ValidationError, ResourceNotFoundError, DatabaseError
 from src.models.progress import (
     Progress, 
@@ -21,8 +25,12 @@ from src.db.models import (
     ContentState as DBContentState,
     CompletedLesson as DBCompletedLesson,
     CompletedCourse as DBCompletedCourse,
-    UserContentProgress as DBUserContentProgress
+    UserContentProgress as DBUserContentProgress,
+    Course as DBCourse,
+    Lesson as DBLesson,
+    Content as DBContent
 )
+from src.db.models.enums import ContentType, Topic
 from src.db.repositories import (
     ProgressRepository,
     ContentStateRepository,
@@ -31,9 +39,10 @@ from src.db.repositories import (
     UserContentProgressRepository,
     LessonRepository,
     CourseRepository,
-    ContentRepository
+    ContentRepository,
+    CourseContentWeightsRepository
 )
-from src.services.progress_service import ProgressService
+from src.services.progress_service import ProgressService, WEIGHTS_ALGORITHM_VERSION
 from src.tests.base_test_classes import BaseServiceTest
 
 logger = logging.getLogger(__name__)
@@ -59,6 +68,9 @@ class TestProgressService(BaseServiceTest):
         self.lesson_repo_mock = MagicMock(spec=LessonRepository)
         self.course_repo_mock = MagicMock(spec=CourseRepository)
         self.content_repo_mock = MagicMock(spec=ContentRepository)
+        self.course_content_weights_repo_mock = MagicMock(spec=CourseContentWeightsRepository)
+        # No stored weights unless a test provides them
+        self.course_content_weights_repo_mock.get_weights.return_value = None
         
         # Create a real service with mocked repositories
         self.progress_service = ProgressService()
@@ -69,6 +81,7 @@ class TestProgressService(BaseServiceTest):
         self.progress_service.lesson_repo = self.lesson_repo_mock
         self.progress_service.course_repo = self.course_repo_mock
         self.progress_service.content_repo = self.content_repo_mock
+        self.progress_service.course_content_weights_repo = self.course_content_weights_repo_mock
         
         # Create a mock session object
         self.mock_db = MagicMock()
@@ -861,65 +874,31 @@ class TestProgressService(BaseServiceTest):
     
     def test_calculate_weighted_course_progress_success(self):
         """Test calculating weighted course progress successfully."""
-        # Create mock lesson objects
-        mock_lesson1 = MagicMock()
-        mock_lesson1.id = uuid.uuid4()
-        mock_lesson1.lesson_order = 1
-        mock_lesson1.difficulty_level.value = 2  # Assuming DifficultyLevel.BEGINNER
-        
-        mock_lesson2 = MagicMock()
-        mock_lesson2.id = uuid.uuid4()
-        mock_lesson2.lesson_order = 2
-        mock_lesson2.difficulty_level.value = 3  # Assuming DifficultyLevel.INTERMEDIATE
-        
-        # Create mock content items
-        mock_content1 = MagicMock()
-        mock_content1.id = uuid.uuid4()
-        mock_content1.content_type = "theory"
-        mock_content1.lesson_id = mock_lesson1.id
-        mock_content1.metadata = {"importance": 1.0, "points": 1.0}
-        
-        mock_content2 = MagicMock()
-        mock_content2.id = uuid.uuid4()
-        mock_content2.content_type = "exercise"
-        mock_content2.lesson_id = mock_lesson1.id
-        mock_content2.metadata = {"importance": 1.5, "points": 1.0}
-        
-        mock_content3 = MagicMock()
-        mock_content3.id = uuid.uuid4()
-        mock_content3.content_type = "quiz"
-        mock_content3.lesson_id = mock_lesson2.id
-        mock_content3.metadata = {"importance": 2.0, "points": 2.0}
-        
-        # Create mock progress records
-        mock_content_progress1 = MagicMock()
-        mock_content_progress1.status = "completed"
-        
-        mock_content_progress2 = MagicMock()
-        mock_content_progress2.status = "in_progress"
-        mock_content_progress2.percentage = 50
-        
-        mock_content_progress3 = MagicMock()
-        mock_content_progress3.status = "not_started"
-        mock_content_progress3.score = None
+        # Two lessons with three content items, and a third lesson without content
+        lesson1_id, lesson2_id, lesson3_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        content1_id, content2_id, content3_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        outline = [
+            SimpleNamespace(lesson_id=lesson1_id, lesson_order=1, points_reward=10,
+                            content_id=content1_id, content_type=ContentType.THEORY),
+            SimpleNamespace(lesson_id=lesson1_id, lesson_order=1, points_reward=10,
+                            content_id=content2_id, content_type=ContentType.EXERCISE),
+            SimpleNamespace(lesson_id=lesson2_id, lesson_order=2, points_reward=20,
+                            content_id=content3_id, content_type=ContentType.ASSESSMENT),
+            SimpleNamespace(lesson_id=lesson3_id, lesson_order=3, points_reward=10,
+                            content_id=None, content_type=None),
+        ]
+        content_progress = [
+            SimpleNamespace(content_id=content1_id, is_completed=True, score=None),
+            SimpleNamespace(content_id=content2_id, is_completed=False, score=50.0),
+        ]
         
         # Create mock progress record
         mock_progress = MagicMock(spec=DBProgress)
         mock_progress.id = uuid.uuid4()
         
         # Set up repository mock returns
-        self.lesson_repo_mock.get_lessons_by_course_id.return_value = [mock_lesson1, mock_lesson2]
-        self.lesson_repo_mock.get_lesson_with_content.side_effect = lambda db, lesson_id: {
-            mock_lesson1.id: (mock_lesson1, [mock_content1, mock_content2]),
-            mock_lesson2.id: (mock_lesson2, [mock_content3])
-        }.get(lesson_id, (None, []))
-        
-        self.user_content_progress_repo_mock.get_progress.side_effect = lambda db, user_id, content_id: {
-            mock_content1.id: mock_content_progress1,
-            mock_content2.id: mock_content_progress2,
-            mock_content3.id: mock_content_progress3
-        }.get(content_id, None)
-        
+        self.lesson_repo_mock.get_course_content_outline.return_value = outline
+        self.user_content_progress_repo_mock.get_course_content_progress.return_value = content_progress
         self.progress_repo_mock.get_course_progress.return_value = mock_progress
         
         # Call the method
@@ -927,33 +906,69 @@ class TestProgressService(BaseServiceTest):
             self.user_id, self.course_id
         )
         
-        # Verify method calls
-        self.lesson_repo_mock.get_lessons_by_course_id.assert_called_once_with(
+        # Verify one read for the structure and one for the progress
+        self.lesson_repo_mock.get_course_content_outline.assert_called_once_with(
             self.mock_db, uuid.UUID(self.course_id)
         )
-        # Should call get_lesson_with_content twice
-        assert self.lesson_repo_mock.get_lesson_with_content.call_count == 2
-        assert self.user_content_progress_repo_mock.get_progress.call_count == 3
+        self.user_content_progress_repo_mock.get_course_content_progress.assert_called_once_with(
+            self.mock_db, uuid.UUID(self.user_id), uuid.UUID(self.course_id)
+        )
+        
+        # Verify the computed weights were stored
+        self.course_content_weights_repo_mock.save_weights.assert_called_once()
         
         # Verify update calls
         self.progress_repo_mock.update_progress_percentage.assert_called_once()
         self.progress_repo_mock.update_progress_data.assert_called_once()
         
+        # Lesson weights: 0.5 + ((order / 3 + points / 20) / 2) * 0.5
+        lesson_weights = details["details"]["lesson_weights"]
+        assert lesson_weights[str(lesson1_id)] == pytest.approx(0.5 + (1 / 3 + 0.5) / 4)
+        assert lesson_weights[str(lesson2_id)] == pytest.approx(0.5 + (2 / 3 + 1.0) / 4)
+        
+        # Content weights: type weight times lesson weight, normalized
+        raw = [1.0 * lesson_weights[str(lesson1_id)], 1.5 * lesson_weights[str(lesson1_id)],
+               2.0 * lesson_weights[str(lesson2_id)]]
+        expected = [w / sum(raw) for w in raw]
+        content_weights = details["details"]["content_weights"]
+        assert [content_weights[str(c)] for c in (content1_id, content2_id, content3_id)] == pytest.approx(expected)
+        
         # Verify result
         assert isinstance(weighted_percentage, float)
-        assert 0 <= weighted_percentage <= 100.0
+        assert weighted_percentage == pytest.approx((expected[0] + expected[1] * 0.5) * 100)
         assert details["status"] == "success"
-        assert "details" in details
-        assert "completed_count" in details["details"]
-        assert "total_count" in details["details"]
-        assert "completion_ratio" in details["details"]
-        assert "content_weights" in details["details"]
-        assert "lesson_weights" in details["details"]
+        assert details["details"]["completed_count"] == 1
+        assert details["details"]["total_count"] == 3
+        assert details["details"]["completion_ratio"] == pytest.approx(1 / 3)
+        assert details["details"]["partial_progress_count"] == 1
+        
+    def test_calculate_weighted_course_progress_stored_weights(self):
+        """Test that stored weights are used without reading the course structure."""
+        content1_id, content2_id = str(uuid.uuid4()), str(uuid.uuid4())
+        self.course_content_weights_repo_mock.get_weights.return_value = (
+            [content1_id, content2_id], np.array([0.25, 0.75]), {str(uuid.uuid4()): 1.0}
+        )
+        self.user_content_progress_repo_mock.get_course_content_progress.return_value = [
+            SimpleNamespace(content_id=uuid.UUID(content2_id), is_completed=True, score=None),
+        ]
+        self.progress_repo_mock.get_course_progress.return_value = None
+        
+        weighted_percentage, details = self.progress_service.calculate_weighted_course_progress(
+            self.user_id, self.course_id
+        )
+        
+        self.course_content_weights_repo_mock.get_weights.assert_called_once_with(
+            self.mock_db, uuid.UUID(self.course_id), WEIGHTS_ALGORITHM_VERSION
+        )
+        self.lesson_repo_mock.get_course_content_outline.assert_not_called()
+        self.course_content_weights_repo_mock.save_weights.assert_not_called()
+        assert details["status"] == "success"
+        assert weighted_percentage == pytest.approx(75.0)
         
     def test_calculate_weighted_course_progress_no_lessons(self):
         """Test calculating weighted course progress when there are no lessons."""
         # Mock repository returns
-        self.lesson_repo_mock.get_lessons_by_course_id.return_value = []
+        self.lesson_repo_mock.get_course_content_outline.return_value = []
         
         # Call the method
         weighted_percentage, details = self.progress_service.calculate_weighted_course_progress(
@@ -961,13 +976,12 @@ class TestProgressService(BaseServiceTest):
         )
         
         # Verify method calls
-        self.lesson_repo_mock.get_lessons_by_course_id.assert_called_once_with(
+        self.lesson_repo_mock.get_course_content_outline.assert_called_once_with(
             self.mock_db, uuid.UUID(self.course_id)
         )
         
         # Verify no other calls were made
-        self.lesson_repo_mock.get_lesson_with_content.assert_not_called()
-        self.user_content_progress_repo_mock.get_progress.assert_not_called()
+        self.user_content_progress_repo_mock.get_course_content_progress.assert_not_called()
         self.progress_repo_mock.update_progress_percentage.assert_not_called()
         self.progress_repo_mock.update_progress_data.assert_not_called()
         
@@ -977,29 +991,19 @@ class TestProgressService(BaseServiceTest):
         
     def test_calculate_weighted_course_progress_no_content(self):
         """Test calculating weighted progress when there is no content in lessons."""
-        # Create mock lesson
-        mock_lesson = MagicMock()
-        mock_lesson.id = uuid.uuid4()
-        
-        # Set up repository mock returns
-        self.lesson_repo_mock.get_lessons_by_course_id.return_value = [mock_lesson]
-        self.lesson_repo_mock.get_lesson_with_content.return_value = (mock_lesson, [])
+        # A lesson without content
+        self.lesson_repo_mock.get_course_content_outline.return_value = [
+            SimpleNamespace(lesson_id=uuid.uuid4(), lesson_order=1, points_reward=10,
+                            content_id=None, content_type=None)
+        ]
         
         # Call the method
         weighted_percentage, details = self.progress_service.calculate_weighted_course_progress(
             self.user_id, self.course_id
         )
         
-        # Verify method calls
-        self.lesson_repo_mock.get_lessons_by_course_id.assert_called_once_with(
-            self.mock_db, uuid.UUID(self.course_id)
-        )
-        self.lesson_repo_mock.get_lesson_with_content.assert_called_once_with(
-            self.mock_db, mock_lesson.id
-        )
-        
         # Verify no other calls were made
-        self.user_content_progress_repo_mock.get_progress.assert_not_called()
+        self.user_content_progress_repo_mock.get_course_content_progress.assert_not_called()
         
         # Verify result
         assert weighted_percentage == 0.0
@@ -1008,7 +1012,7 @@ class TestProgressService(BaseServiceTest):
     def test_calculate_weighted_course_progress_exception(self):
         """Test calculating weighted progress when an exception occurs."""
         # Mock repository to raise an exception
-        self.lesson_repo_mock.get_lessons_by_course_id.side_effect = Exception("Database error")
+        self.lesson_repo_mock.get_course_content_outline.side_effect = Exception("Database error")
         
         # Call the method
         weighted_percentage, details = self.progress_service.calculate_weighted_course_progress(
@@ -1016,7 +1020,7 @@ class TestProgressService(BaseServiceTest):
         )
         
         # Verify method calls
-        self.lesson_repo_mock.get_lessons_by_course_id.assert_called_once_with(
+        self.lesson_repo_mock.get_course_content_outline.assert_called_once_with(
             self.mock_db, uuid.UUID(self.course_id)
         )
         
@@ -1289,4 +1293,164 @@ class TestProgressService(BaseServiceTest):
         self.mock_db.rollback.assert_called_once()
         
         # Verify result
-        assert result is False 
\ No newline at end of file
+        assert result is False 
+
+
+@pytest.mark.service
+class TestWeightedProgressQueries:
+    """Tests for the queries issued by the weighted progress calculation."""
+    
+    def _create_course(self, db, lesson_count, contents_per_lesson, user_id):
+        """Create a course and complete every other content item for the user."""
+        course = DBCourse(topic=Topic.MATHEMATICS, name="Algebra", description="Algebra basics", duration=60)
+        db.add(course)
+        db.flush()
+        content_types = [ContentType.THEORY, ContentType.EXERCISE, ContentType.ASSESSMENT]
+        for order in range(1, lesson_count + 1):
+            lesson = DBLesson(course_id=course.id, title=f"Lesson {order}", lesson_order=order,
+                              estimated_time=10, points_reward=10 * order)
+            db.add(lesson)
+            db.flush()
+            for position in range(contents_per_lesson):
+                content_id = uuid.uuid4()
+                db.execute(insert(DBContent.__table__).values(
+                    id=content_id, lesson_id=lesson.id, title=f"Item {position}", order=position,
+                    content_type=content_types[position % len(content_types)]
+                ))
+                if position % 2 == 0:
+                    db.add(DBUserContentProgress(user_id=user_id, content_id=content_id, is_completed=True))
+        db.commit()
+        return course
+    
+    def _count_statements(self, db, func):
+        """Run func and return its result and the number of SQL statements it executed."""
+        statements = []
+        
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        engine = db.get_bind()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            result = func()
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        return result, len(statements)
+    
+    def test_query_count_does_not_grow_with_course_size(self, test_db):
+        """Test that the calculation runs a fixed number of queries."""
+        service = ProgressService()
+        service.db = test_db
+        user_id = uuid.uuid4()
+        courses = {
+            "small": str(self._create_course(test_db, 2, 3, user_id).id),
+            "large": str(self._create_course(test_db, 40, 10, user_id).id),
+        }
+        
+        results = {}
+        for name, course_id in courses.items():
+            # The first calculation computes and stores the content weights
+            service.calculate_weighted_course_progress(str(user_id), course_id)
+            results[name] = self._count_statements(
+                test_db, lambda: service.calculate_weighted_course_progress(str(user_id), course_id)
+            )
+        
+        # Stored weights, content progress and the course progress record
+        assert results["small"][1] == 3
+        assert results["large"][1] == 3
+        
+        percentage, details = results["large"][0]
+        assert details["status"] == "success"
+        assert details["details"]["total_count"] == 400
+        assert details["details"]["completed_count"] == 200
+        assert 0.0 < percentage < 100.0
+    
+    def test_weights_are_recomputed_after_structure_changes(self, test_db):
+        """Test that lesson and content edits make the stored weights stale."""
+        service = ProgressService()
+        service.db = test_db
+        user_id = uuid.uuid4()
+        course = self._create_course(test_db, 2, 3, user_id)
+        course_id = course.id
+        weights_repo = CourseContentWeightsRepository()
+        
+        _, first = service.calculate_weighted_course_progress(str(user_id), str(course_id))
+        stored = weights_repo.get_weights(test_db, course_id, WEIGHTS_ALGORITHM_VERSION)
+        assert stored[0] == list(first["details"]["content_weights"])
+        assert stored[1].tolist() == list(first["details"]["content_weights"].values())
+        
+        # An ORM edit of a lesson
+        lesson = test_db.query(DBLesson).filter(DBLesson.course_id == course_id,
+                                                DBLesson.lesson_order == 1).one()
+        lesson.points_reward = 100
+        test_db.commit()
+        assert weights_repo.get_weights(test_db, course_id, WEIGHTS_ALGORITHM_VERSION) is None
+        
+        _, second = service.calculate_weighted_course_progress(str(user_id), str(course_id))
+        assert second["details"]["lesson_weights"] != first["details"]["lesson_weights"]
+        assert weights_repo.get_weights(test_db, course_id, WEIGHTS_ALGORITHM_VERSION) is not None
+        
+        # A bulk insert of content
+        test_db.execute(insert(DBContent.__table__).values(
+            id=uuid.uuid4(), lesson_id=lesson.id, title="Extra", order=10,
+            content_type=ContentType.THEORY
+        ))
+        test_db.commit()
+        assert weights_repo.get_weights(test_db, course_id, WEIGHTS_ALGORITHM_VERSION) is None
+        
+        _, third = service.calculate_weighted_course_progress(str(user_id), str(course_id))
+        assert third["details"]["total_count"] == 7
+        
+        # Weights from an earlier algorithm are not used
+        assert weights_repo.get_weights(test_db, course_id, WEIGHTS_ALGORITHM_VERSION + 1) is None
+    
+    def test_concurrent_first_record_keeps_pending_changes(self, test_db):
+        """Test that finding a weights record created meanwhile leaves the caller's session alone."""
+        course_id = self._create_course(test_db, 1, 1, uuid.uuid4()).id
+        weights_repo = CourseContentWeightsRepository()
+        weights_repo.get_current_version(test_db, course_id)
+        lesson = test_db.query(DBLesson).filter(DBLesson.course_id == course_id).one()
+        lesson.points_reward = 50
+        test_db.commit()
+        
+        pending = DBCourse(topic=Topic.MATHEMATICS, name="Geometry", description="Shapes", duration=30)
+        test_db.add(pending)
+        execute = test_db.execute
+        statements = []
+        
+        def execute_missing_first_read(statement, *args, **kwargs):
+            statements.append(statement)
+            if len(statements) == 1:
+                # The first read runs before another session commits its record
+                return MagicMock(scalar_one_or_none=MagicMock(return_value=None))
+            return execute(statement, *args, **kwargs)
+        
+        with patch.object(test_db, "execute", side_effect=execute_missing_first_read):
+            assert weights_repo.get_current_version(test_db, course_id) == 2
+        assert test_db.query(DBCourse).filter(DBCourse.name == "Geometry").one() is pending
+    
+    def test_edit_during_computation_keeps_weights_stale(self, test_db):
+        """Test that weights computed from an outline edited before they are saved are not used."""
+        service = ProgressService()
+        service.db = test_db
+        user_id = uuid.uuid4()
+        course_id = self._create_course(test_db, 2, 3, user_id).id
+        weights_repo = CourseContentWeightsRepository()
+        read_outline = service.lesson_repo.get_course_content_outline
+        
+        def read_then_edit(db, course_id):
+            outline = read_outline(db, course_id)
+            lesson = db.query(DBLesson).filter(DBLesson.course_id == course_id,
+                                               DBLesson.lesson_order == 1).one()
+            lesson.points_reward = 100
+            db.commit()
+            return outline
+        
+        with patch.object(service.lesson_repo, "get_course_content_outline", side_effect=read_then_edit):
+            service.calculate_weighted_course_progress(str(user_id), str(course_id))
+        assert weights_repo.get_weights(test_db, course_id, WEIGHTS_ALGORITHM_VERSION) is None
+        
+        # The next calculation sees the edit and stores its weights
+        _, details = service.calculate_weighted_course_progress(str(user_id), str(course_id))
+        stored = weights_repo.get_weights(test_db, course_id, WEIGHTS_ALGORITHM_VERSION)
+        assert stored[2] == details["details"]["lesson_weights"]
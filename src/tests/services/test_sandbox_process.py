@@ -0,0 +1,45 @@
+import sys
+
+import pytest
+
+from src.services import sandbox_process
+from src.services.sandbox_process import run_sandboxed
+
+pytestmark = pytest.mark.skipif(sandbox_process.resource is None, reason="rlimits are not supported on this platform")
+
+
+def test_run_reports_resource_usage():
+    """Test that a run reports CPU time, peak RSS and output size."""
+    code = "total = sum(i * i for i in range(300000))\nprint('x' * 1000)"
+    result = run_sandboxed([sys.executable, "-c", code])
+
+    assert result["returncode"] == 0
+    assert result["timed_out"] is False
+    usage = result["resource_usage"]
+    assert usage["cpu_user"] + usage["cpu_system"] > 0
+    assert usage["peak_rss_bytes"] > 1024 * 1024
+    assert usage["output_bytes"] == 1001
+
+
+def test_run_applies_rlimits():
+    """Test the address space, open file and CPU limits."""
+    result = run_sandboxed([sys.executable, "-c", "x = bytearray(1024 * 1024 * 1024)"],
+                           address_space=256 * 1024 * 1024)
+    assert result["returncode"] != 0
+    assert "MemoryError" in result["stderr"]
+
+    code = "import resource\nprint(resource.getrlimit(resource.RLIMIT_NOFILE)[0], resource.getrlimit(resource.RLIMIT_CPU)[0])"
+    result = run_sandboxed([sys.executable, "-c", code], timeout=3)
+    assert result["stdout"].split() == [str(sandbox_process.MAX_OPEN_FILES), str(3 + sandbox_process.CPU_LIMIT_MARGIN)]
+
+
+def test_run_timeout_and_output_cap(monkeypatch):
+    """Test that runaway programs are killed and oversized output is capped but measured."""
+    result = run_sandboxed([sys.executable, "-c", "while True: pass"], timeout=0.5)
+    assert result["timed_out"] is True
+    assert result["resource_usage"]["cpu_user"] > 0
+
+    monkeypatch.setattr(sandbox_process, "MAX_OUTPUT_BYTES", 100)
+    result = run_sandboxed([sys.executable, "-c", "print('y' * 5000)"])
+    assert len(result["stdout"]) == 100
+    assert result["resource_usage"]["output_bytes"] == 5001
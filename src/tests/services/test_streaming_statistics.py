@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from src.services.streaming_statistics import StreamingStatistics
+
+
+def test_small_data_matches_numpy():
+    """Test that statistics of small data sets are exact."""
+    data = [3.5, 1.0, 7.25, 2.0, 9.0, 4.0, 4.0, 6.5, 10.0, 0.5]
+    stats = StreamingStatistics.from_iterable(data)
+    
+    summary = stats.summary()
+    assert summary["count"] == 10
+    assert summary["min"] == 0.5
+    assert summary["max"] == 10.0
+    assert summary["mean"] == pytest.approx(np.mean(data))
+    assert summary["median"] == pytest.approx(np.median(data))
+    assert summary["std_dev"] == pytest.approx(np.std(data))
+    assert summary["variance"] == pytest.approx(np.var(data))
+    for q in (0.1, 0.25, 0.75, 0.9):
+        assert stats.quantile(q) == pytest.approx(np.percentile(data, q * 100))
+    
+    counts, edges = stats.histogram(4)
+    expected_counts, expected_edges = np.histogram(data, bins=4)
+    assert counts.tolist() == expected_counts.tolist()
+    assert np.allclose(edges, expected_edges)
+    
+    assert stats.values_outside(1.0, 9.5) == [0.5, 10.0]
+
+
+def test_generator_and_chunked_input():
+    """Test that generators and chunks give the same result as a list."""
+    data = list(range(1000))
+    from_list = StreamingStatistics.from_iterable(data)
+    from_generator = StreamingStatistics.from_iterable((x for x in data), chunk_size=64)
+    from_chunks = StreamingStatistics.from_iterable(data[i:i + 100] for i in range(0, 1000, 100))
+    
+    for stats in (from_generator, from_chunks):
+        assert stats.count == from_list.count
+        assert stats.mean == pytest.approx(from_list.mean)
+        assert stats.variance == pytest.approx(from_list.variance)
+        assert stats.quantile(0.5) == pytest.approx(from_list.quantile(0.5), abs=1.0)
+
+
+def test_merge_large_data():
+    """Test that merged partial results approximate the full data set in bounded memory."""
+    rng = np.random.default_rng(7)
+    data = rng.normal(loc=50, scale=10, size=200_000)
+    
+    merged = StreamingStatistics()
+    for chunk in np.array_split(data, 8):
+        merged.merge(StreamingStatistics.from_iterable(chunk))
+    
+    assert merged.count == len(data)
+    assert merged.min == data.min()
+    assert merged.max == data.max()
+    assert merged.mean == pytest.approx(data.mean())
+    assert merged.std_dev == pytest.approx(data.std())
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        assert merged.quantile(q) == pytest.approx(np.quantile(data, q), abs=0.05)
+    
+    counts, _ = merged.histogram(10)
+    expected_counts, _ = np.histogram(data, bins=10)
+    assert counts.sum() == len(data)
+    assert np.abs(counts - expected_counts).max() < 0.02 * len(data)
+    
+    # The digest stays small regardless of the number of values
+    assert len(merged._means) < 1000
+
+
+def test_non_numeric_values_rejected():
+    """Test that non-numerical values raise an error."""
+    with pytest.raises(ValueError):
+        StreamingStatistics.from_iterable(["a", "b"])
@@ -0,0 +1,101 @@
+import pytest
+
+from src.services.submission_similarity import (
+    SubmissionSimilarityIndex, estimate_similarity, minhash_signature, shingle_hashes, tokenize_code
+)
+
+ORIGINAL = '''def bubble_sort(arr):
+    """Sort a list in place."""
+    n = len(arr)
+    for i in range(n):
+        for j in range(0, n - i - 1):
+            if arr[j] > arr[j + 1]:
+                arr[j], arr[j + 1] = arr[j + 1], arr[j]
+    return arr
+'''
+
+# The same solution with renamed variables, a comment and different formatting
+DISGUISED = '''def sort_numbers(values):
+    # my own work
+    size = len(values)
+    for a in range(size):
+        for b in range(0, size-a-1):
+            if values[b] > values[b+1]:
+                values[b], values[b+1] = values[b+1], values[b]
+    return values
+'''
+
+DIFFERENT = '''def sort_numbers(values):
+    result = []
+    for value in values:
+        position = 0
+        while position < len(result) and result[position] < value:
+            position += 1
+        result.insert(position, value)
+    return result
+'''
+
+
+@pytest.fixture
+def index():
+    """Create an in-memory similarity index."""
+    return SubmissionSimilarityIndex(":memory:")
+
+
+def test_python_tokens_ignore_names_and_comments():
+    """Test that renaming and comments do not change the normalized Python tokens."""
+    assert tokenize_code(ORIGINAL, "python") == tokenize_code(DISGUISED, "python")
+    assert tokenize_code(ORIGINAL, "python") != tokenize_code(DIFFERENT, "python")
+
+    # Code that does not parse falls back to the lexical tokenizer
+    assert tokenize_code("def f(:\n    return len(x)  # hi", "python") == \
+        ["def", "ID", "(", ":", "return", "len", "(", "ID", ")"]
+
+
+def test_minhash_estimates_similarity():
+    """Test that signature agreement approximates shingle set overlap."""
+    tokens = [f"t{i}" for i in range(400)]
+    first = shingle_hashes(tokens, size=1)
+    second = shingle_hashes(tokens[:300] + [f"u{i}" for i in range(100)], size=1)
+    # Jaccard similarity of the two sets is 300 / 500
+    estimate = estimate_similarity(minhash_signature(first), minhash_signature(second))
+    assert estimate == pytest.approx(0.6, abs=0.15)
+    assert estimate_similarity(minhash_signature(first), minhash_signature(first)) == 1.0
+
+
+def test_query_finds_disguised_copies(index):
+    """Test that a disguised copy is found and unrelated code is not."""
+    index.add("s1", ORIGINAL, "python", user_id="alice", scope="sorting")
+    index.add("s2", DIFFERENT, "python", user_id="bob", scope="sorting")
+    index.add("s3", ORIGINAL, "python", user_id="carol", scope="other-exercise")
+
+    matches = index.query(DISGUISED, "python", scope="sorting")
+    assert [m["submission_id"] for m in matches] == ["s1"]
+    assert matches[0]["similarity"] > 0.9
+    assert index.query(DISGUISED, "python", scope="sorting", exclude_user_id="alice") == []
+
+
+def test_incremental_add_and_remove(index):
+    """Test that submissions can be added, replaced and removed one at a time."""
+    index.add("s1", ORIGINAL, "python", user_id="alice")
+    index.add("s2", DISGUISED, "python", user_id="bob")
+    assert [m["submission_id"] for m in index.similar_to("s1")] == ["s2"]
+
+    # Resubmitting under the same ID replaces the earlier code
+    index.add("s2", DIFFERENT, "python", user_id="bob")
+    assert index.similar_to("s1") == []
+    assert index.count() == 2
+
+    index.remove("s1")
+    assert index.count() == 1
+    with pytest.raises(KeyError):
+        index.similar_to("s1")
+
+
+def test_index_persists(tmp_path):
+    """Test that the index is reopened from its SQLite file."""
+    path = tmp_path / "similarity.db"
+    SubmissionSimilarityIndex(path).add("s1", "const add = (a, b) => a + b;", "javascript", user_id="alice")
+
+    matches = SubmissionSimilarityIndex(path).query("const sum = (x, y) => x + y;", "javascript")
+    assert [m["submission_id"] for m in matches] == ["s1"]
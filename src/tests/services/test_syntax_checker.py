@@ -0,0 +1,77 @@
+import pytest
+
+from src.services.syntax_checker import (
+    JavaScriptSyntaxChecker, SyntaxCache, check_python_syntax, check_syntax, get_syntax_cache
+)
+
+
+@pytest.fixture
+def javascript_checker():
+    """Create a JavaScript checker and stop its process afterwards."""
+    checker = JavaScriptSyntaxChecker()
+    yield checker
+    checker.close()
+
+
+def test_check_python_syntax():
+    """Test in-memory Python syntax checking."""
+    assert check_python_syntax("def f(x):\n    return x") == {"is_valid": True, "error": None}
+
+    result = check_python_syntax("print('unclosed'")
+    assert result["is_valid"] is False
+    assert result["error"].startswith("SyntaxError")
+    assert "at line 1" in result["error"]
+
+    # Errors found after parsing are reported too
+    assert check_python_syntax("return 5")["is_valid"] is False
+
+
+def test_syntax_cache_is_lru():
+    """Test that the syntax cache evicts the least recently used verdict."""
+    cache = SyntaxCache(max_size=2)
+    keys = [SyntaxCache.key(f"x = {i}", "python") for i in range(3)]
+    cache.put(keys[0], {"is_valid": True, "error": None})
+    cache.put(keys[1], {"is_valid": True, "error": None})
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], {"is_valid": True, "error": None})
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert len(cache) == 2
+    assert SyntaxCache.key("x = 1", "python") != SyntaxCache.key("x = 1", "javascript")
+
+
+def test_check_syntax_uses_cache():
+    """Test that repeated checks of the same code are answered from the cache."""
+    cache = get_syntax_cache()
+    code = "def cached_check():\n    return 42"
+    check_syntax(code, "python")
+    hits = cache.hits
+    assert check_syntax(code, "python")["is_valid"] is True
+    assert cache.hits == hits + 1
+
+    with pytest.raises(ValueError):
+        check_syntax(code, "cobol")
+
+
+def test_javascript_checker_reuses_process(javascript_checker):
+    """Test that JavaScript checks share one checker process and never run the code."""
+    assert javascript_checker.check("const add = (a, b) => a + b;")["is_valid"] is True
+    pid = javascript_checker._process.pid
+
+    result = javascript_checker.check("console.log('Hello';")
+    assert result["is_valid"] is False
+    assert "SyntaxError: missing ) after argument list" in result["error"]
+
+    # Module-level return is allowed, as with node --check; the loop is never run
+    assert javascript_checker.check("while (true) {}\nreturn 1;")["is_valid"] is True
+    assert javascript_checker._process.pid == pid
+
+
+def test_javascript_checker_restarts(javascript_checker):
+    """Test that the checker process is restarted after it dies."""
+    javascript_checker.check("let x = 1;")
+    javascript_checker._process.kill()
+    javascript_checker._process.wait()
+
+    assert javascript_checker.check("let y = 2;")["is_valid"] is True
@@ -285,27 +285,26 @@ class TestUserStatsService(BaseServiceTest):
             for i in range(1, 4)
         ]
         
-        self.mock_user_repo.get_by_id.side_effect = users
+        self.mock_user_repo.get_by_ids.return_value = users
         
         stats_updates = [
             {"user_id": user.id, "points": 50, "time_spent": 30}
             for user in users
         ]
+        # A second update of the same user and an unknown user
+        stats_updates.append({"user_id": users[0].id, "points": 5, "time_spent": 0})
+        stats_updates.append({"user_id": str(uuid.uuid4()), "points": 5, "time_spent": 5})
         
-        # Mock the batch_operation method
-        with patch.object(self.service, 'batch_operation') as mock_batch_operation:
-            # Set up the mock to call the provided function on each update
-            def side_effect(updates, func, batch_size):
-                for update in updates:
-                    func(update)
-            mock_batch_operation.side_effect = side_effect
-            
-            # Act
-            result = self.service.batch_update_user_stats(stats_updates)
-            
-            # Assert
-            assert result == len(users)
-            assert mock_batch_operation.call_count == 1
+        # Act
+        result = self.service.batch_update_user_stats(stats_updates)
+        
+        # Assert - one read and one bulk write for all users
+        assert result == len(users) + 1
+        self.mock_user_repo.get_by_ids.assert_called_once()
+        self.mock_user_repo.bulk_update.assert_called_once()
+        rows = self.mock_user_repo.bulk_update.call_args[0][1]
+        assert rows[0] == {"id": uuid.UUID(users[0].id), "points": 155, "total_study_time": 90}
+        assert [row["points"] for row in rows[1:]] == [250, 350]
             
     def test_batch_update_user_stats_validation_error(self):
         """Test batch updating user stats with invalid input."""